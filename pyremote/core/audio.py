@@ -0,0 +1,445 @@
+import struct
+import threading
+from abc import ABC, abstractmethod
+import time
+import wave
+from array import array
+from collections import namedtuple
+from pyremote.core.protocol import DATA_TYPE_AUDIO
+
+try:
+    import opuslib  # 可选依赖：Opus编码（未安装时以PCM传输）
+except ImportError:
+    opuslib = None
+
+# 音频帧格式：版本(1) + 序号(4) + 时间戳(8，采样数) + 编码(1) + 声道数(1) + 采样率(4) + 每帧采样数(2) + 编码数据
+AUDIO_VERSION = 1
+_AUDIO_HEADER = struct.Struct(">BIQBBIH")
+
+CODEC_PCM = 0  # 16位有符号小端PCM（无压缩）
+CODEC_OPUS = 1
+
+# Opus支持的采样率与帧长
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+FRAME_DURATIONS_MS = (10, 20)
+
+AudioFrame = namedtuple("AudioFrame", "seq timestamp codec channels sample_rate frame_samples payload")
+
+
+def pack_audio_frame(seq, timestamp, codec, channels, sample_rate, frame_samples, payload):
+    """封装一个音频帧"""
+    return _AUDIO_HEADER.pack(AUDIO_VERSION, seq, timestamp, codec, channels, sample_rate,
+                              frame_samples) + payload
+
+
+def unpack_audio_frame(data):
+    """解析音频帧，返回AudioFrame"""
+    version, seq, timestamp, codec, channels, sample_rate, frame_samples = _AUDIO_HEADER.unpack_from(data, 0)
+    if version != AUDIO_VERSION:
+        raise Exception(f"不支持的音频帧版本：{version}")
+    return AudioFrame(seq, timestamp, codec, channels, sample_rate, frame_samples,
+                      bytes(data[_AUDIO_HEADER.size:]))
+
+
+class AudioSource(ABC):
+    """
+    音频源接口：read返回16位有符号小端PCM（声道交错），结束时返回空字节
+    realtime=True表示read会阻塞到数据就绪（如声卡采集，由设备时钟控制节奏），
+    否则由发送端按帧长定时读取（如文件）
+    """
+    sample_rate = 48000
+    channels = 1
+    realtime = False
+
+    @abstractmethod
+    def read(self, frame_samples):
+        """读取frame_samples个采样（每声道）"""
+
+    def close(self):
+        pass
+
+
+class WavFileSource(AudioSource):
+    """WAV文件音频源（无声卡环境测试、播放提示音）"""
+    def __init__(self, path, loop=False):
+        """
+        :param path: WAV文件路径（16位PCM）
+        :param loop: 播放结束后是否从头循环
+        """
+        self._wav = wave.open(path, "rb")
+        if self._wav.getsampwidth() != 2:
+            self._wav.close()
+            raise Exception(f"只支持16位PCM的WAV文件：{path}")
+        self.sample_rate = self._wav.getframerate()
+        self.channels = self._wav.getnchannels()
+        self.loop = loop
+
+    def read(self, frame_samples):
+        data = self._wav.readframes(frame_samples)
+        if len(data) < frame_samples * self.channels * 2 and self.loop:
+            self._wav.rewind()
+            data += self._wav.readframes(frame_samples - len(data) // (self.channels * 2))
+        return data
+
+    def close(self):
+        self._wav.close()
+
+
+class AudioSink(ABC):
+    """
+    音频输出接口：write接收16位有符号小端PCM（声道交错）
+    realtime=True表示write会阻塞到设备消耗数据（如声卡播放，由设备时钟控制节奏），否则由播放线程按采样数定时写入
+    """
+    realtime = False
+
+    @abstractmethod
+    def write(self, pcm):
+        """写入PCM数据"""
+
+    def close(self):
+        pass
+
+
+class WavFileSink(AudioSink):
+    """写入WAV文件（无声卡环境测试、录制对方声音）"""
+    def __init__(self, path):
+        self.path = path
+        self._wav = None
+
+    def open(self, sample_rate, channels):
+        """收到第一帧、得知音频格式后打开文件"""
+        self._wav = wave.open(self.path, "wb")
+        self._wav.setnchannels(channels)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(sample_rate)
+
+    def write(self, pcm):
+        self._wav.writeframes(pcm)
+
+    def close(self):
+        if self._wav:
+            self._wav.close()
+
+
+class AudioEncoder:
+    """音频编码（优先Opus，未安装opuslib或采样率不受支持时使用PCM）"""
+    def __init__(self, sample_rate, channels, frame_ms=20, codec="opus", bitrate=32000):
+        """
+        :param frame_ms: 帧长（10或20毫秒，帧越短延迟越低，头部开销越大）
+        :param codec: 首选编码（opus/pcm）
+        :param bitrate: Opus码率（bit/s）
+        """
+        if frame_ms not in FRAME_DURATIONS_MS:
+            raise Exception(f"不支持的音频帧长：{frame_ms}ms（可选：10、20）")
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.codec = CODEC_PCM
+        self._opus = None
+        if codec == "opus":
+            if opuslib is None:
+                print("未安装opuslib，音频以PCM传输（带宽较高）")
+            elif sample_rate not in OPUS_SAMPLE_RATES:
+                print(f"Opus不支持采样率{sample_rate}Hz，音频以PCM传输")
+            else:
+                # 低延迟模式：算法延迟2.5ms（普通模式为6.5ms）
+                self._opus = opuslib.Encoder(sample_rate, channels, "restricted_lowdelay")
+                self._opus.bitrate = bitrate
+                self.codec = CODEC_OPUS
+
+    def encode(self, pcm):
+        """编码一帧PCM（不足一帧时补静音）"""
+        frame_bytes = self.frame_samples * self.channels * 2
+        if len(pcm) < frame_bytes:
+            pcm += bytes(frame_bytes - len(pcm))
+        if self._opus:
+            return self._opus.encode(pcm, self.frame_samples)
+        return pcm
+
+
+class AudioDecoder:
+    """音频解码（丢失的帧由Opus丢包补偿生成，PCM补静音）"""
+    def __init__(self, codec, sample_rate, channels, frame_samples):
+        self.codec = codec
+        self.channels = channels
+        self.frame_samples = frame_samples
+        self._opus = None
+        if codec == CODEC_OPUS:
+            if opuslib is None:
+                raise Exception("对方音频为Opus编码，需安装opuslib")
+            self._opus = opuslib.Decoder(sample_rate, channels)
+
+    def decode(self, payload):
+        """解码一帧；payload为None表示该帧丢失"""
+        if self._opus:
+            # 空数据触发Opus丢包补偿（根据前几帧推测波形，比静音更自然）
+            return self._opus.decode(payload or b"", self.frame_samples)
+        if payload is None:
+            return bytes(self.frame_samples * self.channels * 2)
+        return payload
+
+
+def stretch_pcm(pcm, channels, delta):
+    """
+    微调一帧PCM的长度（时钟漂移补偿）：delta<0时均匀删除|delta|个采样，delta>0时均匀重复delta个采样
+    每帧只调整约1%，听感上不明显
+    """
+    if not delta:
+        return pcm
+    samples = array("h", pcm)
+    total = len(samples) // channels
+    count = min(abs(delta), total - 1)
+    step = total // (count + 1)
+    parts = []
+    start = 0
+    for i in range(1, count + 1):
+        pos = i * step * channels
+        if delta < 0:
+            parts.append(samples[start:pos])
+            start = pos + channels  # 跳过该采样
+        else:
+            parts.append(samples[start:pos + channels])
+            start = pos  # 该采样输出两次
+    parts.append(samples[start:])
+    result = array("h")
+    for part in parts:
+        result.extend(part)
+    return result.tobytes()
+
+
+class JitterBuffer:
+    """
+    自适应抖动缓冲：
+    - 按到达时间与发送端采样时钟的偏差估计网络抖动（RFC 3550），目标延迟=帧长+3倍抖动，限制在[min, max]之间
+    - 缓冲达到目标延迟后开始播放，播放时钟每帧取出一帧；缺失的帧交给解码器补偿，缓冲耗尽时重新缓冲
+    - 时钟漂移补偿：平滑后的缓冲深度持续高于/低于目标时，每帧删除/重复少量采样，使缓冲深度回到目标；
+      深度超过上限（如网络卡顿后突发到达）时直接丢弃最早的帧，保证端到端延迟不持续增长
+    """
+    def __init__(self, frame_ms=20, min_delay_ms=20, max_delay_ms=60):
+        """
+        :param frame_ms: 帧长（毫秒）
+        :param min_delay_ms: 最小缓冲延迟
+        :param max_delay_ms: 最大缓冲延迟（端到端延迟 ≈ 帧长 + 缓冲延迟 + 网络传输）
+        """
+        self.frame_ms = frame_ms
+        self.min_delay_ms = min_delay_ms
+        self.max_delay_ms = max_delay_ms
+        self.target_delay_ms = min_delay_ms
+        self.jitter_ms = 0.0
+        self._frames = {}  # 序号 -> 编码数据
+        self._next_seq = None  # 下一个播放的序号
+        self._last_transit = None
+        self._depth_avg = None  # 平滑后的缓冲深度（毫秒）
+        self._playing = False
+        self._lock = threading.Lock()
+        # 统计
+        self.late_frames = 0  # 到达时已错过播放时刻的帧
+        self.lost_frames = 0  # 播放时仍未到达的帧
+        self.dropped_frames = 0  # 缓冲过深时丢弃的帧
+        self.underruns = 0  # 缓冲耗尽次数
+        self.adjusted_samples = 0  # 漂移补偿累计调整的采样数（负数=删除）
+
+    def push(self, seq, timestamp_ms, payload, arrival_ms):
+        """
+        放入一帧
+        :param timestamp_ms: 发送端采样时钟（毫秒）
+        :param arrival_ms: 本地到达时刻（毫秒，单调时钟）
+        """
+        with self._lock:
+            transit = arrival_ms - timestamp_ms
+            if self._last_transit is not None:
+                self.jitter_ms += (abs(transit - self._last_transit) - self.jitter_ms) / 16
+            self._last_transit = transit
+            self.target_delay_ms = min(self.max_delay_ms,
+                                       max(self.min_delay_ms, self.frame_ms + 3 * self.jitter_ms))
+            if self._next_seq is not None and seq < self._next_seq:
+                self.late_frames += 1
+                return
+            self._frames[seq] = payload
+
+    def depth_ms(self):
+        """当前缓冲深度（毫秒，从下一个播放的序号到最新到达的帧）"""
+        if not self._frames:
+            return 0
+        first = self._next_seq if self._next_seq is not None else min(self._frames)
+        return (max(self._frames) - first + 1) * self.frame_ms
+
+    def pop(self, frame_samples):
+        """
+        播放时钟每帧调用一次
+        :param frame_samples: 每帧采样数（用于计算漂移补偿幅度）
+        :return: None=未在播放（缓冲中或已耗尽），否则（编码数据或None表示丢失, 采样调整数）
+        """
+        with self._lock:
+            if not self._playing:
+                if not self._frames or self.depth_ms() < self.target_delay_ms:
+                    return None
+                self._playing = True
+                self._next_seq = min(self._frames)
+                self._depth_avg = None
+            if not self._frames:
+                self._playing = False
+                self.underruns += 1
+                return None
+
+            # 缓冲过深：丢弃最早的帧直到回到上限以内
+            while self.depth_ms() > self.max_delay_ms + self.frame_ms:
+                if self._frames.pop(self._next_seq, None) is not None:
+                    self.dropped_frames += 1
+                self._next_seq += 1
+
+            depth = self.depth_ms()
+            self._depth_avg = depth if self._depth_avg is None else self._depth_avg + (depth - self._depth_avg) * 0.05
+            payload = self._frames.pop(self._next_seq, None)
+            if payload is None:
+                self.lost_frames += 1
+            self._next_seq += 1
+
+            # 时钟漂移补偿：每帧最多调整约1%的采样
+            delta = 0
+            step = max(1, frame_samples // 100)
+            if self._depth_avg > self.target_delay_ms + self.frame_ms / 2:
+                delta = -step
+            elif self._depth_avg < self.target_delay_ms - self.frame_ms / 2:
+                delta = step
+            self.adjusted_samples += delta
+            return payload, delta
+
+
+class AudioSender:
+    """音频发送：从音频源按帧读取、编码，以高优先级发送（不排在屏幕帧之后）"""
+    def __init__(self, comm, source, frame_ms=20, codec="opus", bitrate=32000):
+        """
+        :param comm: 通信实例（TCPCommunication）
+        :param source: 音频源（AudioSource）
+        :param frame_ms: 帧长（10或20毫秒）
+        """
+        self.comm = comm
+        self.source = source
+        self.frame_ms = frame_ms
+        self.encoder = AudioEncoder(source.sample_rate, source.channels, frame_ms, codec, bitrate)
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._send_loop, name="pyremote-audio-sender", daemon=True)
+        self._thread.start()
+
+    def _send_loop(self):
+        frame_samples = self.encoder.frame_samples
+        interval = self.frame_ms / 1000
+        next_at = time.perf_counter()
+        seq = timestamp = 0
+        while not self._stop.is_set() and self.comm.is_connected:
+            pcm = self.source.read(frame_samples)
+            if not pcm:
+                break  # 音频源结束
+            payload = self.encoder.encode(pcm)
+            frame = pack_audio_frame(seq, timestamp, self.encoder.codec, self.source.channels,
+                                     self.source.sample_rate, frame_samples, payload)
+            if not self.comm.send_data(DATA_TYPE_AUDIO, frame, priority=True):
+                break
+            self.frames_sent += 1
+            self.bytes_sent += len(frame)
+            seq += 1
+            timestamp += frame_samples
+            if not self.source.realtime:
+                # 非实时音频源按帧长定时发送；落后超过一帧时不追赶，避免突发
+                next_at = max(next_at + interval, time.perf_counter() - interval)
+                self._stop.wait(max(0.0, next_at - time.perf_counter()))
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+        self.source.close()
+
+
+class AudioReceiver:
+    """音频接收：放入抖动缓冲，播放线程按帧长定时解码并输出到音频输出（AudioSink）"""
+    def __init__(self, sink, min_delay_ms=20, max_delay_ms=60):
+        """
+        :param sink: 音频输出（AudioSink）
+        :param min_delay_ms: 抖动缓冲最小延迟
+        :param max_delay_ms: 抖动缓冲最大延迟
+        """
+        self.sink = sink
+        self.min_delay_ms = min_delay_ms
+        self.max_delay_ms = max_delay_ms
+        self.jitter_buffer = None  # 收到第一帧、得知帧长后创建
+        self.decoder = None
+        self.frames_played = 0
+        self._format = None  # （编码, 采样率, 声道数, 每帧采样数）
+        self._started = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def handle_data(self, data_type, data, arrival_time=None):
+        """
+        处理接收到的数据（在TCPCommunication.on_data_received回调中调用），非音频数据忽略
+        :param arrival_time: 到达时刻（time.perf_counter()，秒；传入TCPCommunication.arrival_time，
+                             即接收线程收到该帧的时刻，不含分发排队时间；None=当前时刻）
+        """
+        if data_type != DATA_TYPE_AUDIO:
+            return False
+        frame = unpack_audio_frame(data)
+        arrival_ms = (time.perf_counter() if arrival_time is None else arrival_time) * 1000
+        fmt = (frame.codec, frame.sample_rate, frame.channels, frame.frame_samples)
+        if self._format is None:
+            self._format = fmt
+            self.decoder = AudioDecoder(*fmt)
+            frame_ms = frame.frame_samples * 1000 / frame.sample_rate
+            self.jitter_buffer = JitterBuffer(frame_ms, self.min_delay_ms, self.max_delay_ms)
+            if hasattr(self.sink, "open"):
+                self.sink.open(frame.sample_rate, frame.channels)
+            self._started.set()
+        elif fmt != self._format:
+            print(f"音频格式变化，忽略该帧：{fmt}")
+            return True
+        self.jitter_buffer.push(frame.seq, frame.timestamp * 1000 / frame.sample_rate, frame.payload, arrival_ms)
+        return True
+
+    def start(self):
+        self._thread = threading.Thread(target=self._playout_loop, name="pyremote-audio-playout", daemon=True)
+        self._thread.start()
+
+    def _playout_loop(self):
+        """
+        播放时钟：每次取出一帧解码输出（缓冲耗尽后输出静音，保持时间线连续）；
+        下一次取帧的时刻按实际输出的采样数推进，漂移补偿删除/重复采样即可改变取帧速度
+        """
+        while not self._started.wait(0.1):
+            if self._stop.is_set():
+                return
+        _, sample_rate, channels, frame_samples = self._format
+        silence = bytes(frame_samples * channels * 2)
+        has_played = False
+        next_at = time.perf_counter()
+        while not self._stop.is_set():
+            item = self.jitter_buffer.pop(frame_samples)
+            pcm = None
+            try:
+                if item is not None:
+                    payload, delta = item
+                    pcm = stretch_pcm(self.decoder.decode(payload), channels, delta)
+                    self.frames_played += 1
+                    has_played = True
+                elif has_played:
+                    pcm = silence
+                if pcm:
+                    self.sink.write(pcm)
+            except Exception as e:
+                print(f"音频播放失败：{str(e)}")
+            if self.sink.realtime and pcm:
+                continue  # 写入已按设备时钟阻塞
+            interval = len(pcm) / (channels * 2 * sample_rate) if pcm else frame_samples / sample_rate
+            next_at = max(next_at + interval, time.perf_counter() - interval)
+            self._stop.wait(max(0.0, next_at - time.perf_counter()))
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+        self.sink.close()
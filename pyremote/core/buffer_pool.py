@@ -0,0 +1,101 @@
+import io
+import threading
+from PIL import Image
+
+
+class EncodedFrame:
+    """
+    编码结果（data为编码数据的只读视图，用完后调用release将缓冲区归还缓冲池）
+    多个持有者共用同一帧时（如多会话广播），每个额外的持有者先调用retain，最后一个release时才归还缓冲区
+    """
+    def __init__(self, data, pool=None, buffer=None):
+        self._pool = pool
+        self._buffer = buffer
+        self._view = data if isinstance(data, memoryview) else memoryview(data)
+        self.data = self._view.toreadonly()
+        self._refs = 1
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def released(self):
+        return self._view is None
+
+    def retain(self):
+        """增加一个持有者（对应一次release）"""
+        with self._lock:
+            if self._view is None:
+                raise Exception("编码帧已释放")
+            self._refs += 1
+        return self
+
+    def release(self):
+        """释放一个持有者；最后一个持有者释放时释放视图并归还缓冲区（之后不能再访问data）"""
+        with self._lock:
+            if self._view is None:
+                return
+            self._refs -= 1
+            if self._refs > 0:
+                return
+            self.data.release()
+            self._view.release()
+            self._view = None
+        if self._pool:
+            self._pool.put(self._buffer)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+class EncodeBufferPool:
+    """编码缓冲池（复用输出缓冲区和格式转换目标图像，长时间运行时内存占用保持平稳）"""
+    def __init__(self, max_buffers=4):
+        """
+        :param max_buffers: 池中保留的缓冲区数量（同时在途的帧超过该数量时临时分配，用完后丢弃）
+        """
+        self.max_buffers = max_buffers
+        self._buffers = []
+        self._lock = threading.Lock()
+        self._local = threading.local()  # 每个线程复用自己的RGB转换目标图像（多个编码线程共用同一缓冲池）
+
+    def get(self):
+        """取出一个缓冲区（BytesIO，不截断，已分配的容量直接复用）"""
+        with self._lock:
+            buf = self._buffers.pop() if self._buffers else io.BytesIO()
+        buf.seek(0)
+        return buf
+
+    def put(self, buf):
+        """归还缓冲区"""
+        with self._lock:
+            if len(self._buffers) < self.max_buffers:
+                self._buffers.append(buf)
+
+    def to_rgb(self, img):
+        """
+        转换为RGB（RGBA等格式粘贴到复用的目标图像上，不每帧分配新图像）
+        目标图像按线程复用，返回值在本线程下一次调用to_rgb前有效
+        """
+        if img.mode == "RGB":
+            return img
+        target = getattr(self._local, "rgb_target", None)
+        if target is None or target.size != img.size:
+            target = self._local.rgb_target = Image.new("RGB", img.size)
+        target.paste(img)
+        return target
+
+    def encode(self, img, format="JPEG", **params):
+        """编码到池化缓冲区，返回EncodedFrame（视图直接指向缓冲区，不复制编码数据）"""
+        buf = self.get()
+        try:
+            img.save(buf, format=format, **params)
+        except Exception:
+            self.put(buf)
+            raise
+        length = buf.tell()
+        return EncodedFrame(buf.getbuffer()[:length], pool=self, buffer=buf)
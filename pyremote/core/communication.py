@@ -1,28 +1,104 @@
+import json
+import queue
 import socket
+import struct
 import threading
+import time
+from collections import deque
+from Crypto.Random import get_random_bytes
 from pyremote.core.security import RSAEncryptor, DataValidator
+from pyremote.core.buffer_pool import EncodedFrame
+from pyremote.core.protocol import (PROTOCOL_VERSION, DATA_TYPE_MESSAGE, INPUT_MESSAGES, Ack, MouseMove,
+                                    Resize, MessageEncoder, MessageDecoder)
 from pyremote.utils.config import get_config
 
+# 发送队列字节上限（超过后send_data阻塞等待，对生产者形成背压）
+DEFAULT_SEND_BUDGET = 8 * 1024 * 1024
+# 套接字收发缓冲区大小
+SOCKET_BUFFER_SIZE = 1024 * 1024
+
+# 握手Hello：魔数(4) + 版本(1) + 随机数(16) + 公钥长度(2) + 能力长度(2)，后接公钥(PEM)与能力(JSON)
+HELLO_MAGIC = b"PRHS"
+HANDSHAKE_VERSION = 4
+NONCE_SIZE = 16
+AUTH_TOKEN = b"PyRemote_Auth_OK"
+_HELLO_HEADER = struct.Struct(">4sB16sHH")
+
+# 大帧分片：加密数据按分片大小（RSA密文块256字节的整数倍，可独立解密）拆成多个线路帧，
+# 高优先级帧（音频）可插在分片之间发送，接收端逐片解密，不必等整个大帧
+FRAGMENT_SIZE = 16 * 256
+# 长度前缀的高两位为分片标记：MORE=后面还有分片，CONT=是前一分片的后续
+FRAGMENT_MORE = 0x80000000
+FRAGMENT_CONT = 0x40000000
+_FRAGMENT_FLAGS = FRAGMENT_MORE | FRAGMENT_CONT
+# 第三位为高优先级标记（音频与输入消息，不分片）：接收线程直接解密，不排在待解密的屏幕帧之后
+FRAME_PRIORITY = 0x20000000
+_FRAME_FLAGS = _FRAGMENT_FLAGS | FRAME_PRIORITY
+# 接收端待解密分片数上限（约256KB，超过后接收线程阻塞）
+FRAGMENT_QUEUE_SIZE = 64
+# 接收端待分发（已解密）帧数上限
+DISPATCH_QUEUE_SIZE = 64
+# 接收端待分发的高优先级帧数上限（音频与输入消息，与屏幕帧分开排队，不会等在屏幕帧之后）
+PRIORITY_DISPATCH_QUEUE_SIZE = 64
+
+
 class TCPCommunication:
-    def __init__(self):
+    def __init__(self, key_pair=None):
+        """
+        :param key_pair: RSA密钥对（None=生成新密钥对；多会话服务端的各会话共用服务端密钥对）
+        """
         # 初始化配置、加密器、数据校验器
         self.config = get_config()
-        self.rsa = RSAEncryptor()
+        self.rsa = RSAEncryptor(key_pair)
         self.validator = DataValidator()
         self.socket = None
         self.is_connected = False
         self.on_data_received = None  # 数据接收回调函数
+        self.on_message_received = None  # 输入/控制消息回调函数（参数为protocol中定义的消息）
+        self.recorder = None  # 会话录像（SessionRecorder，可选）
+        # 输入/控制消息编解码（坐标差值编码依赖发送顺序，编码与入队需在同一把锁内完成）
+        self.message_encoder = MessageEncoder()
+        self.message_decoder = MessageDecoder()
+        self._message_lock = threading.Lock()
+        self._resync_position = None  # 发送失败未送达的鼠标位置（下一批消息先补发绝对移动）
+        # 输入确认：为True时每处理完一批输入消息回复Ack（已处理的输入批次数，累计值）
+        self.ack_inputs = False
+        self._input_batches = 0
+        # 发送队列（多线程并发调用send_data时由单一写线程顺序发送，保证帧完整）
+        self.send_budget = DEFAULT_SEND_BUDGET
+        self.send_timeout = 5.0  # 背压等待超时（秒）
+        self._send_queue = deque()
+        self._priority_queue = deque()  # 高优先级帧（音频、输入消息），写线程优先发送
+        self._receive_stop = None  # 当前会话接收流水线的停止事件
+        self._dispatch_state = threading.local()  # 分发线程正在处理的帧的到达时刻
+        self._queued_bytes = 0
+        self._send_cond = threading.Condition()
+        # 握手：本地能力（通过Hello告知对方）与对方能力
+        self.capabilities = {
+            "protocol": PROTOCOL_VERSION,
+            "codecs": ["jpeg", "tiles", "png"],
+        }
+        self.peer_capabilities = {}
+        self._local_nonce = None
+        self._key_confirmation = None  # 待随第一帧发出的密钥确认
+        self._awaiting_confirmation = False  # 对方第一帧尚未到达（需校验其密钥确认）
 
-    def start_server(self, host, port):
-        """启动服务端"""
+    def start_server(self, host, port, on_session=None):
+        """
+        启动服务端
+        :param on_session: 多会话回调（设置后持续接受连接，每个认证成功的连接创建独立的TCPCommunication会话，
+                           在会话线程启动前回调，参数为会话实例，可在回调中设置接收回调；不设置时只接受一个连接）
+        """
         try:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.socket.bind((host, port))
-            self.socket.listen(5)
+            self.socket.listen(128 if on_session else 5)
             print(f"服务端启动：{host}:{port}")
             
             # 异步接受连接
-            threading.Thread(target=self._accept_connections, daemon=True).start()
+            target = self._accept_sessions if on_session else self._accept_connections
+            threading.Thread(target=target, args=(on_session,) if on_session else (),
+                             name="pyremote-tcp-accept", daemon=True).start()
             return True
         except Exception as e:
             print(f"服务端启动失败：{str(e)}")
@@ -33,13 +109,12 @@ class TCPCommunication:
         try:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.socket.connect((host, port))
-            self.is_connected = True
+            self._configure_socket(self.socket)
             
             # 双向认证
             if self._auth_exchange():
                 print(f"客户端连接成功：{host}:{port}")
-                # 异步接收数据
-                threading.Thread(target=self._receive_data, daemon=True).start()
+                self._start_session()
                 return True
             else:
                 print("客户端认证失败")
@@ -56,95 +131,454 @@ class TCPCommunication:
             print(f"新连接：{addr}")
             
             # 双向认证
+            self._configure_socket(client_socket)
             if self._auth_exchange(client_socket):
                 self.socket = client_socket
-                self.is_connected = True
-                # 异步接收数据
-                threading.Thread(target=self._receive_data, daemon=True).start()
+                self._start_session()
                 break
             else:
                 print(f"连接 {addr} 认证失败，关闭连接")
                 client_socket.close()
 
+    def _accept_sessions(self, on_session):
+        """持续接受连接（多会话服务端），握手在独立线程中进行，慢速客户端不阻塞后续连接"""
+        while True:
+            try:
+                client_socket, addr = self.socket.accept()
+            except OSError:
+                break  # 服务端已关闭
+            threading.Thread(target=self._start_child_session, args=(client_socket, addr, on_session),
+                             name="pyremote-tcp-handshake", daemon=True).start()
+
+    def _start_child_session(self, client_socket, addr, on_session):
+        """为新连接创建会话（共用服务端密钥对），认证成功后回调on_session"""
+        session = TCPCommunication(key_pair=self.rsa.key_pair)
+        session.socket = client_socket
+        session._configure_socket(client_socket)
+        if not session._auth_exchange():
+            print(f"连接 {addr} 认证失败，关闭连接")
+            client_socket.close()
+            return
+        on_session(session)
+        session._start_session()
+
+    def _configure_socket(self, sock):
+        """连接参数调优：关闭Nagle算法（小输入消息立即发出），增大收发缓冲区"""
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+        except OSError as e:
+            print(f"套接字参数设置失败：{str(e)}")
+
+    def _start_session(self):
+        """认证成功后启动写线程和接收线程"""
+        with self._send_cond:
+            self._send_queue.clear()
+            self._priority_queue.clear()
+            self._queued_bytes = 0
+        self.message_encoder.reset()
+        self.message_decoder.reset()
+        self._resync_position = None
+        self._input_batches = 0
+        self.is_connected = True
+        threading.Thread(target=self._send_loop, name="pyremote-tcp-writer", daemon=True).start()
+        # 接收流水线：接收线程 -> 解密线程（屏幕等普通帧，含分片，按到达顺序）-> 分发线程；
+        # 高优先级帧（音频、输入消息）由接收线程直接解密后交给单独的高优先级分发线程，
+        # 不排在待解密、待分发的屏幕帧之后。两类帧各自在一个线程中按顺序执行回调
+        # （队列与停止事件按会话创建，重连后旧会话的线程不会读到新会话的数据）
+        self._receive_stop = stop = threading.Event()
+        decrypt_queue = queue.Queue(maxsize=FRAGMENT_QUEUE_SIZE)
+        dispatch_queue = queue.Queue(maxsize=DISPATCH_QUEUE_SIZE)
+        priority_dispatch_queue = queue.Queue(maxsize=PRIORITY_DISPATCH_QUEUE_SIZE)
+        threading.Thread(target=self._dispatch_loop, args=(dispatch_queue, stop),
+                         name="pyremote-tcp-dispatch", daemon=True).start()
+        threading.Thread(target=self._dispatch_loop, args=(priority_dispatch_queue, stop),
+                         name="pyremote-tcp-priority", daemon=True).start()
+        threading.Thread(target=self._decrypt_loop, args=(decrypt_queue, dispatch_queue, stop),
+                         name="pyremote-tcp-decrypt", daemon=True).start()
+        threading.Thread(target=self._receive_data, args=(decrypt_queue, priority_dispatch_queue, stop),
+                         name="pyremote-tcp-receiver", daemon=True).start()
+
     def _auth_exchange(self, socket=None):
-        """双向认证（RSA公钥交换）"""
+        """
+        握手（单次往返）：双方连接后立即发送Hello（公钥+随机数+能力），无需等待对方；
+        密钥确认随各自发出的第一帧数据一起发送，由接收线程校验
+        """
         target_socket = socket or self.socket
         try:
-            # 发送本地公钥
+            # 发送本地Hello（一次写入）
+            self._local_nonce = get_random_bytes(NONCE_SIZE)
             public_key = self.rsa.get_public_key_pem()
-            target_socket.sendall(len(public_key).to_bytes(4, byteorder="big"))
-            target_socket.sendall(public_key)
-            
-            # 接收对方公钥
-            peer_key_len = int.from_bytes(target_socket.recv(4), byteorder="big")
-            peer_public_key = target_socket.recv(peer_key_len)
-            self.rsa.set_peer_public_key(peer_public_key)
+            caps = json.dumps(self.capabilities).encode("utf-8")
+            target_socket.sendall(_HELLO_HEADER.pack(HELLO_MAGIC, HANDSHAKE_VERSION, self._local_nonce,
+                                                     len(public_key), len(caps)) + public_key + caps)
             
-            # 验证认证信息
-            auth_msg = self.rsa.encrypt(b"PyRemote_Auth_OK")
-            target_socket.sendall(len(auth_msg).to_bytes(4, byteorder="big"))
-            target_socket.sendall(auth_msg)
+            # 接收对方Hello
+            magic, version, peer_nonce, key_len, caps_len = _HELLO_HEADER.unpack(
+                self._recv_exact(_HELLO_HEADER.size, target_socket))
+            if magic != HELLO_MAGIC:
+                raise Exception("对方不是PyRemote客户端")
+            if version != HANDSHAKE_VERSION:
+                raise Exception(f"握手版本不兼容（本地：{HANDSHAKE_VERSION}，对方：{version}）")
+            body = self._recv_exact(key_len + caps_len, target_socket)
+            self.rsa.set_peer_public_key(body[:key_len])
+            self.peer_capabilities = json.loads(body[key_len:].decode("utf-8")) if caps_len else {}
+            peer_protocol = self.peer_capabilities.get("protocol", PROTOCOL_VERSION)
+            if peer_protocol != PROTOCOL_VERSION:
+                raise Exception(f"消息格式版本不兼容（本地：{PROTOCOL_VERSION}，对方：{peer_protocol}）")
             
-            # 验证对方认证信息
-            peer_auth_len = int.from_bytes(target_socket.recv(4), byteorder="big")
-            peer_auth_msg = self.rsa.decrypt(target_socket.recv(peer_auth_len))
-            return peer_auth_msg == b"PyRemote_Auth_OK"
+            # 密钥确认（用对方公钥加密认证信息+对方随机数，随第一帧数据发出，防重放）
+            self._key_confirmation = self.rsa.encrypt(AUTH_TOKEN + peer_nonce)
+            self._awaiting_confirmation = True
+            return True
         except Exception as e:
             print(f"认证失败：{str(e)}")
             return False
 
-    def send_data(self, data_type, data):
-        """发送数据（分块加密+校验）"""
+    def _verify_confirmation(self, frame):
+        """校验对方第一帧携带的密钥确认，返回去掉确认部分后的加密数据"""
+        conf_len = int.from_bytes(frame[:2], byteorder="big")
+        confirmation = frame[2:2 + conf_len]
+        if self.rsa.decrypt(confirmation) != AUTH_TOKEN + self._local_nonce:
+            raise Exception("对方密钥确认失败")
+        self._awaiting_confirmation = False
+        return frame[2 + conf_len:]
+
+    def _recv_exact(self, size, sock=None):
+        """精确接收size字节（慢速链路上recv可能只返回部分数据）"""
+        sock = sock or self.socket
+        buf = bytearray(size)
+        view = memoryview(buf)
+        received = 0
+        while received < size:
+            n = sock.recv_into(view[received:], size - received)
+            if n == 0:
+                raise Exception("连接中断")
+            received += n
+        return bytes(buf)
+
+    def send_data(self, data_type, data, priority=False):
+        """
+        发送数据（分块加密+校验，放入发送队列由写线程发送，线程安全）
+        :param data: 数据（bytes/memoryview，或EncodedFrame：直接从池化缓冲区视图封装，封装后即release，调用方不再使用）
+        :param priority: 高优先级（音频等小而时效性强的数据），排在已入队的普通帧之前发送，不受背压限制；
+                         输入/控制消息（含Ack）总是按高优先级发送，不会排在屏幕帧之后或阻塞在背压上
+        """
+        frame = data if isinstance(data, EncodedFrame) else None
+        priority = priority or data_type == DATA_TYPE_MESSAGE
         if not self.is_connected:
             print("未建立连接，无法发送数据")
+            if frame:
+                frame.release()
             return False
         
         try:
-            # 数据封装（类型+内容+校验和+时间戳）
-            packed_data = self.validator.pack_data(data_type, data)
-            # RSA加密
+            # 数据封装（类型+内容+校验和+时间戳），编码帧的内容在此复制一次，随后归还缓冲区
+            try:
+                packed_data = self.validator.pack_data(data_type, frame.data if frame else data)
+            finally:
+                if frame:
+                    frame.release()
+            # RSA加密（在调用方线程完成，多个生产者可并行加密）
             encrypted_data = self.rsa.encrypt(packed_data)
-            
-            # 发送数据（长度前缀+加密内容）
-            self.socket.sendall(len(encrypted_data).to_bytes(4, byteorder="big"))
-            self.socket.sendall(encrypted_data)
+        except Exception as e:
+            # 本地封装/加密失败（如调用方传入无效数据），只丢弃本帧，不影响连接
+            print(f"数据封装失败：{str(e)}")
+            return False
+
+        try:
+            # 长度前缀与加密内容入队（普通大帧拆成分片，连续入队；
+            # 高优先级帧与输入消息不分片并加高优先级标记，接收端直接解密，按发送顺序解码）
+            if priority:
+                frames = [((len(encrypted_data) | FRAME_PRIORITY).to_bytes(4, byteorder="big"), encrypted_data)]
+            elif len(encrypted_data) <= FRAGMENT_SIZE:
+                frames = [(len(encrypted_data).to_bytes(4, byteorder="big"), encrypted_data)]
+            else:
+                frames = self._fragment(encrypted_data)
+            if not self._enqueue_frames(frames, priority):
+                return False
+            if self.recorder:
+                self.recorder.record(data_type, memoryview(packed_data)[12:-32])
             return True
         except Exception as e:
             print(f"数据发送失败：{str(e)}")
-            self.is_connected = False
+            self._mark_disconnected()
             return False
 
-    def _receive_data(self):
-        """异步接收数据"""
-        while self.is_connected:
+    def send_messages(self, messages):
+        """
+        发送一批输入/控制消息（protocol中定义的消息，编码为紧凑二进制）
+        坐标基准只在入队成功后更新；发送失败（消息按高优先级发送，不受背压限制，失败通常是连接中断）时记下未送达的鼠标位置，
+        下一批消息先补发一次绝对移动，使对方光标与本地一致
+        """
+        with self._message_lock:
+            if self._resync_position is not None:
+                messages = [MouseMove(*self._resync_position)] + list(messages)
+            data, position = self.message_encoder.prepare(messages)
+            if not self.send_data(DATA_TYPE_MESSAGE, data):
+                if position != self.message_encoder.position:
+                    self._resync_position = position
+                return False
+            self.message_encoder.commit(position)
+            self._resync_position = None
+            return True
+
+    @staticmethod
+    def _fragment(encrypted_data):
+        """将加密数据拆分为分片帧：[(长度前缀含分片标记, 分片数据视图)]"""
+        view = memoryview(encrypted_data)
+        frames = []
+        for offset in range(0, len(view), FRAGMENT_SIZE):
+            part = view[offset:offset + FRAGMENT_SIZE]
+            flags = (FRAGMENT_CONT if offset else 0) | (FRAGMENT_MORE if offset + FRAGMENT_SIZE < len(view) else 0)
+            frames.append(((len(part) | flags).to_bytes(4, byteorder="big"), part))
+        return frames
+
+    def _enqueue_frames(self, frames, priority=False):
+        """帧入队（同一帧的分片在一把锁内连续入队）；队列超过字节上限时阻塞等待（背压），超时返回False"""
+        size = sum(len(header) + len(payload) for header, payload in frames)
+        with self._send_cond:
+            if priority:
+                # 高优先级帧不等待背压，插在普通帧的分片之间发送
+                if not self.is_connected:
+                    return False
+                self._priority_queue.extend(frames)
+                self._queued_bytes += size
+                self._send_cond.notify_all()
+                return True
+            # 队列为空时总是允许入队，避免单帧超过上限时永远无法发送
+            if not self._send_cond.wait_for(
+                    lambda: not self.is_connected or not self._send_queue
+                    or self._queued_bytes + size <= self.send_budget,
+                    timeout=self.send_timeout):
+                print("发送队列已满，等待超时")
+                return False
+            if not self.is_connected:
+                return False
+            self._send_queue.extend(frames)
+            self._queued_bytes += size
+            self._send_cond.notify_all()
+        return True
+
+    def _send_loop(self):
+        """写线程：按顺序发送队列中的帧（头部与内容合并为一次系统调用）"""
+        while True:
+            with self._send_cond:
+                self._send_cond.wait_for(lambda: self._priority_queue or self._send_queue or not self.is_connected)
+                if not self.is_connected:
+                    break
+                pending = self._priority_queue or self._send_queue
+                header, payload = pending.popleft()
+                confirmation, self._key_confirmation = self._key_confirmation, None
+            size = len(header) + len(payload)
+            try:
+                if confirmation:
+                    # 第一帧携带密钥确认：确认长度(2) + 确认 + 加密数据，长度前缀包含确认部分（保留分片标记）
+                    block = len(confirmation).to_bytes(2, byteorder="big") + confirmation
+                    flags = int.from_bytes(header, byteorder="big") & _FRAME_FLAGS
+                    header = ((len(block) + len(payload)) | flags).to_bytes(4, byteorder="big")
+                    self._send_frame(header, block, payload)
+                else:
+                    self._send_frame(header, payload)
+            except Exception as e:
+                print(f"数据发送失败：{str(e)}")
+                self._mark_disconnected()
+            with self._send_cond:
+                self._queued_bytes -= size
+                if not self.is_connected:
+                    self._send_queue.clear()
+                    self._priority_queue.clear()
+                    self._queued_bytes = 0
+                self._send_cond.notify_all()
+
+    def _send_frame(self, *parts):
+        """发送一帧：支持sendmsg的平台用分散/聚集写，一次系统调用发出头部和内容"""
+        if not hasattr(self.socket, "sendmsg"):  # Windows
+            self.socket.sendall(b"".join(parts))
+            return
+        buffers = [memoryview(part) for part in parts]
+        while buffers:
+            sent = self.socket.sendmsg(buffers)
+            # 处理部分发送：跳过已发送的缓冲区，截断部分发送的缓冲区
+            while sent and buffers:
+                if sent >= len(buffers[0]):
+                    sent -= len(buffers[0])
+                    buffers.pop(0)
+                else:
+                    buffers[0] = buffers[0][sent:]
+                    sent = 0
+
+    def _receive_data(self, decrypt_queue, priority_dispatch_queue, stop):
+        """
+        接收线程：高优先级帧（音频、输入消息）在本线程解密后交给高优先级分发线程，
+        其余帧（屏幕等，含分片）按到达顺序交给解密线程；到达时刻在本线程记录，不受分发排队影响
+        """
+        while self.is_connected and not stop.is_set():
             try:
-                # 接收数据长度
-                data_len = int.from_bytes(self.socket.recv(4), byteorder="big")
+                # 接收数据长度（高位为分片与优先级标记）
+                header = int.from_bytes(self._recv_exact(4), byteorder="big")
+                flags = header & _FRAME_FLAGS
+                data_len = header & ~_FRAME_FLAGS
                 if data_len <= 0:
                     raise Exception("无效数据长度")
                 
                 # 接收加密数据
-                encrypted_data = b""
-                while len(encrypted_data) < data_len:
-                    chunk = self.socket.recv(min(data_len - len(encrypted_data), 4096))
-                    if not chunk:
-                        raise Exception("连接中断")
-                    encrypted_data += chunk
+                encrypted_data = self._recv_exact(data_len)
+                arrival = time.perf_counter()
+                # 对方第一帧：先校验随帧携带的密钥确认
+                if self._awaiting_confirmation:
+                    encrypted_data = self._verify_confirmation(encrypted_data)
                 
-                # 解密+校验
-                packed_data = self.rsa.decrypt(encrypted_data)
-                if self.validator.validate_data(packed_data):
-                    data_type, data = self.validator.unpack_data(packed_data)
-                    # 调用回调函数处理数据
-                    if self.on_data_received:
-                        self.on_data_received(data_type, data)
+                if flags & FRAME_PRIORITY:
+                    self._queue_put(priority_dispatch_queue, (self.rsa.decrypt(encrypted_data), arrival), stop)
+                else:
+                    # 队列满时阻塞，对发送端形成TCP背压
+                    self._queue_put(decrypt_queue, (flags, encrypted_data, arrival), stop)
             except Exception as e:
                 print(f"数据接收失败：{str(e)}")
-                self.is_connected = False
+                self._mark_disconnected()
                 break
+        # 已接收的帧处理完后通知解密线程与高优先级分发线程退出
+        self._queue_put(priority_dispatch_queue, None, stop)
+        self._queue_put(decrypt_queue, None, stop)
+
+    def _decrypt_loop(self, decrypt_queue, dispatch_queue, stop):
+        """解密线程：逐片解密，整帧（最后一片）解密完成后交给分发线程"""
+        partial = None  # 正在接收的分片帧（已解密部分）
+        for item in self._queue_items(decrypt_queue, stop):
+            if item is None:
+                self._queue_put(dispatch_queue, None, stop)
+                break
+            flags, encrypted_data, arrival = item
+            try:
+                if not flags & FRAGMENT_CONT:
+                    partial = bytearray()
+                elif partial is None:
+                    raise Exception("分片帧缺少首个分片")
+                partial += self.rsa.decrypt(encrypted_data)
+                if not flags & FRAGMENT_MORE:
+                    packed_data, partial = bytes(partial), None
+                    self._queue_put(dispatch_queue, (packed_data, arrival), stop)
+            except Exception as e:
+                print(f"分片数据接收失败：{str(e)}")
+                self._mark_disconnected()
+                stop.set()
+                break
+
+    def _dispatch_loop(self, dispatch_queue, stop):
+        """分发线程：按顺序校验并分发解密后的帧（同一队列的回调与录像只在本线程中调用）"""
+        try:
+            for item in self._queue_items(dispatch_queue, stop):
+                if item is None:
+                    break
+                packed_data, self._dispatch_state.arrival = item
+                self._dispatch(packed_data)
+        except Exception as e:
+            print(f"数据处理失败：{str(e)}")
+            self._mark_disconnected()
+        finally:
+            stop.set()
+
+    @staticmethod
+    def _queue_put(q, item, stop):
+        """放入接收流水线队列（队列满时等待，形成背压；会话停止后放弃）"""
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    @staticmethod
+    def _queue_items(q, stop):
+        """依次取出接收流水线队列中的数据，会话停止后结束"""
+        while not stop.is_set():
+            try:
+                yield q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+    @property
+    def arrival_time(self):
+        """
+        当前分发的帧被接收线程收到的时刻（time.perf_counter()，秒）
+        只在数据/消息回调中有效，用于音频抖动缓冲等需要准确到达时刻的场景
+        """
+        return getattr(self._dispatch_state, "arrival", None)
+
+    def _dispatch(self, packed_data):
+        """校验并分发一帧解密后的数据"""
+        if not self.validator.validate_data(packed_data):
+            return
+        data_type, data = self.validator.unpack_data(packed_data)
+        if self.recorder:
+            self.recorder.record(data_type, data, inbound=True)
+        # 调用回调函数处理数据
+        if self.on_data_received:
+            self.on_data_received(data_type, data)
+        if data_type == DATA_TYPE_MESSAGE:
+            # 始终解码，保持坐标差值基准与发送端一致
+            messages = self.message_decoder.decode(data)
+            if self.on_message_received:
+                for msg in messages:
+                    self.on_message_received(msg)
+            # 只确认包含输入的批次（对方的Ack不再回复，避免互相确认）
+            if self.ack_inputs and any(type(msg) in INPUT_MESSAGES for msg in messages):
+                self._input_batches += 1
+                self.send_messages([Ack(self._input_batches)])
 
     def close(self):
         """关闭连接"""
         if self.socket:
+            try:
+                # 先关闭收发方向：唤醒阻塞在recv/accept上的线程，对方立即收到连接中断
+                # （只调用close时，本进程其他线程仍在使用该套接字，连接不会真正关闭）
+                self.socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass  # 未连接或已关闭
             self.socket.close()
-        self.is_connected = False
\ No newline at end of file
+        if self._receive_stop:
+            self._receive_stop.set()  # 停止解密与分发线程（不再分发未处理的帧）
+        self._mark_disconnected()
+
+    def _mark_disconnected(self):
+        """标记连接已断开，并唤醒写线程与等待背压的发送方（所有断开路径都经过这里）"""
+        with self._send_cond:
+            self.is_connected = False
+            self._send_cond.notify_all()
+
+
+class HostMessageHandler:
+    """
+    被控端消息处理：执行对方发来的输入消息（每批回复Ack），Resize按对方显示区域缩小画面，
+    画面缩小后鼠标绝对坐标映射回屏幕坐标（与Web输入通道InputChannelServer的处理一致）
+    多会话共用一个实例时，最近一次Resize生效
+    """
+    def __init__(self, input_control, screen_capture=None, follow_resize=True):
+        """
+        :param input_control: 输入控制实例（InputControl）
+        :param screen_capture: 屏幕捕获实例（ScreenCapture，None=不处理Resize，坐标不映射）
+        :param follow_resize: False=忽略对方Resize（画面大小由本端固定设置），坐标仍按实际缩放比例映射
+        """
+        self.input_control = input_control
+        self.screen_capture = screen_capture
+        self.follow_resize = follow_resize
+        if screen_capture:
+            input_control.coordinate_mapper = screen_capture.map_to_screen
+
+    def attach(self, session):
+        """接管会话（TCPCommunication）的消息回调并开启输入确认（会话线程启动前调用）"""
+        session.ack_inputs = True
+        session.on_message_received = self.handle_message
+
+    def handle_message(self, msg):
+        """处理一条消息（Ack等非输入消息忽略）"""
+        kind = type(msg)
+        if kind is Resize:
+            if self.screen_capture and self.follow_resize:
+                self.screen_capture.set_viewport(msg.width, msg.height, msg.dpi)
+            return
+        if kind in INPUT_MESSAGES and not self.input_control.apply_message(msg):
+            print(f"输入消息执行失败：{msg}")
@@ -0,0 +1,92 @@
+import io
+import zlib
+from PIL import Image
+from pyremote.core.tile_encoder import is_tiled_frame, iter_tiles
+
+
+class ViewportDecoder:
+    """按显示区域大小解码画面（JPEG DCT域缩放，复用目标图像，缓存未变化的分块）"""
+    def __init__(self, viewport_size):
+        """
+        :param viewport_size: 显示区域大小（宽, 高），画面按比例缩放到不超过该大小
+        """
+        self.viewport_size = viewport_size
+        self._canvas = None  # 复用的目标图像（显示区域分辨率）
+        self._source_size = None  # 当前画面原始分辨率
+        self._tile_cache = {}  # 分块位置 -> 分块数据校验值（未变化的分块跳过解码）
+        self._tile_layout = None  # 上一帧的分块布局（布局变化后缓存的分块可能已被其他分块覆盖）
+
+    def set_viewport(self, viewport_size):
+        """显示区域大小变化（下一帧重新分配目标图像）"""
+        if viewport_size != self.viewport_size:
+            self.viewport_size = viewport_size
+            self._canvas = None
+            self._reset_tiles()
+
+    def _fit_size(self, width, height):
+        """按比例计算适配显示区域的大小（不放大）"""
+        scale = min(self.viewport_size[0] / width, self.viewport_size[1] / height, 1.0)
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    def _prepare_canvas(self, source_size):
+        """原始分辨率变化时重新分配目标图像"""
+        if self._canvas is None or self._source_size != source_size:
+            self._source_size = source_size
+            self._canvas = Image.new("RGB", self._fit_size(*source_size))
+            self._reset_tiles()
+        return self._canvas
+
+    def _reset_tiles(self):
+        """清空分块缓存（目标图像不再与缓存的分块内容一致）"""
+        self._tile_cache.clear()
+        self._tile_layout = None
+
+    @staticmethod
+    def _decode_scaled(data, size):
+        """解码分块并缩放到指定大小（JPEG分块通过draft让解码器直接输出1/2、1/4、1/8分辨率）"""
+        img = Image.open(io.BytesIO(data))
+        img.draft("RGB", size)
+        if img.mode != "RGB":
+            img = img.convert("RGB")  # 调色板PNG分块需先转换，否则缩放只能用最近邻插值
+        if img.size != size:
+            img = img.resize(size, Image.BILINEAR)
+        return img
+
+    def decode(self, data):
+        """解码一帧画面，返回显示区域分辨率的图像（同一对象跨帧复用，调用方不应长期持有）"""
+        if is_tiled_frame(data):
+            return self._decode_tiles(data)
+
+        img = Image.open(io.BytesIO(data))
+        canvas = self._prepare_canvas(img.size)
+        self._reset_tiles()  # 整帧覆盖了目标图像
+        img.draft("RGB", canvas.size)
+        if img.size != canvas.size:
+            img = img.resize(canvas.size, Image.BILINEAR)
+        canvas.paste(img)
+        return canvas
+
+    def _decode_tiles(self, data):
+        """解码分块帧：只解码内容变化的分块，并合成到缓存的目标图像上"""
+        width, height, tiles = iter_tiles(data)
+        canvas = self._prepare_canvas((width, height))
+        # 混合编码的分块布局随内容变化：布局不同时，位置相同的分块也可能已被上一帧的其他分块覆盖
+        layout = tuple(tile[:4] for tile in tiles)
+        if layout != self._tile_layout:
+            self._tile_cache.clear()
+            self._tile_layout = layout
+        scale_x = canvas.width / width
+        scale_y = canvas.height / height
+        for x, y, w, h, _, tile_data in tiles:
+            key = (x, y, w, h)
+            checksum = zlib.crc32(tile_data)
+            if self._tile_cache.get(key) == checksum:
+                continue  # 分块内容未变化，目标图像中已是最新画面
+            # 分块缩放后的位置与大小（按边界取整，避免相邻分块间出现缝隙）
+            left, top = round(x * scale_x), round(y * scale_y)
+            right, bottom = round((x + w) * scale_x), round((y + h) * scale_y)
+            if right <= left or bottom <= top:
+                continue
+            canvas.paste(self._decode_scaled(tile_data, (right - left, bottom - top)), (left, top))
+            self._tile_cache[key] = checksum
+        return canvas
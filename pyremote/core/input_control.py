@@ -1,49 +1,36 @@
-import platform
-import pyautogui
-from pyremote.platform.windows import WindowsInput
-from pyremote.platform.macos import MacOSInput
-from pyremote.platform.linux import LinuxInput
-
-# 初始化PyAutoGUI配置（防故障安全设置）
-pyautogui.FAILSAFE = True  # 鼠标移到屏幕角落时停止操作
-pyautogui.PAUSE = 0.01  # 每次操作后短暂延迟，避免系统卡顿
+from pyremote.core import protocol
+from pyremote.platform import load_input_backend
 
 
 class InputControl:
     """跨平台鼠标键盘控制（自动适配系统）"""
-    def __init__(self):
-        self.platform = platform.system().lower()
-        # 初始化平台专属控制实现
-        self.input_impl = self._get_platform_impl()
+    def __init__(self, backend=None):
+        """
+        :param backend: 输入后端名称（windows/macos/linux/null，None=环境变量PYREMOTE_INPUT_BACKEND或当前系统）
+        """
+        # 初始化平台专属控制实现（按需导入，null后端不依赖显示器）
+        self.input_impl = load_input_backend(backend)
         # 获取屏幕分辨率（用于坐标适配）
-        self.screen_width, self.screen_height = pyautogui.size()
+        self.screen_width, self.screen_height = self.input_impl.size()
+        # 接收端画面坐标 -> 屏幕坐标的映射函数（画面被缩小传输时设置，如ScreenCapture.map_to_screen）
+        self.coordinate_mapper = None
 
-    def _get_platform_impl(self):
-        """根据系统选择对应控制实现"""
-        if self.platform == "windows":
-            return WindowsInput()
-        elif self.platform == "darwin":  # macOS
-            return MacOSInput()
-        elif self.platform == "linux":
-            return LinuxInput()
-        else:
-            raise Exception(f"不支持的平台：{self.platform}")
-
-    def move_mouse(self, x, y, relative=False):
+    def move_mouse(self, x, y, relative=False, duration=0.05):
         """
         移动鼠标
         :param x: 目标X坐标（绝对坐标/相对偏移）
         :param y: 目标Y坐标（绝对坐标/相对偏移）
         :param relative: True=相对当前位置，False=绝对屏幕坐标
+        :param duration: 平滑过渡时长（秒，默认0.05；连续拖动时应传0，避免每次移动都阻塞）
         """
         try:
             if relative:
-                pyautogui.moveRel(x, y, duration=0.05)  # 相对移动，0.05秒平滑过渡
+                self.input_impl.move_rel(x, y, duration=duration)  # 相对移动，平滑过渡
             else:
                 # 确保坐标在屏幕范围内（防越界）
                 x = max(0, min(x, self.screen_width - 1))
                 y = max(0, min(y, self.screen_height - 1))
-                pyautogui.moveTo(x, y, duration=0.05)
+                self.input_impl.move_to(x, y, duration=duration)
             return True
         except Exception as e:
             print(f"鼠标移动失败：{str(e)}")
@@ -56,10 +43,7 @@ class InputControl:
         :param double: True=双击，False=单击
         """
         try:
-            if double:
-                pyautogui.doubleClick(button=button)
-            else:
-                pyautogui.click(button=button)
+            self.input_impl.click(button=button, double=double)
             return True
         except Exception as e:
             print(f"鼠标点击失败：{str(e)}")
@@ -73,7 +57,7 @@ class InputControl:
         """
         try:
             scroll_amount = amount if direction == "up" else -amount
-            pyautogui.scroll(scroll_amount)
+            self.input_impl.scroll(scroll_amount)
             return True
         except Exception as e:
             print(f"鼠标滚动失败：{str(e)}")
@@ -85,13 +69,8 @@ class InputControl:
         :param key: 按键名称（参考pyautogui键位表，如'a'、'enter'、'ctrl'）
         """
         try:
-            # 处理组合键（如'ctrl+v'拆分为['ctrl', 'v']）
-            if '+' in key:
-                key_list = key.split('+')
-                with pyautogui.hold(key_list[:-1]):  # 按住组合键前缀（如ctrl）
-                    pyautogui.press(key_list[-1])     # 按下目标键（如v）
-            else:
-                pyautogui.press(key)
+            # 组合键（如'ctrl+v'）由后端拆分处理
+            self.input_impl.press(key)
             return True
         except Exception as e:
             print(f"按键按下失败：{str(e)}")
@@ -104,46 +83,74 @@ class InputControl:
         :param interval: 每个字符的输入间隔（默认0.05秒，避免输入过快）
         """
         try:
-            pyautogui.typewrite(text, interval=interval)
+            self.input_impl.type_text(text, interval=interval)
             return True
         except Exception as e:
             print(f"文本输入失败：{str(e)}")
             return False
 
+    def mouse_down(self, button="left"):
+        """鼠标按键按下（拖动开始）"""
+        try:
+            self.input_impl.mouse_down(button=button)
+            return True
+        except Exception as e:
+            print(f"鼠标按下失败：{str(e)}")
+            return False
+
+    def mouse_up(self, button="left"):
+        """鼠标按键抬起（拖动结束）"""
+        try:
+            self.input_impl.mouse_up(button=button)
+            return True
+        except Exception as e:
+            print(f"鼠标抬起失败：{str(e)}")
+            return False
 
-# 平台专属实现（以Linux为例，解决特殊权限/接口差异）
-# pyremote/platform/linux.py
-class LinuxInput:
-    def __init__(self):
-        # Linux下需要额外处理X11权限（针对屏幕控制）
-        self._check_x11_permission()
+    def key_down(self, key):
+        """按键按下（不抬起，配合key_up实现长按）"""
+        try:
+            self.input_impl.key_down(key)
+            return True
+        except Exception as e:
+            print(f"按键按下失败：{str(e)}")
+            return False
 
-    def _check_x11_permission(self):
-        """检查Linux X11显示权限（避免屏幕控制失败）"""
-        import os
-        if "DISPLAY" not in os.environ:
-            raise Exception("Linux环境缺少DISPLAY变量，无法控制输入（需X11服务）")
-        # 可选：检查xhost权限（允许当前用户访问X11）
+    def key_up(self, key):
+        """按键抬起"""
         try:
-            import subprocess
-            subprocess.run(["xhost", "+SI:localuser:$USER"], check=True, capture_output=True)
+            self.input_impl.key_up(key)
+            return True
         except Exception as e:
-            print(f"X11权限配置警告：{str(e)}（可能影响输入控制）")
+            print(f"按键抬起失败：{str(e)}")
+            return False
 
-# Windows/macOS平台实现（基础功能与PyAutoGUI兼容，可扩展特殊功能）
-# pyremote/platform/windows.py
-class WindowsInput:
-    def __init__(self):
-        # Windows下可扩展：如支持虚拟按键码（VK_CODE）
-        self.vk_codes = {
-            "ctrl": 0x11,
-            "alt": 0x12,
-            "shift": 0x10,
-            "enter": 0x0D
-        }
+    def apply_message(self, msg):
+        """
+        执行一条输入消息（pyremote.core.protocol中定义的消息）
+        :return: True=已执行，False=执行失败或不是输入消息
+        """
+        kind = type(msg)
+        if kind is protocol.MouseMove:
+            x, y = self.coordinate_mapper(msg.x, msg.y) if self.coordinate_mapper else (msg.x, msg.y)
+            return self.move_mouse(x, y, relative=False, duration=0)
+        if kind is protocol.MouseMoveRel:
+            return self.move_mouse(msg.dx, msg.dy, relative=True, duration=0)
+        if kind is protocol.MouseButton:
+            if msg.action == protocol.BUTTON_DOWN:
+                return self.mouse_down(msg.button)
+            if msg.action == protocol.BUTTON_UP:
+                return self.mouse_up(msg.button)
+            return self.click_mouse(button=msg.button, double=msg.action == protocol.BUTTON_DOUBLE_CLICK)
+        if kind is protocol.MouseScroll:
+            return self.scroll_mouse("up" if msg.amount >= 0 else "down", abs(msg.amount))
+        if kind is protocol.KeyDown:
+            return self.key_down(msg.key)
+        if kind is protocol.KeyUp:
+            return self.key_up(msg.key)
+        if kind is protocol.KeyPress:
+            return self.press_key(msg.key)
+        if kind is protocol.Text:
+            return self.type_text(msg.text, interval=0)
+        return False
 
-# pyremote/platform/macos.py
-class MacOSInput:
-    def __init__(self):
-        # macOS下特殊处理：如F1-F12按键需要按住fn键
-        self.fn_required_keys = ["f1", "f2", "f3", "f4", "f5", "f6", "f7", "f8", "f9", "f10", "f11", "f12"]
\ No newline at end of file
@@ -0,0 +1,239 @@
+from collections import namedtuple
+
+# 数据类型（DataValidator封装中的data_type字段）
+DATA_TYPE_SCREEN = 1  # 屏幕截图（JPEG或分块帧）
+DATA_TYPE_MESSAGE = 2  # 输入/控制消息（本模块定义的二进制消息，一次可携带多条）
+DATA_TYPE_AUDIO = 3  # 音频帧（格式见pyremote.core.audio，Opus或PCM）
+
+# 消息格式版本（消息批次的第1个字节）
+PROTOCOL_VERSION = 1
+
+# 消息类型（每条消息的第1个字节）
+MSG_MOUSE_MOVE = 0x01  # 绝对移动：x/y相对上一位置的差值（zigzag变长整数）
+MSG_MOUSE_MOVE_REL = 0x02  # 相对移动：dx/dy（zigzag变长整数）
+MSG_MOUSE_BUTTON = 0x03  # 鼠标按键：按键(1) + 动作(1)
+MSG_MOUSE_SCROLL = 0x04  # 滚动：幅度（zigzag变长整数，正数=上滚）
+MSG_KEY_DOWN = 0x05  # 按键按下：键名（长度+UTF-8）
+MSG_KEY_UP = 0x06  # 按键抬起：键名
+MSG_KEY_PRESS = 0x07  # 单次按键（支持组合键，如ctrl+c）：键名
+MSG_TEXT = 0x08  # 输入文本（长度+UTF-8）
+MSG_CURSOR = 0x09  # 光标位置与形状：x/y（变长整数）+ 形状(1)
+MSG_RESIZE = 0x0A  # 显示区域：宽/高/DPI（变长整数）
+MSG_STATS = 0x0B  # 统计：帧率/延迟毫秒/带宽kbps/丢帧数（变长整数）
+MSG_ACK = 0x0C  # 确认：已处理的输入消息数（变长整数）
+
+BUTTONS = ("left", "right", "middle")
+BUTTON_UP, BUTTON_DOWN, BUTTON_CLICK, BUTTON_DOUBLE_CLICK = range(4)
+
+MouseMove = namedtuple("MouseMove", "x y")
+MouseMoveRel = namedtuple("MouseMoveRel", "dx dy")
+MouseButton = namedtuple("MouseButton", "button action")
+MouseScroll = namedtuple("MouseScroll", "amount")
+KeyDown = namedtuple("KeyDown", "key")
+KeyUp = namedtuple("KeyUp", "key")
+KeyPress = namedtuple("KeyPress", "key")
+Text = namedtuple("Text", "text")
+Cursor = namedtuple("Cursor", "x y shape")
+Resize = namedtuple("Resize", "width height dpi")
+Stats = namedtuple("Stats", "fps latency_ms bandwidth_kbps dropped")
+Ack = namedtuple("Ack", "seq")
+
+# 输入类消息（接收端需回复确认）
+INPUT_MESSAGES = (MouseMove, MouseMoveRel, MouseButton, MouseScroll, KeyDown, KeyUp, KeyPress, Text)
+
+
+def _write_varint(out, value):
+    """写入无符号变长整数（每字节7位，最高位=后续还有字节）"""
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    """读取无符号变长整数：返回（值，新位置）"""
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _zigzag(value):
+    """有符号整数映射为无符号（小绝对值的负数也只占1字节）"""
+    return (value << 1) ^ (value >> 63)
+
+
+def _unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def _write_str(out, text):
+    raw = text.encode("utf-8")
+    _write_varint(out, len(raw))
+    out += raw
+
+
+def _read_str(data, pos):
+    length, pos = _read_varint(data, pos)
+    return bytes(data[pos:pos + length]).decode("utf-8"), pos + length
+
+
+class MessageEncoder:
+    """消息编码器（有状态：绝对坐标按与上一位置的差值编码，每个连接使用独立实例）"""
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """新连接时重置坐标基准"""
+        self._last_x = 0
+        self._last_y = 0
+
+    @property
+    def position(self):
+        """当前坐标基准（对方已收到的最后一个绝对位置）"""
+        return self._last_x, self._last_y
+
+    def encode(self, messages):
+        """编码一批消息，返回bytes（立即更新坐标基准）"""
+        data, position = self.prepare(messages)
+        self.commit(position)
+        return data
+
+    def prepare(self, messages):
+        """
+        编码一批消息但不更新坐标基准（发送可能失败时使用，确认发出后再调用commit）
+        :return: （bytes, 编码后的坐标基准）
+        """
+        out = bytearray((PROTOCOL_VERSION,))
+        position = self.position
+        for msg in messages:
+            position = self._encode_one(out, msg, position)
+        return bytes(out), position
+
+    def commit(self, position):
+        """消息已发出：更新坐标基准"""
+        self._last_x, self._last_y = position
+
+    def _encode_one(self, out, msg, position):
+        """编码一条消息，返回编码后的坐标基准"""
+        kind = type(msg)
+        if kind is MouseMove:
+            out.append(MSG_MOUSE_MOVE)
+            _write_varint(out, _zigzag(msg.x - position[0]))
+            _write_varint(out, _zigzag(msg.y - position[1]))
+            return msg.x, msg.y
+        elif kind is MouseMoveRel:
+            out.append(MSG_MOUSE_MOVE_REL)
+            _write_varint(out, _zigzag(msg.dx))
+            _write_varint(out, _zigzag(msg.dy))
+        elif kind is MouseButton:
+            out.append(MSG_MOUSE_BUTTON)
+            out.append(BUTTONS.index(msg.button))
+            out.append(msg.action)
+        elif kind is MouseScroll:
+            out.append(MSG_MOUSE_SCROLL)
+            _write_varint(out, _zigzag(msg.amount))
+        elif kind is KeyDown:
+            out.append(MSG_KEY_DOWN)
+            _write_str(out, msg.key)
+        elif kind is KeyUp:
+            out.append(MSG_KEY_UP)
+            _write_str(out, msg.key)
+        elif kind is KeyPress:
+            out.append(MSG_KEY_PRESS)
+            _write_str(out, msg.key)
+        elif kind is Text:
+            out.append(MSG_TEXT)
+            _write_str(out, msg.text)
+        elif kind is Cursor:
+            out.append(MSG_CURSOR)
+            _write_varint(out, msg.x)
+            _write_varint(out, msg.y)
+            out.append(msg.shape)
+        elif kind is Resize:
+            out.append(MSG_RESIZE)
+            _write_varint(out, msg.width)
+            _write_varint(out, msg.height)
+            _write_varint(out, msg.dpi)
+        elif kind is Stats:
+            out.append(MSG_STATS)
+            for value in msg:
+                _write_varint(out, value)
+        elif kind is Ack:
+            out.append(MSG_ACK)
+            _write_varint(out, msg.seq)
+        else:
+            raise Exception(f"不支持的消息类型：{kind.__name__}")
+        return position
+
+
+class MessageDecoder:
+    """消息解码器（与MessageEncoder对应，每个连接使用独立实例）"""
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """新连接时重置坐标基准"""
+        self._last_x = 0
+        self._last_y = 0
+
+    def decode(self, data):
+        """解码一批消息，返回消息列表"""
+        if not data:
+            return []
+        if data[0] != PROTOCOL_VERSION:
+            raise Exception(f"不支持的消息版本：{data[0]}")
+        messages = []
+        pos, end = 1, len(data)
+        while pos < end:
+            kind = data[pos]
+            pos += 1
+            if kind == MSG_MOUSE_MOVE:
+                dx, pos = _read_varint(data, pos)
+                dy, pos = _read_varint(data, pos)
+                self._last_x += _unzigzag(dx)
+                self._last_y += _unzigzag(dy)
+                messages.append(MouseMove(self._last_x, self._last_y))
+            elif kind == MSG_MOUSE_MOVE_REL:
+                dx, pos = _read_varint(data, pos)
+                dy, pos = _read_varint(data, pos)
+                messages.append(MouseMoveRel(_unzigzag(dx), _unzigzag(dy)))
+            elif kind == MSG_MOUSE_BUTTON:
+                messages.append(MouseButton(BUTTONS[data[pos]], data[pos + 1]))
+                pos += 2
+            elif kind == MSG_MOUSE_SCROLL:
+                amount, pos = _read_varint(data, pos)
+                messages.append(MouseScroll(_unzigzag(amount)))
+            elif kind in (MSG_KEY_DOWN, MSG_KEY_UP, MSG_KEY_PRESS):
+                key, pos = _read_str(data, pos)
+                cls = KeyDown if kind == MSG_KEY_DOWN else KeyUp if kind == MSG_KEY_UP else KeyPress
+                messages.append(cls(key))
+            elif kind == MSG_TEXT:
+                text, pos = _read_str(data, pos)
+                messages.append(Text(text))
+            elif kind == MSG_CURSOR:
+                x, pos = _read_varint(data, pos)
+                y, pos = _read_varint(data, pos)
+                messages.append(Cursor(x, y, data[pos]))
+                pos += 1
+            elif kind == MSG_RESIZE:
+                width, pos = _read_varint(data, pos)
+                height, pos = _read_varint(data, pos)
+                dpi, pos = _read_varint(data, pos)
+                messages.append(Resize(width, height, dpi))
+            elif kind == MSG_STATS:
+                values = []
+                for _ in Stats._fields:
+                    value, pos = _read_varint(data, pos)
+                    values.append(value)
+                messages.append(Stats(*values))
+            elif kind == MSG_ACK:
+                seq, pos = _read_varint(data, pos)
+                messages.append(Ack(seq))
+            else:
+                raise Exception(f"未知消息类型：{kind}")
+        return messages
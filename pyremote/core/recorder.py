@@ -0,0 +1,257 @@
+import bisect
+import mmap
+import queue
+import struct
+import threading
+import time
+from pyremote.core.protocol import DATA_TYPE_SCREEN
+
+# 录像文件格式（追加写入）：
+#   文件头：魔数(4) + 版本(1) + 保留(3) + 起始时间(8，秒，double)
+#   记录：标记(1) + 标志位(1) + 数据类型(4) + 相对时间戳(8，微秒) + 内容长度(4) + 内容
+#   结尾：索引记录（关键帧时间戳+偏移量）+ 尾部（索引偏移(8) + 条目数(4) + 魔数(4)）
+FILE_MAGIC = b"PRRC"
+INDEX_MAGIC = b"PRIX"
+FILE_VERSION = 1
+
+_FILE_HEADER = struct.Struct(">4sB3xd")
+_RECORD_HEADER = struct.Struct(">BBIQI")
+_INDEX_ENTRY = struct.Struct(">QQ")
+_TRAILER = struct.Struct(">QI4s")
+
+TAG_FRAME = 1  # 数据帧（屏幕截图/输入等）
+TAG_INDEX = 2  # 关键帧索引
+
+FLAG_KEYFRAME = 0x01  # 关键帧（可独立解码，作为跳转起点）
+FLAG_INBOUND = 0x02  # 接收方向（未设置=发送方向）
+
+
+class SessionRecorder:
+    """会话录像（后台线程写入，不阻塞实时会话）"""
+    def __init__(self, path, keyframe_interval=2.0, keyframe_types=(DATA_TYPE_SCREEN,), max_queue=512):
+        """
+        :param path: 录像文件路径
+        :param keyframe_interval: 关键帧最小间隔（秒），决定跳转时最多需要顺序扫描的时长
+        :param keyframe_types: 可作为关键帧的数据类型（默认为屏幕截图，每帧均为完整JPEG）
+        :param max_queue: 写入队列长度上限（队列满时丢弃新帧，绝不阻塞调用方）
+        """
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self.keyframe_types = set(keyframe_types)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._writer_thread = None
+        self._start_time = None
+        self._index = []  # [(相对时间戳微秒, 文件偏移)]
+        self.dropped_frames = 0  # 队列满被丢弃的帧数
+        self.is_recording = False
+
+    def start(self):
+        """开始录像（创建文件并启动后台写入线程）"""
+        if self.is_recording:
+            return True
+        try:
+            # 1MB缓冲区：小帧合并为大块顺序写
+            self._file = open(self.path, "wb", buffering=1 << 20)
+            self._start_time = time.time()
+            self._index = []
+            self._file.write(_FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, self._start_time))
+            self.is_recording = True
+            self._writer_thread = threading.Thread(target=self._write_loop, name="pyremote-recorder",
+                                                   daemon=True)
+            self._writer_thread.start()
+            return True
+        except Exception as e:
+            print(f"录像启动失败：{str(e)}")
+            return False
+
+    def record(self, data_type, data, inbound=False):
+        """记录一帧（仅入队，实际写入在后台线程完成）"""
+        if not self.is_recording:
+            return False
+        flags = FLAG_INBOUND if inbound else 0
+        try:
+            # memoryview等可变缓冲区需复制，避免调用方复用缓冲区后内容被覆盖
+            if not isinstance(data, bytes):
+                data = bytes(data)
+            self._queue.put_nowait((time.time(), int(data_type), flags, data))
+            return True
+        except queue.Full:
+            self.dropped_frames += 1
+            return False
+
+    def _write_loop(self):
+        """后台写入循环（队列中的None表示停止）"""
+        last_keyframe_us = None
+        offset = self._file.tell()
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            timestamp, data_type, flags, data = item
+            ts_us = max(0, int((timestamp - self._start_time) * 1_000_000))
+            # 周期性关键帧：同类型帧间隔超过keyframe_interval时标记并加入索引
+            if data_type in self.keyframe_types and (
+                    last_keyframe_us is None
+                    or ts_us - last_keyframe_us >= self.keyframe_interval * 1_000_000):
+                flags |= FLAG_KEYFRAME
+                last_keyframe_us = ts_us
+            try:
+                self._file.write(_RECORD_HEADER.pack(TAG_FRAME, flags, data_type, ts_us, len(data)))
+                self._file.write(data)
+                if flags & FLAG_KEYFRAME:
+                    self._index.append((ts_us, offset))
+                offset += _RECORD_HEADER.size + len(data)
+            except Exception as e:
+                print(f"录像写入失败：{str(e)}")
+                self.is_recording = False
+                break
+
+    def stop(self):
+        """停止录像（写入剩余帧、关键帧索引和文件尾；写入线程已因错误退出时只关闭文件）"""
+        if self._writer_thread is None:
+            return
+        self.is_recording = False
+        writer, self._writer_thread = self._writer_thread, None
+        if writer.is_alive():
+            self._queue.put(None)
+        writer.join()
+        try:
+            index_offset = self._file.tell()
+            index_data = b"".join(_INDEX_ENTRY.pack(ts, off) for ts, off in self._index)
+            self._file.write(_RECORD_HEADER.pack(TAG_INDEX, 0, 0, 0, len(index_data)))
+            self._file.write(index_data)
+            self._file.write(_TRAILER.pack(index_offset, len(self._index), INDEX_MAGIC))
+        except Exception as e:
+            print(f"录像索引写入失败：{str(e)}")
+        finally:
+            try:
+                self._file.close()
+            except Exception as e:  # 关闭时刷新缓冲区失败（如磁盘已满），文件句柄仍会释放
+                print(f"录像文件关闭失败：{str(e)}")
+
+
+class RecordedFrame:
+    """录像中的一帧（payload为内存映射上的只读视图，不复制数据）"""
+    __slots__ = ("timestamp", "data_type", "flags", "payload")
+
+    def __init__(self, timestamp, data_type, flags, payload):
+        self.timestamp = timestamp  # 相对录像开始的秒数
+        self.data_type = data_type
+        self.flags = flags
+        self.payload = payload
+
+    @property
+    def is_keyframe(self):
+        return bool(self.flags & FLAG_KEYFRAME)
+
+    @property
+    def inbound(self):
+        return bool(self.flags & FLAG_INBOUND)
+
+
+class SessionPlayer:
+    """录像回放（内存映射文件，按关键帧索引二分查找实现O(log n)跳转）"""
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.start_time = _FILE_HEADER.unpack_from(self._mmap, 0)
+        if magic != FILE_MAGIC:
+            self.close()
+            raise Exception(f"不是有效的录像文件：{path}")
+        if version != FILE_VERSION:
+            self.close()
+            raise Exception(f"不支持的录像版本：{version}")
+        self._data_end = len(self._mmap)
+        self._key_times, self._key_offsets = self._load_index()
+        self._duration = self._last_timestamp()
+
+    def _load_index(self):
+        """读取文件尾的关键帧索引；文件未正常结束（如进程崩溃）时扫描重建"""
+        size = len(self._mmap)
+        if size >= _FILE_HEADER.size + _TRAILER.size:
+            index_offset, count, magic = _TRAILER.unpack_from(self._mmap, size - _TRAILER.size)
+            if magic == INDEX_MAGIC:
+                self._data_end = index_offset
+                start = index_offset + _RECORD_HEADER.size
+                times, offsets = [], []
+                for i in range(count):
+                    ts, off = _INDEX_ENTRY.unpack_from(self._mmap, start + i * _INDEX_ENTRY.size)
+                    times.append(ts)
+                    offsets.append(off)
+                return times, offsets
+        return self._rebuild_index()
+
+    def _rebuild_index(self):
+        """顺序扫描记录重建索引（仅用于未正常关闭的录像）"""
+        times, offsets = [], []
+        offset = _FILE_HEADER.size
+        size = len(self._mmap)
+        while offset + _RECORD_HEADER.size <= size:
+            tag, flags, _, ts_us, length = _RECORD_HEADER.unpack_from(self._mmap, offset)
+            if tag != TAG_FRAME or offset + _RECORD_HEADER.size + length > size:
+                break  # 末尾不完整记录
+            if flags & FLAG_KEYFRAME:
+                times.append(ts_us)
+                offsets.append(offset)
+            offset += _RECORD_HEADER.size + length
+        self._data_end = offset
+        return times, offsets
+
+    @property
+    def keyframe_count(self):
+        return len(self._key_times)
+
+    @property
+    def duration(self):
+        """录像时长（秒，最后一条记录的时间戳）"""
+        return self._duration
+
+    def _last_timestamp(self):
+        """最后一条记录的时间戳（从最后一个关键帧开始扫描，最多扫描一个关键帧间隔）"""
+        offset = self._key_offsets[-1] if self._key_offsets else _FILE_HEADER.size
+        last = 0.0
+        for frame in self._iter_frames(offset):
+            last = frame.timestamp
+        return last
+
+    def _keyframe_offset(self, timestamp):
+        """二分查找不晚于timestamp的最近关键帧偏移量"""
+        i = bisect.bisect_right(self._key_times, int(timestamp * 1_000_000)) - 1
+        if i < 0:
+            return _FILE_HEADER.size
+        return self._key_offsets[i]
+
+    def frames(self, start=0.0):
+        """从不晚于start的最近关键帧开始顺序迭代帧"""
+        offset = self._keyframe_offset(start) if start > 0 else _FILE_HEADER.size
+        return self._iter_frames(offset)
+
+    def _iter_frames(self, offset):
+        """从指定偏移量开始顺序迭代帧"""
+        view = memoryview(self._mmap)
+        while offset + _RECORD_HEADER.size <= self._data_end:
+            tag, flags, data_type, ts_us, length = _RECORD_HEADER.unpack_from(self._mmap, offset)
+            if tag != TAG_FRAME:
+                break
+            begin = offset + _RECORD_HEADER.size
+            yield RecordedFrame(ts_us / 1_000_000, data_type, flags, view[begin:begin + length])
+            offset = begin + length
+
+    def frame_at(self, timestamp, data_type=DATA_TYPE_SCREEN):
+        """获取timestamp时刻显示的帧（不晚于该时刻的最后一帧指定类型数据）"""
+        result = None
+        for frame in self.frames(timestamp):
+            if frame.timestamp > timestamp:
+                break
+            if frame.data_type == data_type:
+                result = frame
+        return result
+
+    def close(self):
+        """关闭录像文件"""
+        try:
+            self._mmap.close()
+        except (BufferError, ValueError):
+            pass  # 仍有帧视图被引用，交由GC回收
+        self._file.close()
@@ -1,38 +1,121 @@
-import platform
-from PIL import ImageGrab, Image
-from pyremote.platform.windows import WindowsScreen
-from pyremote.platform.macos import MacOSScreen
-from pyremote.platform.linux import LinuxScreen
+import os
+from PIL import Image
+from pyremote.core.tile_encoder import ParallelTileEncoder, HybridTileEncoder
+from pyremote.core.buffer_pool import EncodeBufferPool, EncodedFrame
+from pyremote.platform import load_screen_backend
+
+# 屏幕编码方式：jpeg=整帧JPEG，parallel=大画面分块并行JPEG，hybrid=按内容混合编码（后两者为分块帧）
+ENCODINGS = ("jpeg", "parallel", "hybrid")
+ENCODING_ENV = "PYREMOTE_ENCODING"
+
+
+def encoding_options(name=None):
+    """
+    编码方式对应的ScreenCapture参数
+    :param name: 编码方式（None=环境变量PYREMOTE_ENCODING，未设置时为jpeg）
+    """
+    name = name or os.environ.get(ENCODING_ENV) or "jpeg"
+    if name not in ENCODINGS:
+        raise Exception(f"未知的编码方式：{name}（可选：{'、'.join(ENCODINGS)}）")
+    return {"parallel_encoding": name == "parallel", "hybrid_encoding": name == "hybrid"}
+
 
 class ScreenCapture:
     """跨平台屏幕捕获（自动适配系统）"""
-    def __init__(self):
-        self.platform = platform.system().lower()
-        # 初始化对应平台的捕获实现
-        self.screen_impl = self._get_platform_impl()
-
-    def _get_platform_impl(self):
-        """获取平台-specific实现"""
-        if self.platform == "windows":
-            return WindowsScreen()
-        elif self.platform == "darwin":  # macOS
-            return MacOSScreen()
-        elif self.platform == "linux":
-            return LinuxScreen()
+    def __init__(self, parallel_encoding=False, encode_workers=None, hybrid_encoding=False, backend=None):
+        """
+        :param parallel_encoding: 大画面（4K/多屏幕）是否分块并行编码（接收端需用decode_frame解码）
+        :param encode_workers: 并行编码线程数（默认=CPU核数）
+        :param hybrid_encoding: 是否按内容混合编码（文字/界面区域无损PNG，照片区域JPEG，同样为分块帧）
+        :param backend: 屏幕捕获后端名称（windows/macos/linux/synthetic，None=环境变量PYREMOTE_SCREEN_BACKEND或当前系统）
+        """
+        # 初始化对应平台的捕获实现（按需导入，synthetic后端不依赖显示器）
+        self.screen_impl = load_screen_backend(backend)
+        # 分块并行编码器（可选）
+        if hybrid_encoding:
+            self.tile_encoder = HybridTileEncoder(workers=encode_workers)
+        elif parallel_encoding:
+            self.tile_encoder = ParallelTileEncoder(workers=encode_workers)
         else:
-            raise Exception(f"不支持的平台：{self.platform}")
+            self.tile_encoder = None
+        # 分块帧要求对方支持的编码（对方握手时在capabilities["codecs"]中声明）
+        if hybrid_encoding:
+            self.tile_codecs = frozenset(("tiles", "jpeg", "png"))
+        elif parallel_encoding:
+            self.tile_codecs = frozenset(("tiles", "jpeg"))
+        else:
+            self.tile_codecs = frozenset()
+        self._whole_frame_bytes = 0  # 整帧JPEG编码累计输出字节数
+        # 编码缓冲池（输出缓冲区与RGB转换目标跨帧复用）
+        self.buffer_pool = EncodeBufferPool()
+        # 接收端显示区域（宽, 高），设置后全屏画面在编码前缩小到该大小
+        self.viewport = None
+        self.viewport_dpi = 96
+        self._scale = (1.0, 1.0)  # 最近一帧：屏幕坐标 / 画面坐标
+
+    def supports_peer(self, capabilities):
+        """对方（握手交换的capabilities）能否解码本端输出的分块帧（不分块编码时总是True）"""
+        return self.tile_codecs <= set(capabilities.get("codecs", ()))
 
-    def capture_full_screen(self):
-        """捕获全屏"""
+    def capture_full_screen(self, tiles=True):
+        """
+        捕获全屏
+        :param tiles: False=只输出整帧JPEG（对方不支持分块帧，如浏览器）
+        """
         try:
             # 调用平台-specific方法
             img = self.screen_impl.capture_full()
+            img = self._fit_viewport(img)
             # 压缩图像（降低传输带宽）
-            return self._compress_image(img)
+            return self._compress_image(img, tiles=tiles)
+        except Exception as e:
+            print(f"全屏捕获失败：{str(e)}")
+            return None
+
+    def capture_full_screen_frame(self, tiles=True):
+        """
+        捕获全屏（池化编码，返回EncodedFrame，发送完成后需调用release归还缓冲区）
+        :param tiles: False=只输出整帧JPEG（对方不支持分块帧，如浏览器）
+        """
+        try:
+            img = self.screen_impl.capture_full()
+            return self._compress_image_pooled(self._fit_viewport(img), tiles=tiles)
         except Exception as e:
             print(f"全屏捕获失败：{str(e)}")
             return None
 
+    def set_viewport(self, width, height, dpi=96):
+        """
+        设置接收端显示区域（连接时及接收端窗口大小变化时调用）
+        :param width: 显示区域宽度（像素，<=0表示取消缩放）
+        :param height: 显示区域高度（像素）
+        :param dpi: 接收端屏幕DPI
+        """
+        self.viewport = (width, height) if width > 0 and height > 0 else None
+        self.viewport_dpi = dpi
+
+    def _fit_viewport(self, img):
+        """按接收端显示区域缩小画面（不放大），并记录坐标映射比例"""
+        width, height = img.size
+        scale = min(self.viewport[0] / width, self.viewport[1] / height) if self.viewport else 1.0
+        if scale >= 1.0:
+            self._scale = (1.0, 1.0)
+            return img
+        target = (max(1, round(width * scale)), max(1, round(height * scale)))
+        # 先按整数倍盒式缩小（最快），剩余比例再用双线性插值
+        factor = int(1 / scale)
+        if factor >= 2:
+            img = img.reduce(factor)
+        if img.size != target:
+            img = img.resize(target, Image.BILINEAR)
+        self._scale = (width / target[0], height / target[1])
+        return img
+
+    def map_to_screen(self, x, y):
+        """将接收端画面坐标映射回屏幕坐标（供鼠标移动使用）"""
+        scale_x, scale_y = self._scale
+        return int(x * scale_x), int(y * scale_y)
+
     def capture_region(self, x, y, width, height):
         """捕获指定区域（x,y: 左上角坐标）"""
         try:
@@ -42,24 +125,29 @@ class ScreenCapture:
             print(f"区域捕获失败：{str(e)}")
             return None
 
-    def _compress_image(self, img, quality=60):
+    def _compress_image(self, img, quality=60, tiles=True):
         """压缩图像（JPEG格式）"""
-        if img.mode in ("RGBA", "P"):
-            img = img.convert("RGB")
-        # 内存中保存为JPEG
-        import io
-        img_byte_arr = io.BytesIO()
-        img.save(img_byte_arr, format="JPEG", quality=quality)
-        return img_byte_arr.getvalue()
+        # 大画面拆分为条带并行编码
+        if tiles and self.tile_encoder and self.tile_encoder.should_split(img):
+            return self.tile_encoder.encode(img, quality=quality)
+        with self._compress_image_pooled(img, quality, tiles=False) as frame:
+            return bytes(frame.data)
 
-# 平台-specific实现（以Windows为例，其他平台类似）
-# pyremote/platform/windows.py
-class WindowsScreen:
-    def capture_full(self):
-        """Windows全屏捕获（Pillow+Windows API）"""
-        return ImageGrab.grab(all_screens=True)  # 支持多屏幕
+    def _compress_image_pooled(self, img, quality=60, tiles=True):
+        """压缩图像到池化缓冲区（不分配新缓冲区，不复制编码数据）"""
+        # 大画面拆分为条带并行编码
+        if tiles and self.tile_encoder and self.tile_encoder.should_split(img):
+            return EncodedFrame(self.tile_encoder.encode(img, quality=quality))
+        img = self.buffer_pool.to_rgb(img)
+        # 内存中保存为JPEG
+        frame = self.buffer_pool.encode(img, format="JPEG", quality=quality)
+        self._whole_frame_bytes += len(frame)
+        return frame
 
-    def capture_region(self, x, y, width, height):
-        """Windows区域捕获"""
-        bbox = (x, y, x + width, y + height)
-        return ImageGrab.grab(bbox=bbox)
\ No newline at end of file
+    def get_codec_stats(self):
+        """各编码方式累计输出字节数（如{"jpeg": ..., "png": ...}，用于对比混合编码的带宽）"""
+        stats = {"jpeg": self._whole_frame_bytes}
+        if self.tile_encoder:
+            for codec, size in self.tile_encoder.codec_bytes.items():
+                stats[codec] = stats.get(codec, 0) + size
+        return stats
@@ -6,9 +6,12 @@ from Crypto.Random import get_random_bytes
 
 class RSAEncryptor:
     """RSA非对称加密实现"""
-    def __init__(self):
+    def __init__(self, key_pair=None):
+        """
+        :param key_pair: 已有的密钥对（多会话服务端各会话共用，避免每个连接重新生成）
+        """
         # 生成RSA密钥对（2048位）
-        self.key_pair = RSA.generate(2048)
+        self.key_pair = key_pair or RSA.generate(2048)
         self.peer_public_key = None
         self.public_cipher = None  # 加密用（对方公钥）
         self.private_cipher = PKCS1_OAEP.new(self.key_pair)  # 解密用（本地私钥）
@@ -52,15 +55,24 @@ class DataValidator:
         self.timestamp_window = 30  # 时间戳有效期（秒）
 
     def pack_data(self, data_type, data):
-        """封装数据：类型(4字节) + 时间戳(8字节) + 内容 + 校验和(32字节)"""
+        """
+        封装数据：类型(4字节) + 时间戳(8字节) + 内容 + 校验和(32字节)
+        data可为bytes或memoryview（如池化编码缓冲区的视图），内容只复制一次到返回的bytearray中
+        """
         # 数据类型（整数，4字节）
         type_bytes = int(data_type).to_bytes(4, byteorder="big")
         # 时间戳（毫秒级，8字节）
         timestamp = int(time.time() * 1000).to_bytes(8, byteorder="big")
-        # 校验和（SHA-256）
-        checksum = hashlib.sha256(type_bytes + timestamp + data).digest()
+        # 校验和（SHA-256，分段计算，不拼接临时数据）
+        checksum = hashlib.sha256(type_bytes)
+        checksum.update(timestamp)
+        checksum.update(data)
         # 拼接数据
-        return type_bytes + timestamp + data + checksum
+        packed = bytearray(type_bytes)
+        packed += timestamp
+        packed += data
+        packed += checksum.digest()
+        return packed
 
     def unpack_data(self, packed_data):
         """解封装数据：返回（数据类型，内容）"""
@@ -0,0 +1,182 @@
+import heapq
+import io
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+# 分块帧格式：魔数(4) + 版本(1) + 宽(2) + 高(2) + 分块数(2)
+#   每个分块：x(2) + y(2) + 宽(2) + 高(2) + 编码(1) + 长度(4) + 编码数据（可独立解码）
+TILE_MAGIC = b"PRTL"
+TILE_VERSION = 1
+
+_FRAME_HEADER = struct.Struct(">4sBHHH")
+_TILE_HEADER = struct.Struct(">HHHHBI")
+
+CODEC_JPEG = 1  # 有损（照片、视频区域）
+CODEC_PNG = 2  # 无损调色板（文字、界面等颜色较少的区域）
+CODEC_NAMES = {CODEC_JPEG: "jpeg", CODEC_PNG: "png"}
+
+# JPEG最小编码单元（MCU）为16像素，分块边界按此对齐避免接缝处出现色块
+_MCU_SIZE = 16
+# 文字区域判定：统计占比的主要颜色数（背景+几种文字颜色）
+_DOMINANT_COLORS = 8
+
+
+class ParallelTileEncoder:
+    """多线程分块编码（大画面拆分为横向条带，在线程池中并行JPEG编码）"""
+    def __init__(self, workers=None, min_pixels=1920 * 1080 * 2):
+        """
+        :param workers: 编码线程数（默认=CPU核数）
+        :param min_pixels: 启用分块编码的最小像素数（默认约等于双1080p屏幕，小画面直接整帧编码更快）
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.min_pixels = min_pixels
+        # Pillow编码时释放GIL，线程间共享同一份原始画面，无需进程间复制
+        self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                            thread_name_prefix="pyremote-encoder")
+        # 各编码方式累计输出字节数与分块数（用于对比带宽）
+        self.codec_bytes = {name: 0 for name in CODEC_NAMES.values()}
+        self.codec_tiles = {name: 0 for name in CODEC_NAMES.values()}
+
+    def should_split(self, img):
+        """画面是否足够大（值得分块并行编码）"""
+        return self.workers > 1 and img.width * img.height >= self.min_pixels
+
+    def _stripe_boxes(self, width, height):
+        """按线程数计算条带区域（高度按MCU对齐）"""
+        stripe_height = -(-height // self.workers)
+        stripe_height = -(-stripe_height // _MCU_SIZE) * _MCU_SIZE
+        return [(0, y, width, min(y + stripe_height, height)) for y in range(0, height, stripe_height)]
+
+    def _plan(self, img):
+        """规划分块：返回[(区域, 编码方式)]"""
+        return [(box, CODEC_JPEG) for box in self._stripe_boxes(*img.size)]
+
+    @staticmethod
+    def _encode_tile(img, box, codec, quality):
+        """编码单个分块（在线程池中执行）"""
+        tile = img.crop(box)
+        if tile.mode != "RGB":
+            tile = tile.convert("RGB")
+        buf = io.BytesIO()
+        if codec == CODEC_PNG:
+            # 颜色数不超过调色板大小时中位切分量化是精确的（无损），否则保存RGB（同样无损）
+            colors = tile.getcolors(maxcolors=256)
+            tile = tile.quantize(colors=len(colors)) if colors else tile
+            tile.save(buf, format="PNG", compress_level=3)
+        else:
+            tile.save(buf, format="JPEG", quality=quality)
+        return buf.getvalue()
+
+    def encode(self, img, quality=60):
+        """分块并行编码，返回分块帧数据"""
+        width, height = img.size
+        plan = self._plan(img)
+        futures = [self._executor.submit(self._encode_tile, img, box, codec, quality) for box, codec in plan]
+
+        parts = [_FRAME_HEADER.pack(TILE_MAGIC, TILE_VERSION, width, height, len(plan))]
+        for (box, codec), future in zip(plan, futures):
+            data = future.result()
+            x0, y0, x1, y1 = box
+            parts.append(_TILE_HEADER.pack(x0, y0, x1 - x0, y1 - y0, codec, len(data)))
+            parts.append(data)
+            self.codec_bytes[CODEC_NAMES[codec]] += len(data)
+            self.codec_tiles[CODEC_NAMES[codec]] += 1
+        return b"".join(parts)
+
+    def close(self):
+        """关闭编码线程池"""
+        self._executor.shutdown(wait=False)
+
+
+class HybridTileEncoder(ParallelTileEncoder):
+    """
+    内容自适应混合编码：画面按网格划分，文字、界面、纯色背景区域用无损PNG，
+    照片、视频区域用JPEG；同一行内相邻的同类网格合并为一个分块，减少每块的头部开销
+    """
+    def __init__(self, workers=None, grid_size=128, max_colors=128, max_text_colors=4096, dominant_ratio=0.5):
+        """
+        :param grid_size: 分类网格大小（像素，按MCU对齐）
+        :param max_colors: 颜色数不超过该值的网格视为界面/纯色区域
+        :param max_text_colors: 颜色数超过max_colors但不超过该值、且主要颜色占比不低于dominant_ratio的网格视为文字区域
+                                （抗锯齿文字边缘有数百种过渡色，但背景与文字颜色仍占大部分像素；照片的颜色分散）
+        :param dominant_ratio: 主要颜色（出现最多的8种）占网格像素的最低比例
+        """
+        super().__init__(workers=workers, min_pixels=0)
+        self.grid_size = -(-grid_size // _MCU_SIZE) * _MCU_SIZE
+        self.max_colors = max_colors
+        self.max_text_colors = max(max_colors, max_text_colors)
+        self.dominant_ratio = dominant_ratio
+
+    def should_split(self, img):
+        """混合编码总是分块（小画面同样需要区分文字与照片区域）"""
+        return True
+
+    def _is_lossless_cell(self, cell):
+        """网格是否为文字/界面区域（getcolors在C层统计颜色，超过max_text_colors即提前返回None）"""
+        colors = cell.getcolors(maxcolors=self.max_text_colors)
+        if not colors:
+            return False
+        if len(colors) <= self.max_colors:
+            return True
+        dominant = sum(heapq.nlargest(_DOMINANT_COLORS, (count for count, _ in colors)))
+        return dominant >= self.dominant_ratio * cell.width * cell.height
+
+    def _classify_row(self, img, y0, y1):
+        """对一行网格分类"""
+        codecs = []
+        for x0 in range(0, img.width, self.grid_size):
+            cell = img.crop((x0, y0, min(x0 + self.grid_size, img.width), y1))
+            codecs.append(CODEC_PNG if self._is_lossless_cell(cell) else CODEC_JPEG)
+        return codecs
+
+    def _plan(self, img):
+        """按行并行分类，并将同一行内连续的同类网格合并"""
+        rows = [(y, min(y + self.grid_size, img.height)) for y in range(0, img.height, self.grid_size)]
+        futures = [self._executor.submit(self._classify_row, img, y0, y1) for y0, y1 in rows]
+        plan = []
+        for (y0, y1), future in zip(rows, futures):
+            start = 0
+            codecs = future.result()
+            for i in range(1, len(codecs) + 1):
+                if i == len(codecs) or codecs[i] != codecs[start]:
+                    x0 = start * self.grid_size
+                    x1 = min(i * self.grid_size, img.width)
+                    plan.append(((x0, y0, x1, y1), codecs[start]))
+                    start = i
+        return plan
+
+
+def is_tiled_frame(data):
+    """判断是否为分块帧"""
+    return bytes(data[:4]) == TILE_MAGIC
+
+
+def iter_tiles(data):
+    """解析分块帧：返回（宽, 高, [(x, y, 宽, 高, 编码, 数据)]）"""
+    magic, version, width, height, count = _FRAME_HEADER.unpack_from(data, 0)
+    if magic != TILE_MAGIC:
+        raise Exception("不是分块帧数据")
+    if version != TILE_VERSION:
+        raise Exception(f"不支持的分块帧版本：{version}")
+    view = memoryview(data)
+    offset = _FRAME_HEADER.size
+    tiles = []
+    for _ in range(count):
+        x, y, w, h, codec, length = _TILE_HEADER.unpack_from(data, offset)
+        offset += _TILE_HEADER.size
+        tiles.append((x, y, w, h, codec, view[offset:offset + length]))
+        offset += length
+    return width, height, tiles
+
+
+def decode_frame(data):
+    """解码一帧画面（兼容整帧JPEG与分块帧，分块帧在接收端重新拼接）"""
+    if not is_tiled_frame(data):
+        return Image.open(io.BytesIO(data))
+    width, height, tiles = iter_tiles(data)
+    frame = Image.new("RGB", (width, height))
+    for x, y, _, _, _, tile_data in tiles:
+        frame.paste(Image.open(io.BytesIO(tile_data)), (x, y))
+    return frame
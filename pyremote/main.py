@@ -1,33 +1,87 @@
+import sys
 import argparse
 from pyremote.ui.cli import run_cli
 from pyremote.ui.gui import run_gui
 from pyremote.ui.web import run_web
+from pyremote.ui.replay import run_replay
+from pyremote.utils.loadgen import run_loadgen
 from pyremote.长辈模式.elderly_mode import run_elderly_mode
+from pyremote.platform import screen_backends, input_backends
+from pyremote.core.screen_capture import ENCODINGS
 from pyremote.utils.logger import init_logger
+from pyremote.utils.profiler import get_profiler, install_signal_handlers
 
 def main():
     # 初始化日志
     init_logger()
     
+    # 兼容子命令写法：pyremote replay 等价于 pyremote --mode replay（loadgen同理）
+    if len(sys.argv) > 1 and sys.argv[1] in ("replay", "loadgen"):
+        sys.argv[1:2] = ["--mode", sys.argv[1]]
+
     # 命令行参数解析
     parser = argparse.ArgumentParser(description="PyRemote - 轻量级跨平台远程控制工具")
-    parser.add_argument("--mode", choices=["cli", "gui", "web", "elderly"], 
-                        default="gui", help="运行模式（cli:命令行, gui:桌面界面, web:Web界面, elderly:长辈模式）")
+    parser.add_argument("--mode", choices=["cli", "gui", "web", "elderly", "replay", "loadgen"], 
+                        default="gui", help="运行模式（cli:命令行, gui:桌面界面, web:Web界面, elderly:长辈模式, replay:录像回放, loadgen:多客户端压测）")
     parser.add_argument("--host", default="0.0.0.0", help="服务端IP（仅服务端模式）")
     parser.add_argument("--port", type=int, default=9999, help="服务端端口（仅服务端模式）")
     parser.add_argument("--client", help="客户端连接地址（格式：IP:端口，仅客户端模式）")
+    parser.add_argument("--ws-port", type=int, help="Web输入通道（WebSocket）端口（仅Web模式，默认=端口+1）")
+    parser.add_argument("--record", help="会话录像保存路径（审计用，不指定则不录像）")
+    parser.add_argument("--file", help="要回放的录像文件（仅回放模式）")
+    parser.add_argument("--seek", type=float, help="回放跳转时刻（秒，仅回放模式）")
+    parser.add_argument("--output", help="导出跳转时刻的屏幕画面（JPEG，仅回放模式）")
+    parser.add_argument("--screen-backend", choices=screen_backends(),
+                        help="屏幕捕获后端（默认取环境变量PYREMOTE_SCREEN_BACKEND，否则按当前系统；synthetic=合成画面，无显示器运行）")
+    parser.add_argument("--input-backend", choices=input_backends(),
+                        help="输入控制后端（默认取环境变量PYREMOTE_INPUT_BACKEND，否则按当前系统；null=只记录不执行）")
+    parser.add_argument("--encoding", choices=ENCODINGS,
+                        help="屏幕编码方式（默认取环境变量PYREMOTE_ENCODING，否则jpeg；parallel=大画面分块并行编码，"
+                             "hybrid=文字区域无损+照片区域JPEG；分块帧只发给握手时声明支持的对方，Web模式始终为JPEG）")
+    parser.add_argument("--clients", type=int, default=10, help="模拟客户端数量（仅压测模式）")
+    parser.add_argument("--duration", type=float, default=10.0, help="压测时长（秒，仅压测模式）")
+    parser.add_argument("--fps", type=int, default=15, help="压测服务端帧率（仅压测模式）")
+    parser.add_argument("--input-rate", type=int, default=20, help="每个客户端每秒输入批次数（仅压测模式，0=只观看）")
+    parser.add_argument("--ramp", type=float, default=0.0, help="客户端连接分散在该时长内（秒，仅压测模式）")
+    parser.add_argument("--viewport", help="压测服务端画面大小（如1280x720，仅压测模式，默认原始分辨率）")
+    parser.add_argument("--decode", action="store_true", help="模拟客户端解码屏幕帧（仅压测模式）")
+    parser.add_argument("--serve", action="store_true", help="只启动压测服务端，由另一进程用--client压测（仅压测模式）")
+    parser.add_argument("--audio-file", help="压测服务端向每个会话循环发送的WAV音频（16位PCM，仅压测模式）")
+    parser.add_argument("--audio-output", help="将对方声音写入WAV文件（仅长辈模式）")
+    parser.add_argument("--profile", action="store_true",
+                        help="启动即开始性能剖析，退出时导出火焰图折叠栈与内存报告（运行中也可用SIGUSR1开关、SIGUSR2导出）")
+    parser.add_argument("--profile-dir", default=".", help="性能剖析结果输出目录")
+    parser.add_argument("--profile-interval", type=float, default=10.0, help="性能剖析CPU采样间隔（毫秒）")
+    parser.add_argument("--profile-memory-interval", type=float, default=30.0,
+                        help="性能剖析内存水位记录间隔（秒，0=不开启tracemalloc，分配密集时tracemalloc开销较大）")
     
     args = parser.parse_args()
+
+    # 性能剖析：未指定--profile时也注册信号开关，线上会话无需重启即可开始剖析
+    profiler = get_profiler(output_dir=args.profile_dir, interval=args.profile_interval / 1000,
+                            memory_interval=args.profile_memory_interval,
+                            trace_memory=args.profile_memory_interval > 0)
+    install_signal_handlers(profiler)
+    if args.profile:
+        profiler.start()
     
     # 启动对应模式
-    if args.mode == "cli":
-        run_cli(args)
-    elif args.mode == "gui":
-        run_gui(args)
-    elif args.mode == "web":
-        run_web(args)
-    elif args.mode == "elderly":
-        run_elderly_mode(args)
+    try:
+        if args.mode == "cli":
+            run_cli(args)
+        elif args.mode == "gui":
+            run_gui(args)
+        elif args.mode == "web":
+            run_web(args)
+        elif args.mode == "elderly":
+            run_elderly_mode(args)
+        elif args.mode == "replay":
+            run_replay(args)
+        elif args.mode == "loadgen":
+            run_loadgen(args)
+    finally:
+        if profiler.stop():
+            profiler.dump()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
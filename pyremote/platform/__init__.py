@@ -0,0 +1,96 @@
+"""
+平台后端注册表（屏幕捕获 / 输入控制）
+
+后端以"模块路径:类名"登记，选用时才导入对应模块（未使用的平台依赖不会被加载），
+选择顺序：显式参数（命令行）> 环境变量 > 按当前系统自动选择
+  PYREMOTE_SCREEN_BACKEND=synthetic  无显示器运行（服务器、压测、CI）
+  PYREMOTE_INPUT_BACKEND=null        输入事件只记录不执行
+"""
+import importlib
+import os
+import platform
+
+SCREEN_BACKEND_ENV = "PYREMOTE_SCREEN_BACKEND"
+INPUT_BACKEND_ENV = "PYREMOTE_INPUT_BACKEND"
+
+# 后端名称 -> "模块路径:类名"
+_SCREEN_BACKENDS = {
+    "windows": "pyremote.platform.windows:WindowsScreen",
+    "macos": "pyremote.platform.macos:MacOSScreen",
+    "linux": "pyremote.platform.linux:LinuxScreen",
+    "synthetic": "pyremote.platform.synthetic:SyntheticScreen",
+}
+_INPUT_BACKENDS = {
+    "windows": "pyremote.platform.windows:WindowsInput",
+    "macos": "pyremote.platform.macos:MacOSInput",
+    "linux": "pyremote.platform.linux:LinuxInput",
+    "null": "pyremote.platform.null:NullInput",
+}
+
+# platform.system()返回值 -> 后端名称
+_SYSTEM_BACKENDS = {"windows": "windows", "darwin": "macos", "linux": "linux"}
+
+
+def register_screen_backend(name, target):
+    """
+    注册屏幕捕获后端
+    :param name: 后端名称（命令行/环境变量中使用）
+    :param target: "模块路径:类名"或类本身（需实现capture_full、capture_region）
+    """
+    _SCREEN_BACKENDS[name] = target
+
+
+def register_input_backend(name, target):
+    """
+    注册输入控制后端
+    :param target: "模块路径:类名"或类本身（接口见pyremote.platform.base.PyAutoGUIInput）
+    """
+    _INPUT_BACKENDS[name] = target
+
+
+def screen_backends():
+    """已注册的屏幕捕获后端名称"""
+    return sorted(_SCREEN_BACKENDS)
+
+
+def input_backends():
+    """已注册的输入控制后端名称"""
+    return sorted(_INPUT_BACKENDS)
+
+
+def default_backend():
+    """当前系统对应的后端名称"""
+    system = platform.system().lower()
+    if system not in _SYSTEM_BACKENDS:
+        raise Exception(f"不支持的平台：{system}")
+    return _SYSTEM_BACKENDS[system]
+
+
+def _resolve(registry, name, env, kind):
+    """按参数 > 环境变量 > 当前系统选择后端，并导入对应类"""
+    name = name or os.environ.get(env) or default_backend()
+    if name not in registry:
+        raise Exception(f"未知的{kind}后端：{name}（可选：{'、'.join(sorted(registry))}）")
+    target = registry[name]
+    if isinstance(target, str):
+        module_name, class_name = target.split(":")
+        target = getattr(importlib.import_module(module_name), class_name)
+        registry[name] = target  # 缓存已导入的类
+    return target
+
+
+def load_screen_backend(name=None, **kwargs):
+    """
+    创建屏幕捕获后端实例
+    :param name: 后端名称（None=环境变量PYREMOTE_SCREEN_BACKEND或当前系统）
+    :param kwargs: 传给后端构造函数的参数
+    """
+    return _resolve(_SCREEN_BACKENDS, name, SCREEN_BACKEND_ENV, "屏幕捕获")(**kwargs)
+
+
+def load_input_backend(name=None, **kwargs):
+    """
+    创建输入控制后端实例
+    :param name: 后端名称（None=环境变量PYREMOTE_INPUT_BACKEND或当前系统）
+    """
+    return _resolve(_INPUT_BACKENDS, name, INPUT_BACKEND_ENV, "输入控制")(**kwargs)
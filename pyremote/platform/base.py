@@ -0,0 +1,71 @@
+from PIL import ImageGrab
+
+
+class ImageGrabScreen:
+    """基于Pillow ImageGrab的屏幕捕获（各平台后端的公共实现）"""
+    def capture_full(self):
+        """全屏捕获"""
+        return ImageGrab.grab()
+
+    def capture_region(self, x, y, width, height):
+        """区域捕获（x,y: 左上角坐标）"""
+        return ImageGrab.grab(bbox=(x, y, x + width, y + height))
+
+
+class PyAutoGUIInput:
+    """
+    基于PyAutoGUI的输入控制（各平台后端的公共实现）
+    输入后端接口：size、move_to、move_rel、click、mouse_down、mouse_up、scroll、
+    press、key_down、key_up、type_text，由InputControl调用（异常由InputControl统一处理）
+    """
+    def __init__(self):
+        # 创建实例时才导入（无显示器环境选用其他后端时不加载PyAutoGUI）
+        import pyautogui
+        # 初始化PyAutoGUI配置（防故障安全设置）
+        pyautogui.FAILSAFE = True  # 鼠标移到屏幕角落时停止操作
+        pyautogui.PAUSE = 0.01  # 每次操作后短暂延迟，避免系统卡顿
+        self.pyautogui = pyautogui
+
+    def size(self):
+        """屏幕分辨率（宽, 高）"""
+        return tuple(self.pyautogui.size())
+
+    def move_to(self, x, y, duration=0):
+        self.pyautogui.moveTo(x, y, duration=duration)
+
+    def move_rel(self, dx, dy, duration=0):
+        self.pyautogui.moveRel(dx, dy, duration=duration)
+
+    def click(self, button="left", double=False):
+        if double:
+            self.pyautogui.doubleClick(button=button)
+        else:
+            self.pyautogui.click(button=button)
+
+    def mouse_down(self, button="left"):
+        self.pyautogui.mouseDown(button=button)
+
+    def mouse_up(self, button="left"):
+        self.pyautogui.mouseUp(button=button)
+
+    def scroll(self, amount):
+        """滚动（正数上滚，负数下滚）"""
+        self.pyautogui.scroll(amount)
+
+    def press(self, key):
+        """按键（支持组合键，用'+'连接，如'ctrl+c'）"""
+        if '+' in key:
+            key_list = key.split('+')
+            with self.pyautogui.hold(key_list[:-1]):  # 按住组合键前缀（如ctrl）
+                self.pyautogui.press(key_list[-1])     # 按下目标键（如v）
+        else:
+            self.pyautogui.press(key)
+
+    def key_down(self, key):
+        self.pyautogui.keyDown(key)
+
+    def key_up(self, key):
+        self.pyautogui.keyUp(key)
+
+    def type_text(self, text, interval=0.05):
+        self.pyautogui.typewrite(text, interval=interval)
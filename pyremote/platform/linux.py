@@ -0,0 +1,22 @@
+import os
+from pyremote.platform.base import ImageGrabScreen, PyAutoGUIInput
+
+
+def _check_display():
+    """检查Linux X11显示（避免屏幕捕获/输入控制失败）"""
+    if "DISPLAY" not in os.environ:
+        raise Exception("Linux环境缺少DISPLAY变量，需X11服务（无显示器运行请选用synthetic屏幕后端与null输入后端）")
+
+
+class LinuxScreen(ImageGrabScreen):
+    """Linux屏幕捕获（ImageGrab通过XCB连接X11）"""
+    def __init__(self):
+        _check_display()
+
+
+# 平台专属实现（解决特殊权限/接口差异）
+class LinuxInput(PyAutoGUIInput):
+    def __init__(self):
+        # Linux下需要X11显示（PyAutoGUI导入时即连接X11，先检查以给出明确提示）
+        _check_display()
+        super().__init__()
@@ -0,0 +1,12 @@
+from pyremote.platform.base import ImageGrabScreen, PyAutoGUIInput
+
+
+class MacOSScreen(ImageGrabScreen):
+    """macOS屏幕捕获（ImageGrab调用系统截图，需授予"屏幕录制"权限）"""
+
+
+class MacOSInput(PyAutoGUIInput):
+    def __init__(self):
+        super().__init__()
+        # macOS下特殊处理：如F1-F12按键需要按住fn键
+        self.fn_required_keys = ["f1", "f2", "f3", "f4", "f5", "f6", "f7", "f8", "f9", "f10", "f11", "f12"]
@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+# 记录的输入事件：时间戳（time.monotonic）、动作名称、参数
+InputEvent = namedtuple("InputEvent", ["timestamp", "action", "args"])
+
+
+class NullInput:
+    """
+    空输入后端：不操作真实鼠标键盘，只记录收到的输入事件（无显示器环境、压测、CI使用）
+    维护虚拟鼠标位置，相对移动与绝对移动的结果可以断言
+    """
+    def __init__(self, width=1920, height=1080, max_events=100000):
+        """
+        :param width: 虚拟屏幕宽度（与synthetic屏幕后端默认分辨率一致）
+        :param height: 虚拟屏幕高度
+        :param max_events: 最多保留的事件数（超出后丢弃最早的事件，长时间压测时内存不增长）
+        """
+        self.width = width
+        self.height = height
+        self.position = (0, 0)
+        self.events = deque(maxlen=max_events)
+        self.event_count = 0  # 累计事件数（含已丢弃的）
+        self._lock = threading.Lock()
+
+    def _record(self, action, *args):
+        with self._lock:
+            self.events.append(InputEvent(time.monotonic(), action, args))
+            self.event_count += 1
+
+    def take_events(self):
+        """取出并清空已记录的事件"""
+        with self._lock:
+            events = list(self.events)
+            self.events.clear()
+        return events
+
+    def size(self):
+        return self.width, self.height
+
+    def move_to(self, x, y, duration=0):
+        self.position = (x, y)
+        self._record("move_to", x, y)
+
+    def move_rel(self, dx, dy, duration=0):
+        x = max(0, min(self.position[0] + dx, self.width - 1))
+        y = max(0, min(self.position[1] + dy, self.height - 1))
+        self.position = (x, y)
+        self._record("move_rel", dx, dy)
+
+    def click(self, button="left", double=False):
+        self._record("click", button, double)
+
+    def mouse_down(self, button="left"):
+        self._record("mouse_down", button)
+
+    def mouse_up(self, button="left"):
+        self._record("mouse_up", button)
+
+    def scroll(self, amount):
+        self._record("scroll", amount)
+
+    def press(self, key):
+        self._record("press", key)
+
+    def key_down(self, key):
+        self._record("key_down", key)
+
+    def key_up(self, key):
+        self._record("key_up", key)
+
+    def type_text(self, text, interval=0.05):
+        self._record("type_text", text)
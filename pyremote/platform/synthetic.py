@@ -0,0 +1,108 @@
+import random
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+SCENARIOS = ("mixed", "text", "video", "idle")
+
+_WORDS = ("def", "return", "import", "self", "frame", "socket", "buffer", "encode", "decode",
+          "None", "True", "for", "in", "if", "else", "print", "data", "len", "0x1F", "await")
+
+
+class SyntheticScreen:
+    """
+    合成屏幕后端：生成持续变化的桌面画面（无显示器环境、压测、CI使用）
+    画面布局：桌面背景 + 任务栏 + 滚动文字窗口（类似终端输出）+ 视频区域；
+    mixed场景中活动期与空闲期交替（空闲期画面完全不变），覆盖编码器的各类内容
+    每次capture_full推进一帧（不按真实时间等待，调用方可全速采集）
+    """
+    def __init__(self, width=1920, height=1080, scenario="mixed", seed=0,
+                 active_frames=120, idle_frames=60, text_interval=3):
+        """
+        :param width: 画面宽度
+        :param height: 画面高度
+        :param scenario: 场景（mixed=文字+视频+空闲交替，text=只有滚动文字，video=只有视频，idle=静止画面）
+        :param seed: 随机种子（相同种子生成相同的画面序列，便于复现压测结果）
+        :param active_frames: mixed场景中每个活动期的帧数
+        :param idle_frames: mixed场景中每个空闲期的帧数
+        :param text_interval: 每隔多少帧输出一行文字
+        """
+        if scenario not in SCENARIOS:
+            raise Exception(f"未知的合成画面场景：{scenario}（可选：{'、'.join(SCENARIOS)}）")
+        self.width = width
+        self.height = height
+        self.scenario = scenario
+        self.active_frames = active_frames
+        self.idle_frames = idle_frames
+        self.text_interval = max(1, text_interval)
+        self.frame_index = 0
+        self._random = random.Random(seed)
+        self._font = ImageFont.load_default()
+        self._line_height = 14
+
+        # 布局：左侧文字窗口，右上视频区域，底部任务栏
+        taskbar = max(24, height // 30)
+        margin = max(8, width // 80)
+        self.text_box = (margin, margin, width // 2 - margin // 2, height - taskbar - margin)
+        self.video_box = (width // 2 + margin // 2, margin, width - margin, height // 2)
+
+        self._canvas = Image.new("RGB", (width, height), (36, 52, 71))
+        draw = ImageDraw.Draw(self._canvas)
+        draw.rectangle((0, height - taskbar, width, height), fill=(24, 24, 28))
+        draw.rectangle(self.text_box, fill=(30, 30, 30))
+        draw.rectangle(self.video_box, fill=(0, 0, 0))
+        # 视频纹理：低分辨率随机噪声放大并模糊（只在初始化时生成一次），按帧平移模拟画面运动
+        video_w = self.video_box[2] - self.video_box[0]
+        video_h = self.video_box[3] - self.video_box[1]
+        self._video_size = (video_w, video_h)
+        noise_size = (max(1, video_w // 16), max(1, video_h // 16))
+        self._video_texture = [
+            Image.frombytes("L", noise_size, bytes(self._random.getrandbits(8)
+                                                   for _ in range(noise_size[0] * noise_size[1])))
+            .resize((video_w * 2, video_h * 2), Image.BICUBIC)
+            .filter(ImageFilter.GaussianBlur(8))
+            for _ in range(3)
+        ]
+
+    def _is_active(self):
+        """当前帧是否处于活动期"""
+        if self.scenario == "idle":
+            return False
+        if self.scenario != "mixed":
+            return True
+        return self.frame_index % (self.active_frames + self.idle_frames) < self.active_frames
+
+    def _scroll_text(self):
+        """文字窗口上移一行，并在底部输出新的一行"""
+        x0, y0, x1, y1 = self.text_box
+        lh = self._line_height
+        self._canvas.paste(self._canvas.crop((x0, y0 + lh, x1, y1)), (x0, y0))
+        draw = ImageDraw.Draw(self._canvas)
+        draw.rectangle((x0, y1 - lh, x1, y1), fill=(30, 30, 30))
+        words = self._random.choices(_WORDS, k=self._random.randint(3, 12))
+        indent = "    " * self._random.randint(0, 3)
+        color = self._random.choice(((212, 212, 212), (86, 156, 214), (206, 145, 120), (106, 153, 85)))
+        draw.text((x0 + 4, y1 - lh), indent + " ".join(words), font=self._font, fill=color)
+
+    def _draw_video(self):
+        """视频区域输出新的一帧（三个通道的纹理以不同速度平移）"""
+        w, h = self._video_size
+        t = self.frame_index
+        channels = []
+        for i, texture in enumerate(self._video_texture):
+            dx = (t * (3 + i * 2)) % w
+            dy = (t * (2 + i)) % h
+            channels.append(texture.crop((dx, dy, dx + w, dy + h)))
+        self._canvas.paste(Image.merge("RGB", channels), self.video_box[:2])
+
+    def capture_full(self):
+        """生成下一帧全屏画面（返回副本，调用方可长期持有）"""
+        if self._is_active():
+            if self.scenario in ("mixed", "text") and self.frame_index % self.text_interval == 0:
+                self._scroll_text()
+            if self.scenario in ("mixed", "video"):
+                self._draw_video()
+        self.frame_index += 1
+        return self._canvas.copy()
+
+    def capture_region(self, x, y, width, height):
+        """生成下一帧并截取指定区域"""
+        return self.capture_full().crop((x, y, x + width, y + height))
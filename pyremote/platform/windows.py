@@ -0,0 +1,20 @@
+from PIL import ImageGrab
+from pyremote.platform.base import ImageGrabScreen, PyAutoGUIInput
+
+
+class WindowsScreen(ImageGrabScreen):
+    def capture_full(self):
+        """Windows全屏捕获（Pillow+Windows API）"""
+        return ImageGrab.grab(all_screens=True)  # 支持多屏幕
+
+
+class WindowsInput(PyAutoGUIInput):
+    def __init__(self):
+        super().__init__()
+        # Windows下可扩展：如支持虚拟按键码（VK_CODE）
+        self.vk_codes = {
+            "ctrl": 0x11,
+            "alt": 0x12,
+            "shift": 0x10,
+            "enter": 0x0D
+        }
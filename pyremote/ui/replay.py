@@ -0,0 +1,65 @@
+import io
+import time
+from pyremote.core.recorder import SessionPlayer
+from pyremote.core.tile_encoder import is_tiled_frame, decode_frame
+from pyremote.utils.logger import logger
+
+
+def export_frame(payload, path):
+    """
+    导出屏幕画面为JPEG文件（整帧JPEG直接写入；分块帧解码拼接后重新编码）
+    :return: True=已导出，False=不是可识别的画面数据
+    """
+    if bytes(payload[:2]) == b"\xff\xd8":
+        with open(path, "wb") as f:
+            f.write(payload)
+        return True
+    if not is_tiled_frame(payload):
+        return False
+    img = decode_frame(payload)
+    buf = io.BytesIO()
+    img.convert("RGB").save(buf, format="JPEG", quality=95)
+    with open(path, "wb") as f:
+        f.write(buf.getbuffer())
+    return True
+
+
+def run_replay(args):
+    """启动录像回放（跳转到指定时刻，可导出该时刻的屏幕画面）"""
+    if not args.file:
+        logger.error("回放模式需要指定录像文件（--file）")
+        return
+
+    try:
+        player = SessionPlayer(args.file)
+    except Exception as e:
+        logger.error(f"打开录像失败：{str(e)}")
+        return
+
+    try:
+        logger.info(f"录像：{args.file}，时长{player.duration:.1f}秒，关键帧{player.keyframe_count}个")
+
+        if args.seek is not None:
+            # 跳转：二分查找关键帧后最多扫描一个关键帧间隔
+            begin = time.perf_counter()
+            frame = player.frame_at(args.seek)
+            elapsed_ms = (time.perf_counter() - begin) * 1000
+            if frame is None:
+                logger.warning(f"{args.seek}秒处没有屏幕画面")
+                return
+            logger.info(f"跳转到{frame.timestamp:.3f}秒（耗时{elapsed_ms:.2f}毫秒），画面{len(frame.payload)}字节")
+            if args.output:
+                if export_frame(frame.payload, args.output):
+                    logger.info(f"画面已导出：{args.output}")
+                else:
+                    logger.warning("该时刻的画面不是JPEG或分块帧，未导出")
+            return
+
+        # 未指定跳转时刻：按时间顺序列出帧（用于审计）
+        for frame in player.frames():
+            direction = "接收" if frame.inbound else "发送"
+            marker = "[关键帧]" if frame.is_keyframe else ""
+            logger.info(f"{frame.timestamp:10.3f}s {direction} 类型={frame.data_type} "
+                        f"{len(frame.payload)}字节{marker}")
+    finally:
+        player.close()
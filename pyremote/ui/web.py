@@ -5,7 +5,11 @@ import io
 from pyremote.core.communication import TCPCommunication
 from pyremote.core.screen_capture import ScreenCapture
 from pyremote.core.input_control import InputControl
+from pyremote.core.recorder import SessionRecorder
+from pyremote.core.protocol import DATA_TYPE_SCREEN
+from pyremote.ui.ws_input import InputChannelServer
 from pyremote.utils.logger import logger
+from pyremote.utils.profiler import get_profiler
 
 # 全局Flask应用实例
 web_app = Flask(__name__, template_folder="templates", static_folder="static")
@@ -13,6 +17,11 @@ web_app = Flask(__name__, template_folder="templates", static_folder="static")
 web_comm = None
 web_screen = None
 web_input = None
+# 会话录像（--record 指定时启用）
+web_recorder = None
+# WebSocket输入通道（批量发送鼠标键盘事件）
+web_input_channel = None
+input_channel_port = None
 # 屏幕截图定时任务（线程）
 capture_thread = None
 stop_capture = False
@@ -25,10 +34,13 @@ def _capture_screen_loop():
     global latest_screenshot, stop_capture
     while not stop_capture:
         try:
-            # 捕获全屏并转为Base64
-            img_bytes = web_screen.capture_full_screen()
-            if img_bytes:
-                img_base64 = base64.b64encode(img_bytes).decode("utf-8")
+            # 捕获全屏并转为Base64（池化编码，直接从缓冲区视图编码Base64）
+            frame = web_screen.capture_full_screen_frame(tiles=False)  # 浏览器只能解码整帧JPEG
+            if frame:
+                with frame:
+                    if web_recorder:
+                        web_recorder.record(DATA_TYPE_SCREEN, frame.data)
+                    img_base64 = base64.b64encode(frame.data).decode("utf-8")
                 latest_screenshot = f"data:image/jpeg;base64,{img_base64}"
             # 每秒1次（平衡流畅度和性能）
             import time
@@ -41,7 +53,8 @@ def _capture_screen_loop():
 @web_app.route("/")
 def index():
     """Web界面首页（远程控制主界面）"""
-    return render_template("index.html", initial_screenshot=latest_screenshot)
+    return render_template("index.html", initial_screenshot=latest_screenshot,
+                           input_channel_port=input_channel_port or "")
 
 
 @web_app.route("/api/screenshot")
@@ -59,6 +72,9 @@ def api_mouse_move():
         x = data.get("x", 0)
         y = data.get("y", 0)
         relative = data.get("relative", True)
+        if not relative:
+            # 浏览器发送的是画面坐标，画面被缩小传输时需映射回屏幕坐标
+            x, y = web_screen.map_to_screen(float(x), float(y))
         
         result = web_input.move_mouse(int(x), int(y), relative)
         return jsonify({"success": result})
@@ -127,20 +143,65 @@ def api_disconnect():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@web_app.route("/api/admin/profile", methods=["GET", "POST"])
+def api_admin_profile():
+    """
+    API：性能剖析管理（仅允许本机访问）
+    GET 返回剖析状态；POST {"action": "start"|"stop"|"dump"}，stop与dump返回导出的文件路径
+    """
+    if request.remote_addr not in ("127.0.0.1", "::1"):
+        return jsonify({"success": False, "error": "仅允许本机访问"}), 403
+    profiler = get_profiler()
+    if request.method == "GET":
+        return jsonify({"success": True, **profiler.status()})
+    try:
+        action = (request.get_json(silent=True) or {}).get("action")
+        if action == "start":
+            return jsonify({"success": profiler.start()})
+        if action in ("stop", "dump"):
+            if action == "stop" and not profiler.stop():
+                return jsonify({"success": False, "error": "性能剖析未在运行"})
+            folded_path, report_path = profiler.dump()
+            return jsonify({"success": True, "folded": folded_path, "report": report_path})
+        return jsonify({"success": False, "error": f"未知操作：{action}"}), 400
+    except Exception as e:
+        logger.error(f"性能剖析API失败：{str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
 def run_web(args):
     """启动Web模式（Flask服务+屏幕捕获线程）"""
-    global web_comm, web_screen, web_input, capture_thread, stop_capture
+    global web_comm, web_screen, web_input, web_recorder, capture_thread, stop_capture
+    global web_input_channel, input_channel_port
     
     # 初始化核心模块
     web_comm = TCPCommunication()
-    web_screen = ScreenCapture()
-    web_input = InputControl()
+    web_screen = ScreenCapture(backend=getattr(args, "screen_backend", None))
+    web_input = InputControl(backend=getattr(args, "input_backend", None))
+    web_input.coordinate_mapper = web_screen.map_to_screen
+
+    # 会话录像（审计用）
+    if getattr(args, "record", None):
+        web_recorder = SessionRecorder(args.record)
+        if web_recorder.start():
+            web_comm.recorder = web_recorder
+            logger.info(f"Web模式：会话录像已启动（{args.record}）")
+        else:
+            web_recorder = None
     
     # 启动屏幕捕获线程
     stop_capture = False
-    capture_thread = threading.Thread(target=_capture_screen_loop, daemon=True)
+    capture_thread = threading.Thread(target=_capture_screen_loop, name="pyremote-web-capture", daemon=True)
     capture_thread.start()
     logger.info("Web模式：屏幕捕获线程已启动")
+
+    # 启动WebSocket输入通道（默认端口=Web端口+1，启动失败时前端回退到HTTP接口）
+    input_channel_port = getattr(args, "ws_port", None) or args.port + 1
+    web_input_channel = InputChannelServer(web_input, args.host, input_channel_port,
+                                           screen_capture=web_screen)
+    if not web_input_channel.start():
+        web_input_channel = None
+        input_channel_port = None
     
     # 启动Flask服务（允许外部访问）
     logger.info(f"Web界面已启动：http://{args.host}:{args.port}")
@@ -148,9 +209,13 @@ def run_web(args):
     
     # 服务停止后清理
     stop_capture = True
+    if web_input_channel:
+        web_input_channel.stop()
     if capture_thread.is_alive():
         capture_thread.join()
     web_comm.close()
+    if web_recorder:
+        web_recorder.stop()
     logger.info("Web模式：已停止")
 
 
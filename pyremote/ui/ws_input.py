@@ -0,0 +1,109 @@
+import threading
+import time
+from websockets.exceptions import ConnectionClosedOK
+from websockets.sync.server import serve
+from pyremote.core import protocol
+from pyremote.utils.logger import logger
+
+
+class InputChannelServer:
+    """
+    WebSocket输入通道（浏览器通过一条长连接批量发送鼠标键盘事件）
+    每个二进制WebSocket消息为一批输入消息（格式见pyremote.core.protocol，与TCP通信共用），
+    服务端按顺序执行，并定期回复Ack（已处理的批次数，空闲时补发）；
+    浏览器连接时及窗口大小变化时发送Resize，屏幕画面按显示区域缩小后再编码
+    """
+    def __init__(self, input_control, host, port, ack_interval=0.1, screen_capture=None):
+        """
+        :param input_control: 输入控制实例（InputControl）
+        :param ack_interval: 确认间隔（秒），不逐条回复以减少下行消息
+        :param screen_capture: 屏幕捕获实例（ScreenCapture，用于按浏览器显示区域缩小画面）
+        """
+        self.input_control = input_control
+        self.screen_capture = screen_capture
+        self._viewports = {}  # 连接 -> (宽, 高, DPI)
+        self._viewport_lock = threading.Lock()
+        self.host = host
+        self.port = port
+        self.ack_interval = ack_interval
+        self._server = None
+
+    def start(self):
+        """启动输入通道（后台线程）"""
+        try:
+            self._server = serve(self._handle_connection, self.host, self.port)
+        except Exception as e:
+            logger.error(f"输入通道启动失败：{str(e)}")
+            return False
+        threading.Thread(target=self._server.serve_forever, name="pyremote-ws-input", daemon=True).start()
+        logger.info(f"Web输入通道已启动：ws://{self.host}:{self.port}")
+        return True
+
+    def stop(self):
+        """停止输入通道"""
+        if self._server:
+            self._server.shutdown()
+
+    def _handle_connection(self, websocket):
+        """
+        处理单个浏览器连接（按到达顺序执行事件，每个连接独立的编解码状态）
+        有未确认的批次时，接收最多等到下一个确认时刻；连接空闲时也补发Ack，
+        浏览器不会因未确认批次过多而停止发送（如快速拖动后松开）
+        """
+        decoder = protocol.MessageDecoder()
+        encoder = protocol.MessageEncoder()
+        last_ack = time.monotonic()
+        acked = processed = 0
+        try:
+            while True:
+                timeout = None if processed == acked else max(0.0, last_ack + self.ack_interval - time.monotonic())
+                try:
+                    message = websocket.recv(timeout=timeout)
+                except TimeoutError:
+                    message = None
+                except ConnectionClosedOK:
+                    break
+                if isinstance(message, str):
+                    logger.warning("输入通道只接受二进制消息")
+                    continue
+                if message is not None:
+                    self._apply_messages(websocket, decoder.decode(message))
+                    processed += 1
+
+                now = time.monotonic()
+                if processed != acked and now - last_ack >= self.ack_interval:
+                    websocket.send(encoder.encode([protocol.Ack(processed)]))
+                    acked, last_ack = processed, now
+        except Exception as e:
+            logger.error(f"输入通道连接异常：{str(e)}")
+        finally:
+            self._set_viewport(websocket, None)
+
+    def _set_viewport(self, websocket, viewport):
+        """更新连接的显示区域；多个浏览器同时查看时按最大的显示区域缩放"""
+        if not self.screen_capture:
+            return
+        with self._viewport_lock:
+            if viewport:
+                self._viewports[websocket] = viewport
+            else:
+                self._viewports.pop(websocket, None)
+            if self._viewports:
+                width = max(v[0] for v in self._viewports.values())
+                height = max(v[1] for v in self._viewports.values())
+                dpi = max(v[2] for v in self._viewports.values())
+                self.screen_capture.set_viewport(width, height, dpi)
+            else:
+                self.screen_capture.set_viewport(0, 0)
+
+    def _apply_messages(self, websocket, messages):
+        """执行一批消息（连续的绝对移动只执行最后一个，拖动时不必逐点移动）"""
+        last = len(messages) - 1
+        for i, msg in enumerate(messages):
+            if type(msg) is protocol.MouseMove and i < last and type(messages[i + 1]) is protocol.MouseMove:
+                continue
+            if type(msg) is protocol.Resize:
+                self._set_viewport(websocket, (msg.width, msg.height, msg.dpi))
+                continue
+            if not self.input_control.apply_message(msg):
+                logger.warning(f"输入消息执行失败：{msg}")
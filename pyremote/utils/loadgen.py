@@ -0,0 +1,402 @@
+import math
+import threading
+import time
+from collections import deque
+from pyremote.core import protocol
+from pyremote.utils.logger import logger
+from pyremote.utils.stats import percentile
+
+
+class LoadHost:
+    """
+    压测服务端：多会话TCP服务端，一路屏幕捕获编码后广播给所有会话，输入消息执行后逐批回复Ack
+    默认使用合成屏幕与空输入后端，无需显示器；每个会话独立发送线程，只发送最新一帧（落后的会话丢帧，不阻塞其他会话）
+    """
+    def __init__(self, host="127.0.0.1", port=0, fps=15, screen_backend="synthetic", input_backend="null",
+                 viewport=None, audio_file=None, encoding=None):
+        """
+        :param fps: 屏幕帧率
+        :param screen_backend: 屏幕捕获后端（默认synthetic）
+        :param input_backend: 输入控制后端（默认null）
+        :param viewport: 画面缩放到的大小（宽, 高），None=原始分辨率
+        :param audio_file: 向每个会话循环发送的WAV文件（None=不发送音频）
+        :param encoding: 屏幕编码方式（jpeg/parallel/hybrid，None=环境变量PYREMOTE_ENCODING或jpeg；
+                         分块帧只在所有会话都声明支持时使用，否则整帧JPEG）
+        """
+        from pyremote.core.communication import TCPCommunication, HostMessageHandler
+        from pyremote.core.screen_capture import ScreenCapture, encoding_options
+        from pyremote.core.input_control import InputControl
+
+        self.host = host
+        self.port = port
+        self.fps = fps
+        self.server = TCPCommunication()
+        self.screen = ScreenCapture(backend=screen_backend, **encoding_options(encoding))
+        if viewport:
+            self.screen.set_viewport(*viewport)
+        self.input = InputControl(backend=input_backend)
+        # 固定画面大小时不按客户端Resize缩放（压测结果不随客户端窗口变化）
+        self.handler = HostMessageHandler(self.input, self.screen, follow_resize=not viewport)
+        self.audio_file = audio_file
+        self.sessions = []
+        self.audio_senders = []
+        self.frames_encoded = 0
+        self.frames_sent = 0
+        self.frames_dropped = 0  # 会话发送落后或背压超时跳过的帧
+        self._frame = (0, None)  # （帧序号, 编码数据）
+        self._frame_cond = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def start(self):
+        """启动服务端与屏幕捕获线程，返回实际监听端口"""
+        if not self.server.start_server(self.host, self.port, on_session=self._on_session):
+            raise Exception("压测服务端启动失败")
+        self.port = self.server.socket.getsockname()[1]
+        threading.Thread(target=self._capture_loop, name="pyremote-loadgen-capture", daemon=True).start()
+        return self.port
+
+    def _capture_loop(self):
+        """按帧率捕获编码一帧，唤醒各会话发送线程"""
+        interval = 1.0 / self.fps
+        next_at = time.perf_counter()
+        while not self._stop.is_set():
+            # 池化编码：各会话共用同一帧的缓冲区视图，最后一个会话封装完成后归还缓冲区；
+            # 同一帧广播给所有会话，有会话不支持分块帧时整帧编码
+            tiles = all(self.screen.supports_peer(session.peer_capabilities) for session in list(self.sessions))
+            frame = self.screen.capture_full_screen_frame(tiles=tiles)
+            if frame:
+                with self._frame_cond:
+                    old = self._frame[1]
+                    self._frame = (self._frame[0] + 1, frame)
+                    self.frames_encoded += 1
+                    self._frame_cond.notify_all()
+                if old:
+                    old.release()
+            next_at = max(next_at + interval, time.perf_counter() - interval)
+            self._stop.wait(max(0.0, next_at - time.perf_counter()))
+
+    def _on_session(self, session):
+        """新会话（会话线程启动前回调）：执行输入并确认，启动发送线程"""
+        self.handler.attach(session)
+        self.sessions.append(session)
+        threading.Thread(target=self._session_send_loop, args=(session,),
+                         name="pyremote-loadgen-session", daemon=True).start()
+
+    def _session_send_loop(self, session):
+        """会话发送线程：每次发送最新一帧（加密在本线程完成，慢会话只影响自己）"""
+        while not session.is_connected and not self._stop.wait(0.01):
+            pass  # 等待会话线程启动（回调在会话启动前调用）
+        if self.audio_file:
+            from pyremote.core.audio import AudioSender, WavFileSource
+            sender = AudioSender(session, WavFileSource(self.audio_file, loop=True))
+            self.audio_senders.append(sender)
+            sender.start()
+        last_seq = self._frame[0]
+        while not self._stop.is_set():
+            with self._frame_cond:
+                self._frame_cond.wait_for(lambda: self._frame[0] != last_seq or self._stop.is_set(), timeout=1.0)
+                seq, frame = self._frame
+                if seq == last_seq or frame is None:
+                    continue
+                frame.retain()  # 本会话封装完成前缓冲区不归还（send_data封装后release）
+            if not session.is_connected:
+                frame.release()
+                break
+            sent = session.send_data(protocol.DATA_TYPE_SCREEN, frame)
+            with self._stats_lock:
+                # 背压超时只丢弃本帧，继续发送下一帧；连接断开时才退出
+                if sent:
+                    self.frames_sent += 1
+                self.frames_dropped += seq - last_seq - (1 if sent else 0)
+            last_seq = seq
+            if not sent and not session.is_connected:
+                break
+
+    def stats(self):
+        """服务端统计"""
+        return {
+            "sessions": len(self.sessions),
+            "active_sessions": sum(1 for s in self.sessions if s.is_connected),
+            "frames_encoded": self.frames_encoded,
+            "frames_sent": self.frames_sent,
+            "frames_dropped": self.frames_dropped,
+            "inputs_applied": getattr(self.input.input_impl, "event_count", None),
+            "audio_frames_sent": sum(s.frames_sent for s in self.audio_senders),
+        }
+
+    def stop(self):
+        """停止服务端（关闭所有会话）"""
+        self._stop.set()
+        with self._frame_cond:
+            frame = self._frame[1]
+            self._frame = (self._frame[0], None)
+            self._frame_cond.notify_all()
+        if frame:
+            frame.release()
+        self.server.close()
+        for session in self.sessions:
+            session.close()
+        for sender in self.audio_senders:
+            sender.stop()
+
+
+def input_script(index):
+    """
+    脚本化输入（无限生成输入批次）：鼠标沿圆周移动，周期性点击、按键、滚动与文字输入
+    :param index: 客户端序号（各客户端圆周相位不同）
+    """
+    step = 0
+    phase = index * 0.7
+    while True:
+        angle = phase + step * 0.05
+        batch = [protocol.MouseMove(960 + int(400 * math.cos(angle)), 540 + int(300 * math.sin(angle)))]
+        if step % 20 == 10:
+            batch.append(protocol.MouseButton("left", protocol.BUTTON_CLICK))
+        if step % 30 == 15:
+            batch.append(protocol.KeyPress("ctrl+c"))
+        if step % 45 == 30:
+            batch.append(protocol.MouseScroll(-3))
+        if step % 60 == 0:
+            batch.append(protocol.Text("hello"))
+        yield batch
+        step += 1
+
+
+class LoadClient:
+    """模拟客户端：真实握手，接收屏幕帧，按固定速率发送脚本化输入并统计输入到Ack的延迟"""
+    def __init__(self, index, host, port, input_rate=20, key_pair=None, decode=False):
+        """
+        :param index: 客户端序号
+        :param input_rate: 每秒发送的输入批次数（0=只观看不操作）
+        :param key_pair: RSA密钥对（各模拟客户端共用，避免每个客户端生成密钥；握手流程不变）
+        :param decode: 是否解码收到的屏幕帧（计入客户端CPU开销）
+        """
+        from pyremote.core.communication import TCPCommunication, HostMessageHandler
+
+        self.index = index
+        self.host = host
+        self.port = port
+        self.input_rate = input_rate
+        self.decode = decode
+        self.comm = TCPCommunication(key_pair=key_pair)
+        self.comm.on_data_received = self._on_data
+        self.comm.on_message_received = self._on_message
+        self.connected = False
+        self.handshake_ms = None
+        self.first_frame_ms = None  # 发起连接到收到第一帧
+        self.frames = 0
+        self.frame_bytes = 0
+        self.audio_frames = 0
+        self.first_frame_at = None
+        self.last_frame_at = None
+        self.inputs_sent = 0
+        self.latencies = []  # 输入到Ack的延迟（毫秒）
+        self._pending = deque()  # （批次序号, 发送时刻），Ack为累计值，按序号出队
+        self._pending_lock = threading.Lock()
+        self._connect_begin = None
+
+    def connect(self):
+        """连接服务端（握手耗时=建立TCP连接+交换Hello）"""
+        self._connect_begin = time.perf_counter()
+        self.connected = self.comm.connect_client(self.host, self.port)
+        if self.connected:
+            self.handshake_ms = (time.perf_counter() - self._connect_begin) * 1000
+        return self.connected
+
+    def _on_data(self, data_type, data):
+        if data_type == protocol.DATA_TYPE_AUDIO:
+            self.audio_frames += 1
+            return
+        if data_type != protocol.DATA_TYPE_SCREEN:
+            return
+        now = time.perf_counter()
+        if self.first_frame_at is None:
+            self.first_frame_at = now
+            self.first_frame_ms = (now - self._connect_begin) * 1000
+        self.last_frame_at = now
+        self.frames += 1
+        self.frame_bytes += len(data)
+        if self.decode:
+            from pyremote.core.tile_encoder import decode_frame
+            decode_frame(data).load()
+
+    def _on_message(self, msg):
+        if type(msg) is not protocol.Ack:
+            return
+        now = time.perf_counter()
+        with self._pending_lock:
+            while self._pending and self._pending[0][0] <= msg.seq:
+                _, sent_at = self._pending.popleft()
+                self.latencies.append((now - sent_at) * 1000)
+
+    def run_inputs(self, stop):
+        """按input_rate发送脚本化输入，直到stop被设置"""
+        if not self.input_rate:
+            return
+        interval = 1.0 / self.input_rate
+        next_at = time.perf_counter()
+        for batch in input_script(self.index):
+            if stop.is_set() or not self.comm.is_connected:
+                break
+            with self._pending_lock:
+                self.inputs_sent += 1
+                self._pending.append((self.inputs_sent, time.perf_counter()))
+            if not self.comm.send_messages(batch):
+                break
+            next_at += interval
+            stop.wait(max(0.0, next_at - time.perf_counter()))
+
+    def result(self, duration):
+        """单个客户端统计结果"""
+        active = (self.last_frame_at - self.first_frame_at) if self.frames > 1 else 0.0
+        return {
+            "client": self.index,
+            "connected": self.connected,
+            "handshake_ms": round(self.handshake_ms, 1) if self.handshake_ms is not None else None,
+            "first_frame_ms": round(self.first_frame_ms, 1) if self.first_frame_ms is not None else None,
+            "frames": self.frames,
+            "fps": round((self.frames - 1) / active, 2) if active > 0 else 0.0,
+            "mbps": round(self.frame_bytes * 8 / duration / 1e6, 3),
+            "audio_frames": self.audio_frames,
+            "inputs_sent": self.inputs_sent,
+            "inputs_acked": len(self.latencies),
+            "input_p50_ms": round(percentile(self.latencies, 50), 2),
+            "input_p99_ms": round(percentile(self.latencies, 99), 2),
+            "input_p999_ms": round(percentile(self.latencies, 99.9), 2),
+        }
+
+    def close(self):
+        self.comm.close()
+
+
+def run_load(host, port, clients=10, duration=10.0, input_rate=20, ramp=0.0, decode=False):
+    """
+    对服务端发起压测：N个模拟客户端并发连接、接收屏幕帧并发送脚本化输入
+    :param clients: 模拟客户端数量
+    :param duration: 全部客户端连接后的运行时长（秒）
+    :param input_rate: 每个客户端每秒发送的输入批次数
+    :param ramp: 客户端连接分散在该时长内（秒，0=同时连接）
+    :param decode: 客户端是否解码屏幕帧
+    :return: {"clients": [每个客户端的结果], "aggregate": 汇总结果}
+    """
+    from pyremote.core.security import RSAEncryptor
+
+    key_pair = RSAEncryptor().key_pair
+    load_clients = [LoadClient(i, host, port, input_rate, key_pair, decode) for i in range(clients)]
+
+    def connect(client):
+        time.sleep(ramp * client.index / clients if clients else 0)
+        client.connect()
+
+    connectors = [threading.Thread(target=connect, args=(c,), name="pyremote-loadgen-connect", daemon=True)
+                  for c in load_clients]
+    for t in connectors:
+        t.start()
+    for t in connectors:
+        t.join()
+
+    stop = threading.Event()
+    senders = [threading.Thread(target=c.run_inputs, args=(stop,), name="pyremote-loadgen-input", daemon=True)
+               for c in load_clients if c.connected]
+    begin = time.perf_counter()
+    for t in senders:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in senders:
+        t.join(timeout=2)
+    time.sleep(0.2)  # 等待在途的Ack
+    elapsed = time.perf_counter() - begin
+    for c in load_clients:
+        c.close()
+
+    results = [c.result(elapsed) for c in load_clients]
+    connected = [r for r in results if r["connected"]]
+    handshakes = [r["handshake_ms"] for r in connected]
+    latencies = [x for c in load_clients for x in c.latencies]
+    aggregate = {
+        "clients": clients,
+        "connected": len(connected),
+        "handshake_p50_ms": round(percentile(handshakes, 50), 1),
+        "handshake_p99_ms": round(percentile(handshakes, 99), 1),
+        "handshake_max_ms": round(max(handshakes), 1) if handshakes else 0.0,
+        "frames": sum(r["frames"] for r in connected),
+        "fps_per_client": round(sum(r["fps"] for r in connected) / len(connected), 2) if connected else 0.0,
+        "mbps": round(sum(r["mbps"] for r in connected), 3),
+        "inputs_sent": sum(r["inputs_sent"] for r in connected),
+        "inputs_acked": len(latencies),
+        "input_p50_ms": round(percentile(latencies, 50), 2),
+        "input_p99_ms": round(percentile(latencies, 99), 2),
+        "input_p999_ms": round(percentile(latencies, 99.9), 2),
+    }
+    return {"clients": results, "aggregate": aggregate}
+
+
+def _parse_viewport(value):
+    """解析画面大小参数（如1280x720）"""
+    if not value:
+        return None
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def run_loadgen(args):
+    """
+    启动压测模式（pyremote loadgen）
+      --serve：只启动压测服务端（合成屏幕+空输入），供另一进程/另一台机器的客户端压测
+      --client IP:端口：只启动模拟客户端，压测已运行的服务端
+      两者都不指定：本进程内启动服务端与客户端（客户端与服务端共享GIL，结果偏保守）
+    """
+    fps = getattr(args, "fps", None) or 15
+    viewport = _parse_viewport(getattr(args, "viewport", None))
+    host = None
+    if getattr(args, "serve", False) or not args.client:
+        bind = args.host if getattr(args, "serve", False) else "127.0.0.1"
+        port = args.port if getattr(args, "serve", False) else 0
+        host = LoadHost(bind, port, fps=fps,
+                        screen_backend=getattr(args, "screen_backend", None) or "synthetic",
+                        input_backend=getattr(args, "input_backend", None) or "null",
+                        viewport=viewport, audio_file=getattr(args, "audio_file", None),
+                        encoding=getattr(args, "encoding", None))
+        port = host.start()
+        logger.info(f"压测服务端已启动：{bind}:{port}（{fps}fps）")
+
+    if getattr(args, "serve", False):
+        try:
+            while True:
+                time.sleep(5)
+                logger.info(f"压测服务端统计：{host.stats()}")
+        except KeyboardInterrupt:
+            host.stop()
+        return
+
+    if args.client:
+        target_host, target_port = args.client.split(":")
+        target_port = int(target_port)
+    else:
+        target_host, target_port = "127.0.0.1", port
+
+    result = run_load(target_host, target_port, clients=getattr(args, "clients", None) or 10,
+                      duration=getattr(args, "duration", None) or 10.0,
+                      input_rate=getattr(args, "input_rate", 20),
+                      ramp=getattr(args, "ramp", None) or 0.0,
+                      decode=getattr(args, "decode", False))
+    if host:
+        logger.info(f"压测服务端统计：{host.stats()}")
+        host.stop()
+
+    for r in result["clients"]:
+        if not r["connected"]:
+            logger.warning(f"[客户端{r['client']}] 连接失败")
+            continue
+        logger.info(f"[客户端{r['client']}] 握手{r['handshake_ms']}ms，首帧{r['first_frame_ms']}ms，"
+                    f"帧率{r['fps']}（{r['frames']}帧，{r['mbps']}Mbps），音频{r['audio_frames']}帧，输入{r['inputs_acked']}/{r['inputs_sent']}，"
+                    f"延迟p50={r['input_p50_ms']}ms p99={r['input_p99_ms']}ms p999={r['input_p999_ms']}ms")
+    a = result["aggregate"]
+    logger.info(f"[汇总] 连接{a['connected']}/{a['clients']}，握手p50={a['handshake_p50_ms']}ms "
+                f"p99={a['handshake_p99_ms']}ms 最大{a['handshake_max_ms']}ms，"
+                f"总帧数{a['frames']}（平均每客户端{a['fps_per_client']}fps，合计{a['mbps']}Mbps），"
+                f"输入{a['inputs_acked']}/{a['inputs_sent']}，"
+                f"延迟p50={a['input_p50_ms']}ms p99={a['input_p99_ms']}ms p999={a['input_p999_ms']}ms")
+    return result
@@ -0,0 +1,403 @@
+import argparse
+import heapq
+import os
+import random
+import socket
+import threading
+import time
+from collections import deque
+from pyremote.utils.logger import logger
+from pyremote.utils.stats import percentile
+
+
+class LinkProfile:
+    """链路参数（单向）"""
+    def __init__(self, latency_ms=0, jitter_ms=0, bandwidth_kbps=0, loss_rate=0.0, reorder_rate=0.0):
+        """
+        :param latency_ms: 单向固定延迟（毫秒）
+        :param jitter_ms: 延迟抖动（毫秒，均匀分布±jitter_ms）
+        :param bandwidth_kbps: 带宽上限（kbit/s，0=不限）
+        :param loss_rate: 丢包率（0-1，仅UdpImpairmentProxy；TCP代理不模拟）
+        :param reorder_rate: 乱序率（0-1，仅UdpImpairmentProxy，乱序包额外延迟一个jitter+latency/2）
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.bandwidth_kbps = bandwidth_kbps
+        self.loss_rate = loss_rate
+        self.reorder_rate = reorder_rate
+
+    def __repr__(self):
+        return (f"LinkProfile(latency={self.latency_ms}ms, jitter={self.jitter_ms}ms, "
+                f"bandwidth={self.bandwidth_kbps}kbps, loss={self.loss_rate}, reorder={self.reorder_rate})")
+
+
+# 预置场景（常见真实链路，经TCP代理运行；TCP自身重传掩盖丢包，表现为延迟与抖动，故不设丢包/乱序）
+SCENARIOS = {
+    "lan": LinkProfile(latency_ms=1, bandwidth_kbps=100_000),
+    "broadband": LinkProfile(latency_ms=20, jitter_ms=5, bandwidth_kbps=20_000),
+    "wan": LinkProfile(latency_ms=75, jitter_ms=10, bandwidth_kbps=5_000),
+    "mobile": LinkProfile(latency_ms=150, jitter_ms=40, bandwidth_kbps=1_500),
+    "satellite": LinkProfile(latency_ms=300, jitter_ms=20, bandwidth_kbps=2_000),
+}
+
+
+def _close_socket(sock):
+    """关闭socket（先shutdown，唤醒阻塞在recv/accept上的线程）"""
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    sock.close()
+
+
+class _LinkShaper:
+    """单向链路整形：按带宽计算串行化时间，再叠加延迟与抖动，得到每块数据的送达时刻"""
+    def __init__(self, profile, rng=None):
+        """
+        :param rng: 随机数生成器（random.Random，默认新建；测试时传入固定种子的实例）
+        """
+        self.profile = profile
+        self._random = rng or random.Random()
+        self._link_free_at = 0.0  # 链路空闲时刻（带宽限制）
+        self._last_delivery = 0.0  # 上一块送达时刻（TCP保序）
+
+    def delivery_time(self, size, keep_order=True):
+        now = time.monotonic()
+        start = max(now, self._link_free_at)
+        if self.profile.bandwidth_kbps > 0:
+            start += size * 8 / (self.profile.bandwidth_kbps * 1000)
+        self._link_free_at = start
+        delay = self.profile.latency_ms
+        if self.profile.jitter_ms:
+            delay += self._random.uniform(-self.profile.jitter_ms, self.profile.jitter_ms)
+        delivery = start + max(0.0, delay) / 1000
+        if keep_order:
+            # TCP字节流不会乱序：抖动只能推迟，不能让后发的数据先到
+            delivery = max(delivery, self._last_delivery)
+            self._last_delivery = delivery
+        return delivery
+
+
+class ImpairmentProxy:
+    """TCP链路模拟代理（用户态，监听本地端口并转发到目标服务端，双向注入延迟/抖动/带宽限制；不模拟丢包/乱序）"""
+    def __init__(self, target_host, target_port, profile, listen_host="127.0.0.1", listen_port=0,
+                 chunk_size=16384, rng=None):
+        """
+        :param profile: 链路参数（LinkProfile，双向相同）
+        :param listen_port: 监听端口（0=自动分配，启动后通过listen_port读取）
+        :param chunk_size: 转发分块大小（越小带宽模拟越平滑）
+        :param rng: 抖动使用的随机数生成器（random.Random，默认新建）
+        """
+        self.target = (target_host, target_port)
+        self.profile = profile
+        self.listen_host = listen_host
+        self.listen_port = listen_port
+        self.chunk_size = chunk_size
+        self._random = rng or random.Random()
+        self._server = None
+        self._running = False
+        self._connections = []  # 已转发的连接（客户端与上游socket），停止时关闭
+        self._lock = threading.Lock()
+        self.bytes_forwarded = 0
+
+    def start(self):
+        """启动代理"""
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((self.listen_host, self.listen_port))
+        self._server.listen(16)
+        self.listen_port = self._server.getsockname()[1]
+        self._running = True
+        if self.profile.loss_rate or self.profile.reorder_rate:
+            logger.warning("TCP链路模拟代理不模拟丢包/乱序，请使用UdpImpairmentProxy")
+        threading.Thread(target=self._accept_loop, name="pyremote-netem-accept", daemon=True).start()
+        logger.info(f"链路模拟代理启动：{self.listen_host}:{self.listen_port} -> "
+                    f"{self.target[0]}:{self.target[1]}，{self.profile}")
+        return self.listen_port
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                client, _ = self._server.accept()
+            except OSError:
+                break
+            try:
+                upstream = socket.create_connection(self.target)
+            except OSError as e:
+                logger.warning(f"链路模拟代理连接目标失败：{str(e)}")
+                client.close()
+                continue
+            with self._lock:
+                if not self._running:
+                    client.close()
+                    upstream.close()
+                    break
+                self._connections += [client, upstream]
+            for sock in (client, upstream):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._start_pipe(client, upstream, "up")
+            self._start_pipe(upstream, client, "down")
+
+    def _start_pipe(self, src, dst, direction):
+        """启动单向转发（读线程按整形结果排队，写线程到点发送）"""
+        shaper = _LinkShaper(self.profile, self._random)
+        pending = deque()
+        cond = threading.Condition()
+
+        def reader():
+            while self._running:
+                try:
+                    chunk = src.recv(self.chunk_size)
+                except OSError:
+                    chunk = b""
+                with cond:
+                    pending.append((shaper.delivery_time(len(chunk)) if chunk else 0.0, chunk))
+                    cond.notify()
+                if not chunk:
+                    break
+
+        def writer():
+            while True:
+                with cond:
+                    while not pending:
+                        cond.wait()
+                    delivery, chunk = pending.popleft()
+                if not chunk:
+                    # 对端关闭：半关闭转发方向
+                    try:
+                        dst.shutdown(socket.SHUT_WR)
+                    except OSError:
+                        pass
+                    break
+                wait = delivery - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                try:
+                    dst.sendall(chunk)
+                    self.bytes_forwarded += len(chunk)
+                except OSError:
+                    break
+
+        threading.Thread(target=reader, name=f"pyremote-netem-{direction}-rx", daemon=True).start()
+        threading.Thread(target=writer, name=f"pyremote-netem-{direction}-tx", daemon=True).start()
+
+    def stop(self):
+        """停止代理（关闭监听socket与所有转发中的连接，转发线程随之退出）"""
+        with self._lock:
+            self._running = False
+            connections, self._connections = self._connections, []
+        if self._server:
+            _close_socket(self._server)
+        for sock in connections:
+            _close_socket(sock)
+
+
+class UdpImpairmentProxy:
+    """UDP链路模拟代理（额外支持丢包与乱序，用于P2P等UDP传输）"""
+    def __init__(self, target_host, target_port, profile, listen_host="127.0.0.1", listen_port=0, rng=None):
+        """
+        :param rng: 丢包/乱序/抖动使用的随机数生成器（random.Random，默认新建）
+        """
+        self.target = (target_host, target_port)
+        self.profile = profile
+        self.listen_host = listen_host
+        self.listen_port = listen_port
+        self._sock = None
+        self._upstream = None
+        self._client_addr = None
+        self._running = False
+        self._heap = []  # [(送达时刻, 序号, 目标socket, 目标地址, 数据)]
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._random = rng or random.Random()
+        self._shapers = {"up": _LinkShaper(profile, self._random), "down": _LinkShaper(profile, self._random)}
+        self.packets_dropped = 0
+        self.packets_reordered = 0
+
+    def start(self):
+        """启动代理"""
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind((self.listen_host, self.listen_port))
+        self.listen_port = self._sock.getsockname()[1]
+        self._upstream = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._upstream.bind((self.listen_host, 0))  # 先绑定，下行接收线程才能立即开始接收
+        self._running = True
+        threading.Thread(target=self._receive_loop, args=(self._sock, "up"),
+                         name="pyremote-netem-udp-up", daemon=True).start()
+        threading.Thread(target=self._receive_loop, args=(self._upstream, "down"),
+                         name="pyremote-netem-udp-down", daemon=True).start()
+        threading.Thread(target=self._send_loop, name="pyremote-netem-udp-tx", daemon=True).start()
+        logger.info(f"UDP链路模拟代理启动：{self.listen_host}:{self.listen_port}，{self.profile}")
+        return self.listen_port
+
+    def _receive_loop(self, sock, direction):
+        while self._running:
+            try:
+                data, addr = sock.recvfrom(65535)
+            except OSError:
+                break
+            if direction == "up":
+                self._client_addr = addr
+                out_sock, out_addr = self._upstream, self.target
+            else:
+                if self._client_addr is None:
+                    continue
+                out_sock, out_addr = self._sock, self._client_addr
+
+            if self._random.random() < self.profile.loss_rate:
+                self.packets_dropped += 1
+                continue
+            delivery = self._shapers[direction].delivery_time(len(data), keep_order=False)
+            if self._random.random() < self.profile.reorder_rate:
+                # 乱序：额外延迟，使其晚于后续数据包送达
+                delivery += (self.profile.jitter_ms + self.profile.latency_ms / 2 + 1) / 1000
+                self.packets_reordered += 1
+            with self._cond:
+                self._seq += 1
+                heapq.heappush(self._heap, (delivery, self._seq, out_sock, out_addr, data))
+                self._cond.notify()
+
+    def _send_loop(self):
+        while self._running:
+            with self._cond:
+                while self._running and not self._heap:
+                    self._cond.wait()
+                if not self._running:
+                    break
+                delivery = self._heap[0][0]
+                wait = delivery - time.monotonic()
+                if wait > 0:
+                    # 等待期间可能有更早送达的数据包入队，醒来后重新检查堆顶
+                    self._cond.wait(wait)
+                    continue
+                _, _, out_sock, out_addr, data = heapq.heappop(self._heap)
+            try:
+                out_sock.sendto(data, out_addr)
+            except OSError:
+                pass
+
+    def stop(self):
+        """停止代理"""
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        for sock in (self._sock, self._upstream):
+            if sock:
+                _close_socket(sock)
+
+
+def run_scenario(profile, duration=10.0, fps=15, frame_size=20000, input_rate=20, stall_ms=500):
+    """
+    运行脚本化场景：本机启动服务端与客户端，经链路模拟代理传输屏幕帧与输入
+    :param profile: 链路参数（LinkProfile或SCENARIOS中的名称）
+    :param duration: 运行时长（秒）
+    :param fps: 服务端发送屏幕帧的目标帧率
+    :param frame_size: 每帧大小（字节）
+    :param input_rate: 客户端每秒发送的输入次数
+    :param stall_ms: 帧间隔超过该值记为一次卡顿
+    :return: 统计结果（dict）
+    """
+    from pyremote.core.communication import TCPCommunication
+    from pyremote.core import protocol
+
+    if isinstance(profile, str):
+        profile = SCENARIOS[profile]
+
+    server = TCPCommunication()
+    client = TCPCommunication()
+    frame_times = []
+    input_sent = deque()  # 输入发送时刻（TCP保序，按先进先出与到达一一对应）
+    input_latencies = []
+
+    def on_server_message(msg):
+        if type(msg) is protocol.MouseMoveRel:
+            input_latencies.append((time.perf_counter() - input_sent.popleft()) * 1000)
+
+    def on_client_data(data_type, data):
+        if data_type == protocol.DATA_TYPE_SCREEN:
+            frame_times.append(time.perf_counter())
+
+    server.on_message_received = on_server_message
+    client.on_data_received = on_client_data
+
+    if not server.start_server("127.0.0.1", 0):
+        raise Exception("场景服务端启动失败")
+    server_port = server.socket.getsockname()[1]
+    proxy = ImpairmentProxy("127.0.0.1", server_port, profile)
+    proxy_port = proxy.start()
+
+    connect_begin = time.perf_counter()
+    if not client.connect_client("127.0.0.1", proxy_port):
+        proxy.stop()
+        raise Exception("场景客户端连接失败")
+    while not server.is_connected:
+        time.sleep(0.01)
+    connect_ms = (time.perf_counter() - connect_begin) * 1000
+
+    stop = threading.Event()
+    payload = os.urandom(frame_size)
+
+    def send_frames():
+        interval = 1.0 / fps
+        next_at = time.perf_counter()
+        while not stop.is_set() and server.is_connected:
+            server.send_data(protocol.DATA_TYPE_SCREEN, payload)
+            next_at += interval
+            stop.wait(max(0.0, next_at - time.perf_counter()))
+
+    def send_inputs():
+        interval = 1.0 / input_rate
+        while not stop.is_set() and client.is_connected:
+            input_sent.append(time.perf_counter())
+            client.send_messages([protocol.MouseMoveRel(1, 0)])
+            stop.wait(interval)
+
+    threads = [threading.Thread(target=send_frames, name="pyremote-netem-frames", daemon=True),
+               threading.Thread(target=send_inputs, name="pyremote-netem-inputs", daemon=True)]
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join(timeout=2)
+
+    client.close()
+    server.close()
+    proxy.stop()
+
+    gaps = [(b - a) * 1000 for a, b in zip(frame_times, frame_times[1:])]
+    active = frame_times[-1] - frame_times[0] if len(frame_times) > 1 else 0.0
+    return {
+        "profile": repr(profile),
+        "connect_ms": round(connect_ms, 1),
+        "frames": len(frame_times),
+        "fps": round((len(frame_times) - 1) / active, 2) if active > 0 else 0.0,
+        "stalls": sum(1 for g in gaps if g > stall_ms),
+        "max_gap_ms": round(max(gaps), 1) if gaps else 0.0,
+        "input_count": len(input_latencies),
+        "input_p50_ms": round(percentile(input_latencies, 50), 1),
+        "input_p95_ms": round(percentile(input_latencies, 95), 1),
+    }
+
+
+def main():
+    """命令行入口：python -m pyremote.utils.netem --scenario wan"""
+    parser = argparse.ArgumentParser(description="PyRemote 链路模拟测试（延迟/抖动/带宽/丢包）")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), action="append",
+                        help="预置场景（可多次指定，默认全部）")
+    parser.add_argument("--duration", type=float, default=10.0, help="每个场景运行时长（秒）")
+    parser.add_argument("--fps", type=int, default=15, help="服务端目标帧率")
+    parser.add_argument("--frame-size", type=int, default=20000, help="每帧大小（字节）")
+    parser.add_argument("--input-rate", type=int, default=20, help="每秒输入次数")
+    args = parser.parse_args()
+
+    for name in args.scenario or sorted(SCENARIOS):
+        result = run_scenario(name, duration=args.duration, fps=args.fps,
+                              frame_size=args.frame_size, input_rate=args.input_rate)
+        logger.info(f"[{name}] 建连{result['connect_ms']}ms，帧率{result['fps']}（{result['frames']}帧），"
+                    f"卡顿{result['stalls']}次（最大间隔{result['max_gap_ms']}ms），"
+                    f"输入延迟p50={result['input_p50_ms']}ms p95={result['input_p95_ms']}ms")
+
+
+if __name__ == "__main__":
+    main()
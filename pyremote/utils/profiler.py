@@ -0,0 +1,393 @@
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from pyremote.utils.logger import logger
+
+# 折叠调用栈中显示的路径以项目根目录为起点（pyremote/core/...），其他文件只显示文件名
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _short_path(filename):
+    """源文件路径缩写"""
+    if filename.startswith(_PROJECT_ROOT):
+        return os.path.relpath(filename, _PROJECT_ROOT).replace(os.sep, "/")
+    return os.path.basename(filename)
+
+
+def _thread_cpu_clock(native_id):
+    """
+    线程CPU时钟（Linux内核ABI：按线程ID构造时钟ID，与/proc/self/task/<tid>/stat中的utime+stime同源）
+    线程退出后读取只会报错，不像pthread_getcpuclockid那样访问已释放的线程结构；其他平台返回None
+    """
+    if not sys.platform.startswith("linux") or not native_id:
+        return None
+    return ((~native_id) << 3) | 6  # CPUCLOCK_PERTHREAD | CPUCLOCK_SCHED
+
+
+def _rss_watermark():
+    """进程常驻内存（当前, 峰值）字节数；读取/proc/self/status，非Linux只返回峰值"""
+    try:
+        values = {}
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    key, value = line.split(":", 1)
+                    values[key] = int(value.split()[0]) * 1024
+        return values.get("VmRSS"), values.get("VmHWM")
+    except OSError:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return None, peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return None, None
+
+
+def _mb(size):
+    return "-" if size is None else f"{size / 1048576:.1f}MB"
+
+
+class SamplingProfiler:
+    """
+    采样性能剖析器（线上会话排查热点用，开销低，可随时开关）
+    - CPU：定时采集所有线程的调用栈（sys._current_frames），按该线程两次采样间实际消耗的CPU时间加权，
+      阻塞在socket/锁上的线程不计入；结果按线程名 + 函数汇总，可导出火焰图折叠栈格式
+      （不支持线程CPU时钟的平台退化为按采样间隔计时，阻塞线程也会计入）
+    - 内存：定期记录tracemalloc与进程RSS水位，高水位变化时拍快照，报告高水位时刻的主要分配位置与剖析期间增长最多的分配位置
+    """
+    def __init__(self, interval=0.01, memory_interval=30.0, top_n=15, output_dir=".",
+                 trace_memory=True, max_depth=64):
+        """
+        :param interval: CPU采样间隔（秒）
+        :param memory_interval: 内存水位记录间隔（秒）
+        :param top_n: 报告中列出的热点函数/分配位置数量
+        :param output_dir: 剖析结果输出目录
+        :param trace_memory: 是否开启tracemalloc（分配较多时有额外开销）
+        :param max_depth: 调用栈最大深度（超出部分截断外层调用）
+        """
+        self.interval = interval
+        self.memory_interval = memory_interval
+        self.top_n = top_n
+        self.output_dir = output_dir
+        self.trace_memory = trace_memory
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._labels = {}  # code对象 -> 栈帧标签（缓存，避免每次采样格式化字符串）
+        self._reset()
+
+    def _reset(self):
+        """清空上一次剖析的数据"""
+        self.samples = 0
+        self.started_at = None
+        self.stopped_at = None
+        self.cpu_clock = None  # "thread"=线程CPU时间，"wall"=采样间隔
+        self.overhead = 0.0  # 采样线程自身消耗的CPU时间（秒）
+        self._stacks = Counter()  # "线程名;外层函数;...;内层函数" -> CPU秒
+        self._thread_cpu = Counter()  # 线程名 -> CPU秒
+        self._cpu_last = {}  # 线程ident -> （CPU时钟ID, 上次读数）
+        self._tracing_owner = False
+        self._first_stats = None  # 各快照按分配位置汇总：{(文件, 行号): (字节数, 块数)}
+        self._last_stats = None
+        self._peak_stats = None
+        self._peak_traced = 0  # 最近一次高水位快照时的tracemalloc当前值
+        self.traced_peak = 0  # tracemalloc记录的真实峰值
+        self.memory_history = deque(maxlen=720)  # （时间戳, tracemalloc当前, 进程RSS）
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """开始剖析（清空上一次的数据），已在运行时返回False"""
+        with self._lock:
+            if self.running:
+                return False
+            self._reset()
+            self.started_at = time.time()
+            if self.trace_memory and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._tracing_owner = True
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._sample_loop, name="pyremote-profiler", daemon=True)
+            self._thread.start()
+        logger.info(f"性能剖析已开始（采样间隔{self.interval * 1000:.0f}ms，"
+                    f"内存水位{'每' + format(self.memory_interval, 'g') + '秒' if self.trace_memory else '关闭'}）")
+        return True
+
+    def stop(self):
+        """停止剖析（保留数据，可继续dump），未在运行时返回False"""
+        with self._lock:
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                return False
+            self._stop.set()
+        thread.join()
+        with self._lock:
+            self.stopped_at = time.time()
+            if self._tracing_owner:
+                tracemalloc.stop()
+                self._tracing_owner = False
+        logger.info(f"性能剖析已停止（采样{self.samples}次）")
+        return True
+
+    def _sample_loop(self):
+        """采样线程：按间隔采集调用栈与内存水位，停止时补拍一次内存快照"""
+        own_clock = time.CLOCK_THREAD_CPUTIME_ID if hasattr(time, "CLOCK_THREAD_CPUTIME_ID") else None
+        next_snapshot = time.monotonic()
+        last_wall = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            begin = time.clock_gettime(own_clock) if own_clock is not None else 0.0
+            now = time.perf_counter()
+            self._sample(now - last_wall)
+            last_wall = now
+            if self.trace_memory and time.monotonic() >= next_snapshot:
+                self._snapshot_memory()
+                next_snapshot = time.monotonic() + self.memory_interval
+            if own_clock is not None:
+                spent = time.clock_gettime(own_clock) - begin
+                with self._lock:
+                    self.overhead += spent
+        if self.trace_memory:
+            self._snapshot_memory(force=True)
+
+    def _cpu_delta(self, ident, native_id, wall):
+        """线程自上次采样以来消耗的CPU时间（秒）；首次见到的线程返回0"""
+        entry = self._cpu_last.get(ident)
+        if entry is None:
+            clock = _thread_cpu_clock(native_id)
+            if clock is None:
+                self.cpu_clock = self.cpu_clock or "wall"
+                return wall
+            try:
+                self._cpu_last[ident] = (clock, time.clock_gettime(clock))
+            except OSError:
+                pass
+            return 0.0
+        clock, last = entry
+        try:
+            now = time.clock_gettime(clock)
+        except OSError:  # 线程已退出
+            del self._cpu_last[ident]
+            return 0.0
+        self._cpu_last[ident] = (clock, now)
+        self.cpu_clock = self.cpu_clock or "thread"
+        return now - last
+
+    def _fold(self, frame):
+        """调用栈转为折叠格式（外层在前，分号分隔）"""
+        labels = self._labels
+        parts = []
+        while frame is not None and len(parts) < self.max_depth:
+            code = frame.f_code
+            label = labels.get(code)
+            if label is None:
+                label = f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+                labels[code] = label
+            parts.append(label)
+            frame = frame.f_back
+        parts.reverse()
+        return ";".join(parts)
+
+    def _sample(self, wall):
+        """采集一次所有线程（不含采样线程自身）的调用栈"""
+        own = threading.get_ident()
+        threads = {t.ident: t for t in threading.enumerate()}
+        frames = sys._current_frames()
+        with self._lock:
+            for ident in list(self._cpu_last):
+                if ident not in frames:
+                    del self._cpu_last[ident]
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                thread = threads.get(ident)
+                name = thread.name if thread else f"thread-{ident}"
+                cpu = self._cpu_delta(ident, getattr(thread, "native_id", None), wall)
+                if cpu <= 0:
+                    continue
+                self._stacks[name + ";" + self._fold(frame)] += cpu
+                self._thread_cpu[name] += cpu
+            self.samples += 1
+
+    def _snapshot_memory(self, force=False):
+        """
+        记录内存水位；首次、超过上次高水位10%或force时拍tracemalloc快照并按分配位置汇总
+        （快照汇总耗时与分配数量成正比，只在高水位变化时执行，避免定期长时间占用解释器）
+        """
+        if not tracemalloc.is_tracing():
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        rss, _ = _rss_watermark()
+        with self._lock:
+            self.memory_history.append((time.time(), current, rss))
+            self.traced_peak = max(self.traced_peak, peak)
+            new_peak = self._peak_stats is None or current > self._peak_traced * 1.1
+        if not (force or new_peak):
+            return
+        stats = {}
+        for stat in tracemalloc.take_snapshot().statistics("lineno"):
+            frame = stat.traceback[0]
+            if frame.filename not in (tracemalloc.__file__, __file__):
+                stats[(frame.filename, frame.lineno)] = (stat.size, stat.count)
+        with self._lock:
+            if self._first_stats is None:
+                self._first_stats = stats
+            self._last_stats = stats
+            if new_peak or current >= self._peak_traced:
+                self._peak_traced = current
+                self._peak_stats = stats
+
+    def folded_stacks(self):
+        """火焰图折叠栈格式（每行“调用栈 权重”，权重为CPU微秒；flamegraph.pl、speedscope可直接读取）"""
+        with self._lock:
+            stacks = list(self._stacks.items())
+        return "".join(f"{stack} {int(cpu * 1e6)}\n" for stack, cpu in sorted(stacks) if int(cpu * 1e6) > 0)
+
+    def status(self):
+        """当前剖析状态（Web管理接口使用）"""
+        with self._lock:
+            end = self.stopped_at if not self.running and self.stopped_at else time.time()
+            current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (None, None)
+            rss, hwm = _rss_watermark()
+            return {
+                "running": self.running,
+                "samples": self.samples,
+                "duration": round(end - self.started_at, 3) if self.started_at else 0,
+                "cpu_clock": self.cpu_clock,
+                "threads": {name: round(cpu, 4) for name, cpu in self._thread_cpu.most_common(self.top_n)},
+                "traced_memory": current,
+                "traced_peak": peak,
+                "rss": rss,
+                "rss_peak": hwm,
+            }
+
+    def report(self):
+        """文字报告：线程CPU、热点函数（自身/累计）、内存高水位"""
+        with self._lock:
+            stacks = list(self._stacks.items())
+            thread_cpu = self._thread_cpu.most_common()
+            first, last, peak_stats = self._first_stats, self._last_stats, self._peak_stats
+            history = list(self.memory_history)
+            samples, overhead, cpu_clock = self.samples, self.overhead, self.cpu_clock
+            traced_peak, peak_traced = self.traced_peak, self._peak_traced
+            end = self.stopped_at if not self.running and self.stopped_at else time.time()
+            duration = end - self.started_at if self.started_at else 0.0
+        total = sum(cpu for _, cpu in thread_cpu) or 1e-9
+        clock = {"thread": "线程CPU时间", "wall": "采样间隔（阻塞线程也计入）"}.get(cpu_clock, "-")
+        lines = ["PyRemote 性能剖析报告",
+                 f"时长 {duration:.1f}s，采样 {samples} 次（间隔{self.interval * 1000:.0f}ms，计时方式：{clock}），"
+                 f"剖析器自身CPU {overhead:.3f}s",
+                 "", "== 线程CPU =="]
+        for name, cpu in thread_cpu:
+            lines.append(f"  {cpu:9.3f}s {cpu / total:6.1%}  {name}")
+
+        # 自身CPU：栈顶函数；累计CPU：栈中出现的每个函数（递归只计一次）
+        self_cpu = Counter()
+        inclusive = Counter()
+        for stack, cpu in stacks:
+            name, _, frames = stack.partition(";")
+            parts = frames.split(";") if frames else []
+            if parts:
+                self_cpu[(parts[-1], name)] += cpu
+            for part in set(parts):
+                inclusive[part] += cpu
+        lines += ["", "== 热点函数（自身CPU） =="]
+        for (func, name), cpu in self_cpu.most_common(self.top_n):
+            lines.append(f"  {cpu:9.3f}s {cpu / total:6.1%}  {func}  [{name}]")
+        lines += ["", "== 热点函数（累计CPU） =="]
+        for func, cpu in inclusive.most_common(self.top_n):
+            lines.append(f"  {cpu:9.3f}s {cpu / total:6.1%}  {func}")
+
+        lines += ["", "== 内存高水位 =="]
+        rss, hwm = _rss_watermark()
+        lines.append(f"  进程RSS：当前 {_mb(rss)}，峰值 {_mb(hwm)}")
+        if history:
+            rss_values = [h[2] for h in history if h[2] is not None]
+            lines.append(f"  tracemalloc：最后记录 {_mb(history[-1][1])}，峰值 {_mb(traced_peak)}"
+                         + (f"；记录期间RSS峰值 {_mb(max(rss_values))}" if rss_values else ""))
+        if peak_stats:
+            lines.append(f"  高水位时刻（{_mb(peak_traced)}）的主要分配位置（前{self.top_n}）：")
+            top = sorted(peak_stats.items(), key=lambda item: item[1][0], reverse=True)[:self.top_n]
+            for (filename, lineno), (size, count) in top:
+                lines.append(f"    {_mb(size):>9} {count:8d}块  {_short_path(filename)}:{lineno}")
+        if first is not None and last is not None and last is not first:
+            growth = []
+            for key, (size, count) in last.items():
+                old_size, old_count = first.get(key, (0, 0))
+                if size > old_size:
+                    growth.append((size - old_size, count - old_count, key))
+            growth.sort(reverse=True)
+            lines.append(f"  剖析期间增长最多的分配位置（前{self.top_n}）：")
+            for size, count, (filename, lineno) in growth[:self.top_n]:
+                lines.append(f"    +{_mb(size):>8} {count:+8d}块  {_short_path(filename)}:{lineno}")
+        if not self.trace_memory:
+            lines.append("  （未开启tracemalloc，无分配位置统计）")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, prefix=None):
+        """
+        导出剖析结果（运行中也可导出，不影响采样）
+        :param prefix: 文件名前缀（默认 pyremote-profile-<进程ID>-<时间>）
+        :return: （折叠栈文件路径, 报告文件路径）
+        """
+        if self.running and self.trace_memory:
+            self._snapshot_memory(force=True)
+        prefix = prefix or f"pyremote-profile-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}"
+        os.makedirs(self.output_dir, exist_ok=True)
+        folded_path = os.path.join(self.output_dir, prefix + ".folded")
+        report_path = os.path.join(self.output_dir, prefix + ".txt")
+        with open(folded_path, "w", encoding="utf-8") as f:
+            f.write(self.folded_stacks())
+        with open(report_path, "w", encoding="utf-8") as f:
+            f.write(self.report())
+        logger.info(f"性能剖析结果已导出：{folded_path}，{report_path}")
+        return folded_path, report_path
+
+    def toggle(self):
+        """运行中则停止并导出，否则开始剖析"""
+        if self.running:
+            self.stop()
+            return self.dump()
+        self.start()
+        return None
+
+
+# 进程内共享的剖析器（命令行、信号、Web管理接口操作同一个实例）
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler(**kwargs):
+    """获取进程内共享的剖析器（参数只在首次创建时生效）"""
+    global _profiler
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = SamplingProfiler(**kwargs)
+        return _profiler
+
+
+def install_signal_handlers(profiler=None):
+    """
+    注册运行时开关（仅Unix，需在主线程调用）：
+    SIGUSR1 开始剖析 / 停止并导出；SIGUSR2 导出当前结果（不停止）
+    信号处理函数只启动一个线程执行，避免在主线程被打断处等待锁
+    """
+    if not hasattr(signal, "SIGUSR1") or threading.current_thread() is not threading.main_thread():
+        return False
+    profiler = profiler or get_profiler()
+
+    def _run(action):
+        def handler(signum, frame):
+            threading.Thread(target=action, name="pyremote-profiler-control", daemon=True).start()
+        return handler
+
+    signal.signal(signal.SIGUSR1, _run(profiler.toggle))
+    signal.signal(signal.SIGUSR2, _run(profiler.dump))
+    return True
@@ -0,0 +1,15 @@
+import math
+
+
+def percentile(values, p):
+    """
+    百分位数（最近秩法：不小于p%样本的最小值，结果总是实际出现过的样本）
+    :param values: 样本（任意顺序，不修改）
+    :param p: 百分位（0~100，如99.9）
+    :return: 百分位数（无样本时为0.0）
+    """
+    if not values:
+        return 0.0
+    values = sorted(values)
+    rank = math.ceil(len(values) * p / 100)
+    return values[min(len(values) - 1, max(0, rank - 1))]
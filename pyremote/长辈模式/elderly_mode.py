@@ -4,6 +4,10 @@ import pyttsx3
 from pyremote.core.communication import TCPCommunication
 from pyremote.core.screen_capture import ScreenCapture
 from pyremote.core.input_control import InputControl
+from pyremote.core import protocol
+from pyremote.core.recorder import SessionRecorder
+from pyremote.core.frame_decoder import ViewportDecoder
+from pyremote.core.audio import AudioReceiver, WavFileSink
 from pyremote.utils.logger import logger
 
 # 初始化语音引擎（用于语音提示）
@@ -27,6 +31,10 @@ def speak_text(text):
             logger.error(f"语音朗读失败：{str(e)}")
 
 
+# 对方屏幕显示区域（宽, 高）
+SCREEN_VIEW_SIZE = (600, 400)
+
+
 class ElderlyModeGUI:
     """长辈模式GUI（简化界面、放大按钮、语音提示）"""
     def __init__(self, root, args):
@@ -38,11 +46,34 @@ class ElderlyModeGUI:
         
         # 核心模块初始化
         self.comm = TCPCommunication()
-        self.screen_capture = ScreenCapture()
-        self.input_control = InputControl()
+        self.screen_capture = ScreenCapture(backend=getattr(args, "screen_backend", None))
+        self.input_control = InputControl(backend=getattr(args, "input_backend", None))
+
+        # 会话录像（--record 指定时启用）
+        self.recorder = None
+        if getattr(args, "record", None):
+            self.recorder = SessionRecorder(args.record)
+            if self.recorder.start():
+                self.comm.recorder = self.recorder
+            else:
+                self.recorder = None
         
+        # 对方声音（--audio-output 指定时写入WAV文件）
+        self.audio_receiver = None
+        if getattr(args, "audio_output", None):
+            self.audio_receiver = AudioReceiver(WavFileSink(args.audio_output))
+            self.audio_receiver.start()
+
         # 连接状态标记
         self.is_connected = False
+
+        # 对方屏幕显示（解码器、窗口和PhotoImage跨帧复用）
+        self.frame_decoder = ViewportDecoder(SCREEN_VIEW_SIZE)
+        self.screen_dpi = int(self.root.winfo_fpixels("1i"))
+        self.screen_window = None
+        self.screen_label = None
+        self.screen_photo = None
+        self._frame_pending = False
         
         # 构建界面
         self._build_ui()
@@ -130,7 +161,8 @@ class ElderlyModeGUI:
             
             # 异步连接（避免阻塞GUI）
             import threading
-            threading.Thread(target=self._do_connect, args=(peer_ip, peer_port), daemon=True).start()
+            threading.Thread(target=self._do_connect, args=(peer_ip, peer_port),
+                         name="pyremote-elderly-connect", daemon=True).start()
         else:
             # 断开操作
             self.comm.close()
@@ -149,6 +181,8 @@ class ElderlyModeGUI:
             
             # 注册数据接收回调（如接收对方屏幕截图）
             self.comm.on_data_received = self._on_data_received
+            # 告知对方本机显示区域，对方按此大小缩小画面后再传输
+            self.comm.send_messages([protocol.Resize(*SCREEN_VIEW_SIZE, self.screen_dpi)])
         else:
             self.status_label.config(text="连接失败，请检查地址或对方是否在线", foreground="red")
             speak_text("连接失败，请检查对方地址是否正确，或者对方是否已经打开软件")
@@ -192,30 +226,54 @@ class ElderlyModeGUI:
     def _on_data_received(self, data_type, data):
         """接收对方数据的回调（如屏幕截图）"""
         # 此处可扩展：显示对方屏幕截图（长辈模式可简化为弹窗显示）
-        if data_type == 1:  # 约定1=屏幕截图数据
-            logger.info("收到对方屏幕截图，大小：{len(data)}字节")
-            # 可选：用PIL显示图片
-            from PIL import Image, ImageTk
-            import io
-            
+        if data_type == protocol.DATA_TYPE_AUDIO:
+            if self.audio_receiver:
+                self.audio_receiver.handle_data(data_type, data, self.comm.arrival_time)
+            return
+        if data_type == protocol.DATA_TYPE_SCREEN:
+            # 界面还未显示上一帧时直接丢弃本帧（低配电脑只解码能显示的帧）
+            if self._frame_pending:
+                return
             try:
-                img = Image.open(io.BytesIO(data))
-                img.thumbnail((600, 400))  # 缩小图片适配窗口
-                img_tk = ImageTk.PhotoImage(img)
-                
-                # 创建临时窗口显示截图
-                img_window = tk.Toplevel(self.root)
-                img_window.title("对方电脑屏幕")
-                img_label = ttk.Label(img_window, image=img_tk)
-                img_label.image = img_tk  # 防止GC回收
-                img_label.pack()
-                speak_text("收到对方屏幕截图")
+                # 直接按窗口大小解码（JPEG DCT域缩放），目标图像跨帧复用
+                img = self.frame_decoder.decode(data)
+                self._frame_pending = True
+                self.root.after(0, self._show_screen, img)
             except Exception as e:
                 logger.error(f"显示屏幕截图失败：{str(e)}")
 
+    def _show_screen(self, img):
+        """在界面线程中显示对方屏幕（复用同一窗口和PhotoImage）"""
+        from PIL import ImageTk
+
+        try:
+            if self.screen_window is None or not self.screen_window.winfo_exists():
+                # 首次收到画面时创建窗口
+                self.screen_window = tk.Toplevel(self.root)
+                self.screen_window.title("对方电脑屏幕")
+                self.screen_label = ttk.Label(self.screen_window)
+                self.screen_label.pack()
+                self.screen_photo = None
+                speak_text("收到对方屏幕截图")
+
+            if self.screen_photo is None or (self.screen_photo.width(), self.screen_photo.height()) != img.size:
+                self.screen_photo = ImageTk.PhotoImage(img)
+                self.screen_label.config(image=self.screen_photo)
+                self.screen_label.image = self.screen_photo  # 防止GC回收
+            else:
+                self.screen_photo.paste(img)  # 原地更新像素，不重新创建PhotoImage
+        except Exception as e:
+            logger.error(f"显示屏幕截图失败：{str(e)}")
+        finally:
+            self._frame_pending = False
+
 
 def run_elderly_mode(args):
     """启动长辈模式"""
     root = tk.Tk()
     app = ElderlyModeGUI(root, args)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    if app.recorder:
+        app.recorder.stop()
+    if app.audio_receiver:
+        app.audio_receiver.stop()
\ No newline at end of file
@@ -0,0 +1,28 @@
+import logging
+import sys
+import types
+import pytest
+
+# 配置与日志模块不在本仓库中时（只检出核心代码运行测试），使用最小替代实现，
+# 使依赖它们的模块（通信、链路模拟、剖析器等）可以被测试；已安装时不做任何替换
+try:
+    import pyremote.utils.config  # noqa: F401
+except ImportError:
+    _config = types.ModuleType("pyremote.utils.config")
+    _config.get_config = lambda: {}
+    sys.modules["pyremote.utils.config"] = _config
+
+try:
+    import pyremote.utils.logger  # noqa: F401
+except ImportError:
+    _logger = types.ModuleType("pyremote.utils.logger")
+    _logger.logger = logging.getLogger("pyremote")
+    _logger.init_logger = lambda *args, **kwargs: None
+    sys.modules["pyremote.utils.logger"] = _logger
+
+
+@pytest.fixture(scope="session")
+def key_pair():
+    """测试共用的RSA密钥对（生成2048位密钥约需1秒，各测试共用一份）"""
+    from Crypto.PublicKey import RSA
+    return RSA.generate(2048)
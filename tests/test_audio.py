@@ -0,0 +1,80 @@
+import math
+import struct
+import wave
+import pytest
+from pyremote.core import audio
+from pyremote.core.protocol import DATA_TYPE_AUDIO
+
+def test_jitter_buffer_adapts_and_compensates_drift():
+    """测试抖动缓冲：抖动增大时目标延迟增加；发送端时钟偏快时删除采样，缓冲深度不持续增长"""
+    jb = audio.JitterBuffer(frame_ms=20, min_delay_ms=20, max_delay_ms=60)
+    # 到达时间抖动±8ms
+    for seq in range(50):
+        jb.push(seq, seq * 20, b"x", 100 + seq * 20 + (8 if seq % 2 else -8))
+    assert jb.target_delay_ms > 20, "抖动增大后目标延迟未增加"
+    assert jb.target_delay_ms <= 60, "目标延迟超过上限"
+
+    # 发送端时钟比播放时钟快2%：每播放一帧到达1.02帧
+    jb = audio.JitterBuffer(frame_ms=20, min_delay_ms=20, max_delay_ms=60)
+    arrived = 0.0
+    seq = 0
+    deltas = []
+    for tick in range(500):
+        arrived += 1.02
+        while seq < int(arrived):
+            jb.push(seq, seq * 20, b"x", tick * 20)
+            seq += 1
+        item = jb.pop(frame_samples=960)
+        if item:
+            deltas.append(item[1])
+    assert sum(deltas) < 0, "发送端偏快时未删除采样"
+    assert jb.depth_ms() <= jb.max_delay_ms + jb.frame_ms, "缓冲深度持续增长"
+    assert jb.lost_frames == 0, "无丢包时出现丢帧"
+
+def test_stretch_pcm():
+    """测试漂移补偿：删除/重复采样后长度正确，未调整时数据不变"""
+    pcm = struct.pack("<8h", *range(8))
+    assert audio.stretch_pcm(pcm, 1, 0) == pcm, "未调整时数据被修改"
+    assert len(audio.stretch_pcm(pcm, 1, -2)) == 6 * 2, "删除采样后长度错误"
+    assert len(audio.stretch_pcm(pcm, 2, 1)) == 10 * 2, "立体声重复采样后长度错误"
+
+def test_wav_source_to_sink(tmp_path):
+    """测试WAV音频源编码成帧后，接收端解码写入WAV（PCM编码）"""
+    src_path = str(tmp_path / "tone.wav")
+    with wave.open(src_path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(16000)
+        w.writeframes(b"".join(struct.pack("<h", int(8000 * math.sin(i / 10))) for i in range(3200)))
+
+    source = audio.WavFileSource(src_path)
+    encoder = audio.AudioEncoder(source.sample_rate, source.channels, frame_ms=20, codec="pcm")
+    sink = audio.WavFileSink(str(tmp_path / "out.wav"))
+    receiver = audio.AudioReceiver(sink)
+    seq = 0
+    while True:
+        pcm = source.read(encoder.frame_samples)
+        if not pcm:
+            break
+        frame = audio.pack_audio_frame(seq, seq * encoder.frame_samples, encoder.codec, source.channels,
+                                       source.sample_rate, encoder.frame_samples, encoder.encode(pcm))
+        assert receiver.handle_data(DATA_TYPE_AUDIO, frame) is True, "音频帧未被处理"
+        seq += 1
+    assert seq == 10, "20ms帧切分数量错误"
+    assert receiver.handle_data(1, b"screen") is False, "非音频数据不应被处理"
+
+    item = receiver.jitter_buffer.pop(encoder.frame_samples)
+    assert item is not None and item[0] is not None, "缓冲未开始播放"
+    sink.write(receiver.decoder.decode(item[0]))
+    sink.close()
+    with wave.open(str(tmp_path / "out.wav"), "rb") as w:
+        assert w.getframerate() == 16000 and w.getnframes() == encoder.frame_samples, "输出WAV格式错误"
+
+def test_source_and_sink_are_abstract():
+    """测试音频源/输出为抽象基类：未实现read/write的子类不能实例化"""
+    class Incomplete(audio.AudioSink):
+        pass
+    with pytest.raises(TypeError):
+        Incomplete()
+    with pytest.raises(TypeError):
+        audio.AudioSource()
@@ -0,0 +1,87 @@
+import threading
+import pytest
+from PIL import Image
+from pyremote.core.buffer_pool import EncodeBufferPool
+from pyremote.core.communication import TCPCommunication
+from pyremote.core.protocol import DATA_TYPE_SCREEN
+
+def test_buffer_reused_after_release():
+    """测试缓冲区复用：release后归还缓冲池，下一帧复用同一缓冲区；释放后不能再访问data"""
+    pool = EncodeBufferPool(max_buffers=1)
+    img = Image.new("RGB", (64, 64), (10, 20, 30))
+    frame = pool.encode(img, format="PNG")
+    data = bytes(frame.data)
+    buffer = frame._buffer
+    assert data.startswith(b"\x89PNG"), "编码数据错误"
+
+    frame.release()
+    assert frame.released
+    with pytest.raises(ValueError):
+        bytes(frame.data)
+    frame.release()  # 重复释放无影响
+    assert pool._buffers == [buffer], "重复释放导致缓冲区被重复归还"
+
+    again = pool.encode(img, format="PNG")
+    assert again._buffer is buffer, "未复用已归还的缓冲区"
+    assert bytes(again.data) == data, "复用缓冲区后编码数据错误"
+    again.release()
+
+def test_pool_keeps_at_most_max_buffers():
+    """测试在途帧超过max_buffers时临时分配，归还后池中只保留max_buffers个缓冲区"""
+    pool = EncodeBufferPool(max_buffers=2)
+    img = Image.new("RGB", (16, 16))
+    frames = [pool.encode(img, format="PNG") for _ in range(4)]
+    assert len({id(f._buffer) for f in frames}) == 4, "在途帧共用了缓冲区"
+    for f in frames:
+        f.release()
+    assert len(pool._buffers) == 2, "池中缓冲区数量超过上限"
+
+def test_shared_frame_returned_by_last_holder():
+    """测试多个持有者共用一帧：retain后只有最后一个release才归还缓冲区"""
+    pool = EncodeBufferPool(max_buffers=1)
+    frame = pool.encode(Image.new("RGB", (16, 16)), format="PNG")
+    frame.retain()
+    frame.release()
+    assert not frame.released and pool._buffers == [], "还有持有者时缓冲区被归还"
+    frame.release()
+    assert frame.released and len(pool._buffers) == 1, "最后一个持有者释放后未归还缓冲区"
+    with pytest.raises(Exception):
+        frame.retain()
+
+def test_rgb_target_per_thread():
+    """测试RGB转换目标图像按线程复用：同一线程复用同一图像，不同线程互不覆盖"""
+    pool = EncodeBufferPool()
+    red = Image.new("RGBA", (8, 8), (255, 0, 0, 255))
+    blue = Image.new("RGBA", (8, 8), (0, 0, 255, 255))
+    main_target = pool.to_rgb(red)
+    assert pool.to_rgb(red) is main_target, "同一线程未复用目标图像"
+
+    other = []
+    worker = threading.Thread(target=lambda: other.append(pool.to_rgb(blue)))
+    worker.start()
+    worker.join()
+    assert other[0] is not main_target, "不同线程共用了目标图像"
+    assert main_target.getpixel((0, 0)) == (255, 0, 0), "其他线程的转换覆盖了本线程的结果"
+    assert other[0].getpixel((0, 0)) == (0, 0, 255)
+
+def test_send_data_releases_encoded_frame(key_pair):
+    """测试send_data直接加密编码帧视图并在封装后release（未连接时也释放），对方解密校验后内容一致"""
+    comm = TCPCommunication(key_pair=key_pair)
+    pool = EncodeBufferPool(max_buffers=1)
+    img = Image.new("RGB", (32, 32), (200, 0, 0))
+
+    frame = pool.encode(img, format="PNG")
+    assert not comm.send_data(DATA_TYPE_SCREEN, frame)
+    assert frame.released, "未连接时编码帧未释放"
+
+    comm.rsa.set_peer_public_key(comm.rsa.get_public_key_pem())
+    comm.is_connected = True
+    frame = pool.encode(img, format="PNG")
+    expected = bytes(frame.data)
+    assert comm.send_data(DATA_TYPE_SCREEN, frame)
+    assert frame.released and len(pool._buffers) == 1, "封装后编码帧未归还缓冲池"
+
+    prefix, encrypted = comm._send_queue.popleft()
+    packed = comm.rsa.decrypt(encrypted)
+    assert comm.validator.validate_data(packed), "封装数据校验失败"
+    assert comm.validator.unpack_data(packed) == (DATA_TYPE_SCREEN, expected), "封装内容与编码数据不一致"
@@ -0,0 +1,392 @@
+import json
+import queue
+import socket
+import threading
+import time
+import pytest
+from pyremote.core import communication
+from pyremote.core.communication import (TCPCommunication, HostMessageHandler, FRAGMENT_MORE, FRAGMENT_CONT,
+                                         FRAME_PRIORITY)
+from pyremote.core.input_control import InputControl
+from pyremote.core.protocol import (PROTOCOL_VERSION, DATA_TYPE_SCREEN, DATA_TYPE_AUDIO, Ack, KeyPress, MouseMove,
+                                    MouseMoveRel, Resize, MessageDecoder)
+from pyremote.core.screen_capture import ScreenCapture
+
+class _PlainRSA:
+    """不加密（只测试发送队列与分帧，避免RSA解密耗时）"""
+    def encrypt(self, data):
+        return bytes(data)
+
+    def decrypt(self, data):
+        return bytes(data)
+
+class _FakeSocket:
+    """记录发送内容的套接字：每次sendmsg最多写入limit字节（模拟部分发送），block未设置时阻塞；接收时连接已重置"""
+    def __init__(self, limit=1 << 30, block=None):
+        self.limit = limit
+        self.block = block
+        self.data = bytearray()
+
+    def sendmsg(self, buffers):
+        if self.block:
+            self.block.wait()
+        sent = 0
+        for buf in buffers:
+            take = min(len(buf), self.limit - sent)
+            self.data += buf[:take]
+            sent += take
+            if sent >= self.limit:
+                break
+        return sent
+
+    def recv_into(self, buffer, size):
+        raise ConnectionResetError("连接已重置")
+
+    def shutdown(self, how):
+        pass
+
+    def close(self):
+        pass
+
+def _writer(key_pair, sock):
+    """只启动写线程的连接（不进行握手与接收）"""
+    comm = TCPCommunication(key_pair=key_pair)
+    comm.rsa = _PlainRSA()
+    comm.socket = sock
+    comm.is_connected = True
+    threading.Thread(target=comm._send_loop, daemon=True).start()
+    return comm
+
+def _wait_until(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def _wait_drained(comm, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while comm._queued_bytes and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert comm._queued_bytes == 0, "发送队列未在限定时间内发完"
+
+def _parse_wire(comm, data):
+    """解析线路数据：按长度前缀切分，合并分片，返回各帧内容"""
+    frames, partial, pos = [], None, 0
+    while pos < len(data):
+        header = int.from_bytes(data[pos:pos + 4], byteorder="big")
+        length = header & ~(FRAGMENT_MORE | FRAGMENT_CONT | FRAME_PRIORITY)
+        payload = bytes(data[pos + 4:pos + 4 + length])
+        assert len(payload) == length, "帧内容被截断"
+        pos += 4 + length
+        if header & FRAGMENT_CONT:
+            assert partial is not None, "分片帧缺少首个分片（其他帧插入了分片之间）"
+            partial += payload
+        else:
+            assert partial is None, "上一帧的分片未发完就开始了新帧"
+            partial = bytearray(payload)
+        if not header & FRAGMENT_MORE:
+            frames.append(comm.validator.unpack_data(bytes(partial))[1])
+            partial = None
+    return frames
+
+def test_concurrent_senders_with_partial_writes(key_pair):
+    """测试多线程并发发送+部分写入：每帧完整（分片连续），同一发送方的帧保持顺序"""
+    sock = _FakeSocket(limit=1000)
+    comm = _writer(key_pair, sock)
+
+    def producer(index):
+        for seq in range(10):
+            payload = f"{index}-{seq}:".encode() * 1000  # 约6KB，拆成多个分片
+            assert comm.send_data(DATA_TYPE_SCREEN, payload), "发送失败"
+
+    threads = [threading.Thread(target=producer, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    _wait_drained(comm)
+
+    frames = _parse_wire(comm, sock.data)
+    assert len(frames) == 40, "帧数量不一致"
+    for index in range(4):
+        sent = [f for f in frames if f.startswith(f"{index}-".encode())]
+        assert sent == [f"{index}-{seq}:".encode() * 1000 for seq in range(10)], f"发送方{index}的帧乱序或损坏"
+    comm.close()
+
+def test_backpressure_timeout_keeps_connection(key_pair):
+    """测试背压：队列超过字节上限时发送方等待，超时返回False但连接保持；写线程恢复后可继续发送"""
+    block = threading.Event()
+    sock = _FakeSocket(block=block)
+    comm = _writer(key_pair, sock)
+    comm.send_budget = 10000
+    comm.send_timeout = 0.2
+
+    assert comm.send_data(DATA_TYPE_SCREEN, b"a" * 9000), "队列为空时应允许入队"
+    begin = time.monotonic()
+    assert not comm.send_data(DATA_TYPE_SCREEN, b"b" * 9000), "超过字节上限时应等待超时"
+    assert time.monotonic() - begin >= 0.2, "未等待背压超时"
+    assert comm.is_connected, "背压超时不应断开连接"
+
+    block.set()
+    _wait_drained(comm)
+    assert comm.send_data(DATA_TYPE_SCREEN, b"c" * 9000), "写线程恢复后发送失败"
+    _wait_drained(comm)
+    assert _parse_wire(comm, sock.data) == [b"a" * 9000, b"c" * 9000], "超时的帧不应被发送"
+    comm.close()
+
+def test_receive_error_wakes_blocked_sender(key_pair):
+    """测试接收线程发现连接中断时，立即唤醒等待背压的发送方（不必等到超时）"""
+    block = threading.Event()
+    comm = _writer(key_pair, _FakeSocket(block=block))
+    comm.send_budget = 10000
+    comm.send_timeout = 5.0
+    assert comm.send_data(DATA_TYPE_SCREEN, b"a" * 9000)
+
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(comm.send_data(DATA_TYPE_SCREEN, b"b" * 9000)))
+    waiter.start()
+    time.sleep(0.1)
+    receiver = threading.Thread(target=comm._receive_data,
+                                args=(queue.Queue(), queue.Queue(), threading.Event()))
+    receiver.start()  # 接收时连接已重置
+    waiter.join(timeout=1.0)
+    assert not waiter.is_alive() and result == [False], "等待背压的发送方未被唤醒"
+    receiver.join(timeout=1.0)
+    block.set()
+
+def test_pack_error_keeps_connection(key_pair):
+    """测试本地封装失败（无效数据类型）只返回False，不断开连接"""
+    comm = _writer(key_pair, _FakeSocket())
+    assert comm.send_data("无效类型", b"") is False, "封装失败应返回False"
+    assert comm.is_connected, "本地封装失败不应断开连接"
+    assert comm.send_data(DATA_TYPE_SCREEN, b"ok"), "封装失败后无法继续发送"
+    comm.close()
+
+def test_messages_bypass_backpressure(key_pair):
+    """测试输入/控制消息（含Ack）走高优先级队列：发送队列已满时不阻塞，并先于排队的屏幕帧发出"""
+    block = threading.Event()
+    sock = _FakeSocket(block=block)
+    comm = _writer(key_pair, sock)
+    comm.send_budget = 8100  # 两个不分片的屏幕帧（各4048字节）即占满
+    comm.send_timeout = 5.0
+    assert comm.send_data(DATA_TYPE_SCREEN, b"a" * 4000)  # 写线程阻塞在这一帧上
+    time.sleep(0.05)
+    assert comm.send_data(DATA_TYPE_SCREEN, b"b" * 4000)
+
+    begin = time.monotonic()
+    assert comm.send_messages([Ack(1)]), "发送队列已满时消息发送失败"
+    assert time.monotonic() - begin < 0.5, "消息发送等待了背压"
+    block.set()
+    _wait_drained(comm)
+
+    frames = _parse_wire(comm, sock.data)
+    assert frames[0] == b"a" * 4000 and frames[2] == b"b" * 4000, "屏幕帧内容或顺序错误"
+    assert MessageDecoder().decode(frames[1]) == [Ack(1)], "消息未排在已入队的屏幕帧之前"
+    comm.close()
+
+def test_failed_message_send_resyncs_position(key_pair):
+    """测试消息发送失败时坐标基准不前移，下一批先补发绝对移动，对方解码位置正确"""
+    comm = TCPCommunication(key_pair=key_pair)
+    sent = []
+    results = iter([True, False, True, True])
+
+    def fake_send(data_type, data):
+        ok = next(results)
+        if ok:
+            sent.append(data)
+        return ok
+
+    comm.send_data = fake_send
+    assert comm.send_messages([MouseMove(100, 100)])
+    assert not comm.send_messages([MouseMove(150, 120)]), "发送失败应返回False"
+    assert comm.send_messages([MouseMoveRel(5, 5)])
+    assert comm.send_messages([MouseMove(200, 200)])
+
+    decoder = MessageDecoder()
+    decoded = [decoder.decode(data) for data in sent]
+    assert decoded[0] == [MouseMove(100, 100)]
+    assert decoded[1] == [MouseMove(150, 120), MouseMoveRel(5, 5)], "发送失败后未补发绝对移动"
+    assert decoded[2] == [MouseMove(200, 200)], "发送失败后坐标基准错位"
+
+def test_host_handler_over_loopback(key_pair):
+    """测试被控端消息处理（本机回环）：Resize缩小画面，画面坐标映射回屏幕坐标后执行，输入批次回复Ack"""
+    screen = ScreenCapture(backend="synthetic")
+    control = InputControl(backend="null")
+    handler = HostMessageHandler(control, screen)
+    server = TCPCommunication(key_pair=key_pair)
+    assert server.start_server("127.0.0.1", 0, on_session=handler.attach)
+    client = TCPCommunication(key_pair=key_pair)
+    received = []
+    client.on_message_received = received.append
+    assert client.connect_client("127.0.0.1", server.socket.getsockname()[1]), "回环连接失败"
+
+    assert client.send_messages([Resize(960, 540, 96)])
+    assert _wait_until(lambda: screen.viewport == (960, 540)), "Resize未设置画面大小"
+    assert screen.capture_full_screen()  # 按新的显示区域缩小一帧，更新坐标映射比例
+    assert client.send_messages([MouseMove(480, 270), KeyPress("a")])
+    assert _wait_until(lambda: received), "未收到输入确认"
+
+    assert received == [Ack(1)], "Resize不应被确认，输入批次应确认一次"
+    events = [(e.action, e.args) for e in control.input_impl.take_events()]
+    assert events == [("move_to", (960, 540)), ("press", ("a",))], "坐标未映射回屏幕坐标或输入未执行"
+    client.close()
+    server.close()
+
+def _handshake_pair(key_pair):
+    """本机套接字对上的两端完成握手（一端在线程中握手），返回（发起端, 接收端）"""
+    left, right = socket.socketpair()
+    a, b = TCPCommunication(key_pair=key_pair), TCPCommunication(key_pair=key_pair)
+    a.socket, b.socket = left, right
+    result = []
+    t = threading.Thread(target=lambda: result.append(a._auth_exchange()))
+    t.start()
+    assert b._auth_exchange(), "握手失败"
+    t.join()
+    assert result == [True], "握手失败"
+    return a, b
+
+def _fake_hello(sock, magic=communication.HELLO_MAGIC, version=communication.HANDSHAKE_VERSION,
+                public_key=b"", caps=b""):
+    sock.sendall(communication._HELLO_HEADER.pack(magic, version, b"n" * communication.NONCE_SIZE,
+                                                  len(public_key), len(caps)) + public_key + caps)
+
+@pytest.mark.parametrize("token_ok", [True, False])
+def test_key_confirmation(key_pair, token_ok):
+    """测试密钥确认：确认信息正确时第一帧正常分发；认证信息错误时接收端断开连接，不分发数据"""
+    a, b = _handshake_pair(key_pair)
+    assert a.peer_capabilities["codecs"] == a.capabilities["codecs"], "未交换能力"
+    if not token_ok:
+        a._key_confirmation = a.rsa.encrypt(b"PyRemote_Auth_NO" + b._local_nonce)
+    received = []
+    b.on_data_received = lambda data_type, data: received.append(data)
+    a._start_session()
+    b._start_session()
+    assert a.send_data(DATA_TYPE_SCREEN, b"frame")
+    if token_ok:
+        assert _wait_until(lambda: received == [b"frame"]), "确认正确时第一帧未分发"
+        assert b.is_connected
+    else:
+        assert _wait_until(lambda: not b.is_connected), "密钥确认失败时未断开连接"
+        assert received == [], "密钥确认失败的帧不应被分发"
+    a.close()
+    b.close()
+
+@pytest.mark.parametrize("hello", [
+    {"magic": b"HTTP"},
+    {"version": communication.HANDSHAKE_VERSION - 1},
+    {"caps": json.dumps({"protocol": PROTOCOL_VERSION + 1}).encode("utf-8")},
+])
+def test_incompatible_hello_rejected(key_pair, hello):
+    """测试握手拒绝不兼容的对方：魔数错误、握手版本不同、消息格式版本不同"""
+    peer, local = socket.socketpair()
+    comm = TCPCommunication(key_pair=key_pair)
+    comm.socket = local
+    if "caps" in hello:
+        hello["public_key"] = key_pair.publickey().export_key()
+    _fake_hello(peer, **hello)
+    assert not comm._auth_exchange(), "不兼容的Hello未被拒绝"
+    assert comm._key_confirmation is None, "拒绝后不应生成密钥确认"
+    peer.close()
+    local.close()
+
+def test_truncated_hello(key_pair):
+    """测试Hello未发完连接即中断：_recv_exact抛出异常，握手失败"""
+    peer, local = socket.socketpair()
+    comm = TCPCommunication(key_pair=key_pair)
+    comm.socket = local
+    peer.sendall(communication.HELLO_MAGIC + bytes(3))
+    peer.shutdown(socket.SHUT_WR)
+    with pytest.raises(Exception, match="连接中断"):
+        comm._recv_exact(communication._HELLO_HEADER.size)
+
+    peer2, local2 = socket.socketpair()
+    comm.socket = local2
+    public_key = key_pair.publickey().export_key()
+    peer2.sendall(communication._HELLO_HEADER.pack(communication.HELLO_MAGIC, communication.HANDSHAKE_VERSION,
+                                                   b"n" * communication.NONCE_SIZE, len(public_key), 0)
+                  + public_key[:50])
+    peer2.shutdown(socket.SHUT_WR)  # 公钥只发送了一部分
+    assert not comm._auth_exchange(), "Hello内容不完整时握手应失败"
+    for s in (peer, local, peer2, local2):
+        s.close()
+
+def test_receive_pipeline_keeps_order_on_one_thread(key_pair):
+    """测试接收流水线：分片大帧与小帧按发送顺序在分发线程中执行回调，消息按发送顺序在高优先级分发线程中执行"""
+    a, b = _handshake_pair(key_pair)
+    events = []
+    b.on_data_received = lambda data_type, data: events.append(
+        (threading.current_thread().name, data_type, bytes(data)))
+    b.on_message_received = lambda msg: events.append((threading.current_thread().name, "msg", msg))
+    a._start_session()
+    b._start_session()
+
+    frames = [bytes([i]) * (6000 if i % 2 == 0 else 100) for i in range(6)]  # 大帧分片，小帧不分片
+    for i, frame in enumerate(frames):
+        assert a.send_data(DATA_TYPE_SCREEN, frame)
+        assert a.send_messages([MouseMove(i, i)])
+    assert _wait_until(lambda: sum(1 for e in events if e[1] == "msg") == 6), "消息未全部送达"
+    assert _wait_until(lambda: sum(1 for e in events if e[1] == DATA_TYPE_SCREEN) == 6), "屏幕帧未全部送达"
+
+    assert {e[0] for e in events if e[1] == DATA_TYPE_SCREEN} == {"pyremote-tcp-dispatch"}, "屏幕帧不在分发线程中执行"
+    assert {e[0] for e in events if e[1] == "msg"} == {"pyremote-tcp-priority"}, "消息不在高优先级分发线程中执行"
+    assert [e[2] for e in events if e[1] == DATA_TYPE_SCREEN] == frames, "屏幕帧乱序"
+    assert [e[2] for e in events if e[1] == "msg"] == [MouseMove(i, i) for i in range(6)], "消息乱序"
+    a.close()
+    b.close()
+
+def test_receive_pipeline_stops_after_callback_error(key_pair):
+    """测试回调异常后接收流水线各线程退出（队列已满时接收线程不会永久阻塞）"""
+    a, b = _handshake_pair(key_pair)
+    for comm in (a, b):
+        comm.rsa = _PlainRSA()  # 只测试流水线，跳过密钥确认与RSA解密
+        comm._key_confirmation = None
+        comm._awaiting_confirmation = False
+
+    def fail(data_type, data):
+        raise Exception("回调异常")
+    b.on_data_received = fail
+    before = set(threading.enumerate())
+    b._start_session()
+    threads = [t for t in threading.enumerate() if t not in before and t.name != "pyremote-tcp-writer"]
+    assert len(threads) == 4, "接收流水线应为接收、解密、分发、高优先级分发四个线程"
+    a._start_session()
+    a.send_timeout = 0.5
+    for _ in range(200):
+        if not a.send_data(DATA_TYPE_SCREEN, b"x" * 6000):  # 分片帧，经解密线程
+            break
+    a.close()
+    for t in threads:
+        t.join(timeout=3.0)
+    assert not [t.name for t in threads if t.is_alive()], "接收流水线线程未退出"
+    assert not b.is_connected
+    b.close()
+
+def test_priority_frames_not_blocked_by_screen_callback(key_pair):
+    """测试屏幕帧回调阻塞时，音频帧仍在高优先级分发线程中及时执行，到达时刻为接收线程收到该帧的时刻"""
+    a, b = _handshake_pair(key_pair)
+    entered, release = threading.Event(), threading.Event()
+    events = []
+
+    def on_data(data_type, data):
+        if data_type == DATA_TYPE_SCREEN:
+            entered.set()
+            release.wait(5.0)  # 模拟解码很慢的屏幕帧
+        events.append((threading.current_thread().name, data_type, b.arrival_time, time.perf_counter()))
+    b.on_data_received = on_data
+    a._start_session()
+    b._start_session()
+
+    assert a.send_data(DATA_TYPE_SCREEN, b"s" * 6000)
+    assert entered.wait(10.0), "屏幕帧未送达"
+    assert a.send_data(DATA_TYPE_AUDIO, b"audio", priority=True)
+    assert _wait_until(lambda: any(e[1] == DATA_TYPE_AUDIO for e in events)), "音频帧被阻塞在屏幕帧之后"
+    assert not release.is_set() and not any(e[1] == DATA_TYPE_SCREEN for e in events)
+    name, _, arrival, called = events[0]
+    assert name == "pyremote-tcp-priority", "音频帧不在高优先级分发线程中执行"
+    assert arrival is not None and arrival <= called, "到达时刻应在接收线程中记录"
+
+    release.set()
+    assert _wait_until(lambda: any(e[1] == DATA_TYPE_SCREEN for e in events)), "屏幕帧未送达"
+    assert b.arrival_time is None, "到达时刻只在回调中有效"
+    a.close()
+    b.close()
@@ -0,0 +1,58 @@
+import io
+import random
+from PIL import Image, ImageChops
+from pyremote.core.frame_decoder import ViewportDecoder
+from pyremote.core.tile_encoder import HybridTileEncoder, ParallelTileEncoder, decode_frame
+
+def _jpeg(size, color=(200, 120, 40)):
+    buf = io.BytesIO()
+    Image.new("RGB", size, color).save(buf, format="JPEG", quality=80)
+    return buf.getvalue()
+
+def test_decode_fits_viewport():
+    """测试按显示区域解码：按比例缩小（不放大），显示区域或原始分辨率变化后输出大小随之变化"""
+    decoder = ViewportDecoder((600, 400))
+    img = decoder.decode(_jpeg((1600, 1200)))
+    assert img.size == (533, 400), "按比例缩小后的大小错误"
+    assert img.getpixel((266, 200))[0] > 150, "缩小后画面内容错误"
+    assert decoder.decode(_jpeg((1600, 1200))) is img, "相同大小的画面应复用目标图像"
+
+    assert decoder.decode(_jpeg((320, 240))).size == (320, 240), "小画面不应放大"
+    decoder.set_viewport((200, 200))
+    assert decoder.decode(_jpeg((1600, 1200))).size == (200, 150), "显示区域变化后大小错误"
+
+def test_decode_tiled_frame_fits_viewport():
+    """测试分块帧按显示区域解码：各分块缩放后拼接，无缝隙"""
+    encoder = ParallelTileEncoder(workers=3, min_pixels=0)
+    frame = encoder.encode(Image.new("RGB", (960, 480), (30, 200, 90)), quality=90)
+    encoder.close()
+    img = ViewportDecoder((480, 480)).decode(frame)
+    assert img.size == (480, 240), "分块帧缩小后的大小错误"
+    for y in range(0, 240, 8):
+        assert img.getpixel((240, y))[1] > 150, f"第{y}行出现缝隙或内容错误"
+
+def _cells(kinds, size=128):
+    """按网格拼接画面：flat=纯色（无损分块），noise=随机噪声（JPEG分块）"""
+    rnd = random.Random(0)
+    img = Image.new("RGB", (size * len(kinds), size), (240, 240, 240))
+    for i, kind in enumerate(kinds):
+        if kind == "noise":
+            data = bytes(rnd.getrandbits(8) for _ in range(size * size * 3))
+            img.paste(Image.frombytes("RGB", (size, size), data), (i * size, 0))
+    return img
+
+def test_tile_cache_follows_layout_changes():
+    """测试分块布局变化（A/B/A）：位置相同的分块虽然数据未变，也要重新绘制被其他分块覆盖的区域"""
+    encoder = HybridTileEncoder(workers=1)
+    frame_a = encoder.encode(_cells(["flat", "flat", "noise"]), quality=80)
+    frame_b = encoder.encode(_cells(["flat", "noise", "noise"]), quality=80)
+    encoder.close()
+
+    decoder = ViewportDecoder((384, 128))
+    for frame in (frame_a, frame_b, frame_a):
+        img = decoder.decode(frame)
+        assert ImageChops.difference(img, decode_frame(frame).convert("RGB")).getbbox() is None, "画面残留上一帧的分块"
+
+    decoder.decode(_jpeg((384, 128)))
+    img = decoder.decode(frame_a)
+    assert ImageChops.difference(img, decode_frame(frame_a).convert("RGB")).getbbox() is None, "整帧画面之后分块未重新绘制"
@@ -0,0 +1,63 @@
+import random
+import socket
+import threading
+import types
+from pyremote.utils import netem
+
+def _fixed_clock(monkeypatch, now):
+    """固定链路整形使用的当前时刻"""
+    monkeypatch.setattr(netem, "time", types.SimpleNamespace(monotonic=lambda: now))
+
+def test_bandwidth_and_latency(monkeypatch):
+    """测试带宽限制：串行化时间按字节数累加，送达时刻=串行化完成+固定延迟"""
+    _fixed_clock(monkeypatch, 100.0)
+    shaper = netem._LinkShaper(netem.LinkProfile(latency_ms=50, bandwidth_kbps=80))  # 10KB/s
+    assert abs(shaper.delivery_time(1000) - 100.15) < 1e-9, "第一块送达时刻错误"
+    assert abs(shaper.delivery_time(1000) - 100.25) < 1e-9, "链路繁忙时第二块未排在第一块之后"
+
+    unlimited = netem._LinkShaper(netem.LinkProfile(latency_ms=20))
+    assert abs(unlimited.delivery_time(10 ** 6) - 100.02) < 1e-9, "不限带宽时不应有串行化时间"
+
+def test_jitter_keeps_tcp_order(monkeypatch):
+    """测试抖动：TCP保序时送达时刻单调不减，UDP（不保序）时允许后发先到；延迟不为负"""
+    _fixed_clock(monkeypatch, 0.0)
+    profile = netem.LinkProfile(latency_ms=10, jitter_ms=40)
+    tcp = netem._LinkShaper(profile, random.Random(1))
+    times = [tcp.delivery_time(100) for _ in range(200)]
+    assert times == sorted(times), "TCP链路出现乱序送达"
+    assert all(t >= 0 for t in times), "抖动导致送达时刻早于发送时刻"
+
+    udp = netem._LinkShaper(profile, random.Random(1))
+    times = [udp.delivery_time(100, keep_order=False) for _ in range(200)]
+    assert times != sorted(times), "UDP链路抖动未产生乱序"
+    assert max(times) <= 0.05 + 1e-9, "送达时刻超过延迟+抖动上限"
+
+def test_tcp_scenarios_have_no_udp_impairments():
+    """测试预置场景经TCP代理运行，不应设置TCP代理无法模拟的丢包/乱序"""
+    for name, profile in netem.SCENARIOS.items():
+        assert profile.loss_rate == 0 and profile.reorder_rate == 0, f"场景{name}设置了仅UDP有效的参数"
+
+def test_stop_closes_forwarded_connections():
+    """测试停止代理时关闭转发中的连接：两端都收到连接关闭，转发线程退出"""
+    target = socket.create_server(("127.0.0.1", 0))
+    proxy = netem.ImpairmentProxy("127.0.0.1", target.getsockname()[1], netem.LinkProfile())
+    port = proxy.start()
+    client = socket.create_connection(("127.0.0.1", port))
+    upstream, _ = target.accept()
+    try:
+        client.sendall(b"ping")
+        assert upstream.recv(4) == b"ping", "代理未转发数据"
+
+        proxy.stop()
+        client.settimeout(2)
+        upstream.settimeout(2)
+        assert client.recv(16) == b"", "停止后客户端连接未关闭"
+        assert upstream.recv(16) == b"", "停止后上游连接未关闭"
+        for t in threading.enumerate():
+            if t.name.startswith("pyremote-netem-"):
+                t.join(timeout=2)
+                assert not t.is_alive(), f"停止后线程{t.name}未退出"
+    finally:
+        client.close()
+        upstream.close()
+        target.close()
@@ -0,0 +1,27 @@
+from pyremote.core import protocol
+from pyremote.core.input_control import InputControl
+from pyremote.core.screen_capture import ScreenCapture
+from pyremote.platform.synthetic import SyntheticScreen
+
+def test_synthetic_screen_changes_and_idles():
+    """测试合成屏幕：活动期画面变化，空闲期画面不变，相同种子画面一致"""
+    screen = SyntheticScreen(width=320, height=240, active_frames=4, idle_frames=3, text_interval=1)
+    frames = [screen.capture_full().tobytes() for _ in range(7)]
+    assert frames[0] != frames[1], "活动期画面未变化"
+    assert frames[4] == frames[5] == frames[6], "空闲期画面发生变化"
+
+    again = SyntheticScreen(width=320, height=240, active_frames=4, idle_frames=3, text_interval=1)
+    assert again.capture_full().tobytes() == frames[0], "相同种子生成的画面不一致"
+
+def test_headless_pipeline():
+    """测试无显示器运行：合成屏幕捕获编码，输入消息由空输入后端记录"""
+    capture = ScreenCapture(backend="synthetic")
+    data = capture.capture_full_screen()
+    assert data and data[:2] == b"\xff\xd8", "合成画面编码失败"
+
+    control = InputControl(backend="null")
+    assert control.apply_message(protocol.MouseMove(99999, 5)) is True, "鼠标移动执行失败"
+    assert control.apply_message(protocol.KeyPress("ctrl+c")) is True, "按键执行失败"
+    events = control.input_impl.take_events()
+    assert [e.action for e in events] == ["move_to", "press"], "输入事件记录不一致"
+    assert events[0].args == (control.screen_width - 1, 5), "鼠标坐标未限制在屏幕范围内"
@@ -0,0 +1,130 @@
+import sys
+import threading
+import time
+import pytest
+from pyremote.utils.profiler import SamplingProfiler
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="按线程CPU时间加权依赖Linux线程CPU时钟")
+
+def _spin(stop):
+    """持续占用CPU"""
+    total = 0
+    while not stop.is_set():
+        total += sum(range(1000))
+    return total
+
+def test_folded_stacks_weighted_by_thread_cpu(tmp_path):
+    """测试折叠栈输出：每行“线程名;外层函数;...;内层函数 CPU微秒”，阻塞等待的线程不计入；导出文件内容一致"""
+    stop = threading.Event()
+    busy = threading.Thread(target=_spin, args=(stop,), name="test-busy", daemon=True)
+    idle = threading.Thread(target=stop.wait, name="test-idle", daemon=True)
+    busy.start()
+    idle.start()
+    time.sleep(0.1)  # 等待空闲线程进入阻塞（启动过程本身消耗的CPU不在本测试范围内）
+    profiler = SamplingProfiler(output_dir=str(tmp_path), trace_memory=False)
+    try:
+        for _ in range(20):
+            profiler._sample(0.01)
+            time.sleep(0.01)
+    finally:
+        stop.set()
+        busy.join()
+        idle.join()
+
+    lines = profiler.folded_stacks().splitlines()
+    assert lines == sorted(lines), "折叠栈应按调用栈排序"
+    busy_lines = []
+    for line in lines:
+        stack, weight = line.rsplit(" ", 1)
+        assert int(weight) > 0, "权重应为正整数（CPU微秒）"
+        assert not stack.startswith("test-idle;"), "阻塞等待的线程不应计入"
+        if stack.startswith("test-busy;"):
+            busy_lines.append(stack)
+    assert busy_lines, "未采集到占用CPU的线程"
+    assert any(stack.split(";")[-1].startswith("_spin (tests/test_profiler.py:") for stack in busy_lines), \
+        "栈帧标签应为“函数名 (文件:行号)”，内层函数在最后"
+    assert all(";" in stack and stack.split(";")[1].startswith("_bootstrap") for stack in busy_lines), \
+        "外层函数应在前"
+
+    folded_path, report_path = profiler.dump(prefix="run")
+    assert folded_path == str(tmp_path / "run.folded")
+    with open(folded_path, encoding="utf-8") as f:
+        assert f.read() == profiler.folded_stacks(), "导出的折叠栈与内存中的结果不一致"
+    with open(report_path, encoding="utf-8") as f:
+        assert "test-busy" in f.read(), "报告中缺少线程CPU统计"
+
+def test_start_stop_toggle(tmp_path):
+    """测试运行时开关：重复开始/停止返回False；toggle停止时导出结果，开始时返回None"""
+    profiler = SamplingProfiler(interval=0.005, output_dir=str(tmp_path), trace_memory=False)
+    stop = threading.Event()
+    busy = threading.Thread(target=_spin, args=(stop,), name="test-busy", daemon=True)
+    busy.start()
+    try:
+        assert profiler.start() is True
+        assert profiler.start() is False, "运行中重复开始应返回False"
+        assert profiler.running
+        time.sleep(0.2)
+        assert profiler.stop() is True
+        assert profiler.stop() is False, "未运行时停止应返回False"
+        status = profiler.status()
+        assert not status["running"] and status["samples"] > 0, "停止后状态错误"
+        assert "test-busy" in status["threads"], "状态中缺少线程CPU统计"
+
+        assert profiler.toggle() is None and profiler.running, "toggle未开始剖析"
+        assert profiler.status()["samples"] < status["samples"], "重新开始时未清空上一次的数据"
+        time.sleep(0.1)
+        folded_path, report_path = profiler.toggle()
+        assert not profiler.running, "toggle未停止剖析"
+    finally:
+        stop.set()
+        busy.join()
+    with open(report_path, encoding="utf-8") as f:
+        assert "test-busy" in f.read(), "toggle导出的报告缺少线程CPU统计"
+    assert folded_path.startswith(str(tmp_path))
+
+def test_memory_high_watermark(tmp_path):
+    """测试内存高水位：报告列出高水位时刻的主要分配位置与剖析期间的增长"""
+    profiler = SamplingProfiler(interval=0.01, memory_interval=0.05, output_dir=str(tmp_path))
+    assert profiler.start()
+    try:
+        time.sleep(0.1)
+        blocks = [bytearray(1024) for _ in range(8192)]  # 约8MB，高水位
+        time.sleep(0.2)
+    finally:
+        profiler.stop()
+    report = profiler.report()
+    del blocks
+
+    assert profiler.traced_peak >= 8 << 20, "tracemalloc峰值未记录"
+    assert profiler.memory_history, "未记录内存水位"
+    lines = report.split("== 内存高水位 ==", 1)[1].splitlines()
+    peak = next(i for i, line in enumerate(lines) if "高水位时刻" in line)
+    growth = next(i for i, line in enumerate(lines) if "剖析期间增长最多的分配位置" in line)
+    assert "tests/test_profiler.py:" in lines[peak + 1], "高水位时刻的最大分配位置错误"
+    assert "tests/test_profiler.py:" in lines[growth + 1], "增长最多的分配位置错误"
+
+def test_admin_profile_route(tmp_path, monkeypatch):
+    """测试Web管理接口：非本机访问返回403；本机可查询状态、开始、停止并导出"""
+    pytest.importorskip("flask")
+    from pyremote.ui import web
+    from pyremote.utils import profiler as profiler_module
+    monkeypatch.setattr(profiler_module, "_profiler",
+                        SamplingProfiler(interval=0.005, output_dir=str(tmp_path), trace_memory=False))
+    client = web.web_app.test_client()
+
+    remote = {"REMOTE_ADDR": "192.168.1.20"}
+    assert client.get("/api/admin/profile", environ_base=remote).status_code == 403, "非本机访问未拒绝"
+    response = client.post("/api/admin/profile", json={"action": "start"}, environ_base=remote)
+    assert response.status_code == 403 and not profiler_module.get_profiler().running, "非本机请求不应开始剖析"
+
+    local = {"REMOTE_ADDR": "127.0.0.1"}
+    assert client.get("/api/admin/profile", environ_base=local).get_json()["running"] is False
+    assert client.post("/api/admin/profile", json={"action": "start"}, environ_base=local).get_json()["success"]
+    assert client.get("/api/admin/profile", environ_base=local).get_json()["running"] is True
+    time.sleep(0.05)
+    result = client.post("/api/admin/profile", json={"action": "stop"}, environ_base=local).get_json()
+    assert result["success"] and result["report"].startswith(str(tmp_path)), "停止后未导出结果"
+    result = client.post("/api/admin/profile", json={"action": "stop"}, environ_base=local).get_json()
+    assert result["success"] is False, "未运行时停止应失败"
+    response = client.post("/api/admin/profile", json={"action": "restart"}, environ_base=local)
+    assert response.status_code == 400, "未知操作应返回400"
@@ -0,0 +1,38 @@
+import pytest
+from pyremote.core import protocol
+from pyremote.core.protocol import MessageEncoder, MessageDecoder
+
+def test_message_roundtrip():
+    """测试所有消息类型编码解码一致"""
+    messages = [
+        protocol.MouseMove(1920, 1080),
+        protocol.MouseMove(1900, 1100),
+        protocol.MouseMoveRel(-50, 0),
+        protocol.MouseButton("right", protocol.BUTTON_CLICK),
+        protocol.MouseScroll(-3),
+        protocol.KeyDown("ctrl"),
+        protocol.KeyPress("ctrl+c"),
+        protocol.KeyUp("ctrl"),
+        protocol.Text("你好 PyRemote"),
+        protocol.Cursor(10, 20, 1),
+        protocol.Resize(390, 844, 460),
+        protocol.Stats(30, 45, 2500, 2),
+        protocol.Ack(12345),
+    ]
+    data = MessageEncoder().encode(messages)
+    assert MessageDecoder().decode(data) == messages, "消息编解码结果不一致"
+
+def test_mouse_move_is_compact():
+    """测试鼠标移动按坐标差值编码（连续小幅移动每条仅3字节）"""
+    encoder = MessageEncoder()
+    decoder = MessageDecoder()
+    decoder.decode(encoder.encode([protocol.MouseMove(1000, 700)]))
+
+    data = encoder.encode([protocol.MouseMove(1003, 698)])
+    assert len(data) == 1 + 3, "鼠标移动消息编码过长"
+    assert decoder.decode(data) == [protocol.MouseMove(1003, 698)], "差值解码错误"
+
+def test_unsupported_version():
+    """测试消息版本不匹配时拒绝解码"""
+    with pytest.raises(Exception):
+        MessageDecoder().decode(bytes([99, protocol.MSG_ACK, 1]))
@@ -0,0 +1,96 @@
+import os
+import time
+import pytest
+from pyremote.core.recorder import SessionRecorder, SessionPlayer
+
+def test_record_and_seek(tmp_path):
+    """测试会话录像写入、关键帧索引与跳转"""
+    path = str(tmp_path / "session.prrc")
+    recorder = SessionRecorder(path, keyframe_interval=0.01)
+    assert recorder.start() is True, "录像启动失败"
+
+    for i in range(20):
+        recorder.record(1, b"frame-%d" % i)  # 1=屏幕截图数据
+        recorder.record(2, b"input-%d" % i, inbound=True)
+        time.sleep(0.002)
+    recorder.stop()
+
+    player = SessionPlayer(path)
+    frames = list(player.frames())
+    assert len(frames) == 40, "录像帧数不一致"
+    assert bytes(frames[0].payload) == b"frame-0", "录像内容不一致"
+    assert frames[1].inbound is True, "接收方向标记丢失"
+    assert player.keyframe_count > 1, "未生成周期性关键帧"
+
+    # 跳转到最后一帧之后，应得到最后一帧屏幕截图
+    last = player.frame_at(frames[-1].timestamp + 1)
+    assert bytes(last.payload) == b"frame-19", "跳转结果错误"
+
+    # 跳转到中间时刻，得到的帧不晚于该时刻
+    middle = frames[20].timestamp
+    frame = player.frame_at(middle)
+    assert frame.timestamp <= middle, "跳转结果晚于目标时刻"
+    del frames, last, frame
+    player.close()
+
+def test_rebuild_index_without_trailer(tmp_path):
+    """测试未正常关闭的录像（文件尾索引不完整）可扫描重建索引"""
+    path = tmp_path / "crashed.prrc"
+    recorder = SessionRecorder(str(path), keyframe_interval=0)
+    recorder.start()
+    for i in range(5):
+        recorder.record(1, b"frame-%d" % i)
+    recorder.stop()
+    # 模拟崩溃：文件尾只写了一半
+    with open(path, "r+b") as f:
+        f.truncate(path.stat().st_size - 1)
+
+    player = SessionPlayer(str(path))
+    assert player.keyframe_count == 5, "索引重建失败"
+    assert len(list(player.frames())) == 5, "重建后帧数不一致"
+    assert bytes(player.frame_at(player.duration).payload) == b"frame-4", "重建后跳转错误"
+    player.close()
+
+def test_duration_uses_last_record(tmp_path):
+    """测试录像时长以最后一条记录为准（最后一个关键帧之后还有输入事件）"""
+    path = str(tmp_path / "session.prrc")
+    recorder = SessionRecorder(path, keyframe_interval=60)
+    recorder.start()
+    recorder.record(1, b"frame")
+    time.sleep(0.05)
+    recorder.record(2, b"input", inbound=True)
+    recorder.stop()
+
+    player = SessionPlayer(path)
+    frames = list(player.frames())
+    assert player.keyframe_count == 1
+    assert player.duration == frames[-1].timestamp >= 0.05, "时长未包含最后一个关键帧之后的记录"
+    del frames
+    player.close()
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/fd") or not os.path.exists("/dev/full"),
+                    reason="依赖Linux的/dev/full与/proc/self/fd")
+def test_stop_closes_file_after_write_error():
+    """测试写入失败（磁盘已满）后录像自动停止，stop()仍关闭文件"""
+    def open_files():
+        count = 0
+        for fd in os.listdir("/proc/self/fd"):
+            try:
+                count += os.readlink(f"/proc/self/fd/{fd}") == "/dev/full"
+            except FileNotFoundError:
+                pass  # listdir自身使用的描述符
+        return count
+
+    before = open_files()
+    recorder = SessionRecorder("/dev/full")
+    assert recorder.start() is True
+    assert recorder.record(1, b"x" * (2 << 20)), "入队失败"  # 超过写缓冲区，写入时报错
+    deadline = time.time() + 5
+    while recorder.is_recording and time.time() < deadline:
+        time.sleep(0.01)
+    assert not recorder.is_recording, "写入失败后未停止录像"
+    assert not recorder.record(1, b"frame"), "停止后仍接受新帧"
+
+    recorder.stop()
+    assert open_files() == before, "写入失败后stop()未关闭文件"
+    recorder.stop()  # 重复停止无影响
@@ -0,0 +1,41 @@
+import io
+from types import SimpleNamespace
+from PIL import Image
+from pyremote.core.recorder import SessionRecorder
+from pyremote.core.tile_encoder import ParallelTileEncoder
+from pyremote.ui.replay import run_replay
+
+def _record(path, payload):
+    recorder = SessionRecorder(str(path))
+    recorder.start()
+    recorder.record(1, payload, inbound=True)  # 1=屏幕截图数据
+    recorder.stop()
+
+def test_export_tiled_frame_as_jpeg(tmp_path):
+    """测试导出分块帧：解码拼接后保存为可正常打开的JPEG"""
+    img = Image.new("RGB", (96, 80), (30, 120, 200))
+    encoder = ParallelTileEncoder(workers=2, min_pixels=0)
+    try:
+        _record(tmp_path / "tiled.prrc", encoder.encode(img))
+    finally:
+        encoder.close()
+
+    output = tmp_path / "frame.jpg"
+    run_replay(SimpleNamespace(file=str(tmp_path / "tiled.prrc"), seek=1.0, output=str(output)))
+    exported = Image.open(io.BytesIO(output.read_bytes()))
+    assert exported.format == "JPEG", "分块帧未转换为JPEG"
+    assert exported.size == img.size, "导出画面尺寸错误"
+
+def test_export_jpeg_and_skip_unknown(tmp_path):
+    """测试整帧JPEG原样导出；无法识别的画面数据不导出"""
+    buf = io.BytesIO()
+    Image.new("RGB", (32, 32)).save(buf, format="JPEG")
+    _record(tmp_path / "jpeg.prrc", buf.getvalue())
+    output = tmp_path / "frame.jpg"
+    run_replay(SimpleNamespace(file=str(tmp_path / "jpeg.prrc"), seek=1.0, output=str(output)))
+    assert output.read_bytes() == buf.getvalue(), "整帧JPEG导出内容不一致"
+
+    _record(tmp_path / "raw.prrc", b"not an image")
+    output = tmp_path / "raw.jpg"
+    run_replay(SimpleNamespace(file=str(tmp_path / "raw.prrc"), seek=1.0, output=str(output)))
+    assert not output.exists(), "无法识别的画面数据不应导出"
@@ -0,0 +1,35 @@
+import pytest
+from pyremote.core.screen_capture import ScreenCapture, encoding_options
+from pyremote.core.tile_encoder import is_tiled_frame
+from pyremote.platform.synthetic import SyntheticScreen
+
+def _capture(encoding):
+    screen = ScreenCapture(backend="synthetic", **encoding_options(encoding))
+    screen.screen_impl = SyntheticScreen(width=320, height=240)
+    return screen
+
+def test_tiled_encoding_follows_peer_codecs():
+    """测试编码协商：分块帧只在对方声明支持所需编码时使用，否则（及Web）输出整帧JPEG"""
+    full = {"codecs": ["jpeg", "tiles", "png"]}
+    hybrid = _capture("hybrid")
+    assert hybrid.supports_peer(full)
+    assert not hybrid.supports_peer({"codecs": ["jpeg", "tiles"]}), "混合编码需要对方支持PNG分块"
+    assert not hybrid.supports_peer({}), "未声明能力的对方不应收到分块帧"
+    assert _capture("parallel").supports_peer({"codecs": ["jpeg", "tiles"]})
+    assert _capture("jpeg").supports_peer({}), "整帧JPEG适用于任何对方"
+
+    with hybrid.capture_full_screen_frame() as frame:
+        assert is_tiled_frame(frame.data), "支持分块帧时应输出分块帧"
+    with hybrid.capture_full_screen_frame(tiles=False) as frame:
+        assert bytes(frame.data[:2]) == b"\xff\xd8", "不支持分块帧时应输出整帧JPEG"
+    assert hybrid.capture_full_screen(tiles=False)[:2] == b"\xff\xd8"
+
+def test_encoding_options(monkeypatch):
+    """测试编码方式：命令行优先，其次环境变量，默认整帧JPEG"""
+    monkeypatch.delenv("PYREMOTE_ENCODING", raising=False)
+    assert encoding_options() == {"parallel_encoding": False, "hybrid_encoding": False}
+    monkeypatch.setenv("PYREMOTE_ENCODING", "parallel")
+    assert encoding_options() == {"parallel_encoding": True, "hybrid_encoding": False}
+    assert encoding_options("hybrid") == {"parallel_encoding": False, "hybrid_encoding": True}
+    with pytest.raises(Exception, match="未知的编码方式"):
+        encoding_options("webp")
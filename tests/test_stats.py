@@ -0,0 +1,13 @@
+from pyremote.utils.stats import percentile
+
+def test_percentile_nearest_rank():
+    """测试百分位数（最近秩法）：结果为实际样本，不修改输入顺序，无样本时为0"""
+    values = list(range(100, 0, -1))  # 1~100，倒序
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 99.9) == 100, "p99.9应取最大样本"
+    assert percentile(values, 0) == 1
+    assert percentile(values, 100) == 100
+    assert values[0] == 100, "不应修改输入样本"
+    assert percentile([7.5], 99) == 7.5
+    assert percentile([], 50) == 0.0
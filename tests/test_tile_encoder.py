@@ -0,0 +1,75 @@
+import io
+import random
+from PIL import Image, ImageChops, ImageDraw, ImageFont
+from pyremote.core.tile_encoder import (CODEC_JPEG, CODEC_PNG, HybridTileEncoder, ParallelTileEncoder,
+                                        decode_frame, iter_tiles)
+
+def _text_cell(background, size=128):
+    """抗锯齿文字网格（多种语法高亮颜色，边缘有数百种过渡色）"""
+    img = Image.new("RGB", (size, size), background)
+    draw = ImageDraw.Draw(img)
+    font = ImageFont.load_default(size=13)
+    rnd = random.Random(1)
+    colors = [(220, 220, 220), (86, 156, 214), (206, 145, 120), (78, 201, 176), (197, 134, 192)]
+    for y in range(2, size, 15):
+        x = 2
+        for word in "def encode self frame return len buffer".split():
+            draw.text((x, y), word, fill=rnd.choice(colors), font=font)
+            x += draw.textlength(word + " ", font=font)
+    return img
+
+def _photo_cell(size=128):
+    """照片类网格（低分辨率噪声放大，颜色连续变化）"""
+    rnd = random.Random(0)
+    data = bytes(rnd.getrandbits(8) for _ in range((size // 8) ** 2 * 3))
+    noise = Image.frombytes("RGB", (size // 8, size // 8), data)
+    return noise.resize((size, size), Image.BICUBIC)
+
+def test_text_cells_lossless_photo_cells_jpeg():
+    """测试混合编码分类：抗锯齿文字网格（颜色数超过max_colors）无损编码，照片网格用JPEG"""
+    text_dark, text_light = _text_cell((30, 30, 30)), _text_cell((255, 255, 255))
+    assert len(text_dark.getcolors(4096)) > 128, "测试用文字网格的颜色数应超过max_colors"
+    img = Image.new("RGB", (384, 128))
+    for i, cell in enumerate((text_dark, text_light, _photo_cell())):
+        img.paste(cell, (i * 128, 0))
+
+    encoder = HybridTileEncoder(workers=1)
+    frame = encoder.encode(img, quality=60)
+    encoder.close()
+    width, height, tiles = iter_tiles(frame)
+    assert [(x, w, codec) for x, _, w, _, codec, _ in tiles] == [(0, 256, CODEC_PNG), (256, 128, CODEC_JPEG)], \
+        "文字网格应合并为一个无损分块，照片网格应为JPEG分块"
+    decoded = decode_frame(frame).convert("RGB")
+    assert ImageChops.difference(decoded.crop((0, 0, 256, 128)), img.crop((0, 0, 256, 128))).getbbox() is None, \
+        "文字区域解码结果与原画面不一致（应为无损）"
+    assert encoder.codec_tiles == {"jpeg": 1, "png": 1}
+
+def test_parallel_stripes_cover_frame():
+    """测试并行分块：条带高度按MCU对齐，拼接后覆盖整个画面"""
+    encoder = ParallelTileEncoder(workers=3, min_pixels=0)
+    img = Image.new("RGB", (200, 100), (10, 120, 230))
+    frame = encoder.encode(img, quality=90)
+    encoder.close()
+    width, height, tiles = iter_tiles(frame)
+    assert (width, height) == (200, 100)
+    assert [(y, h) for _, y, _, h, _, _ in tiles] == [(0, 48), (48, 48), (96, 4)], "条带未按MCU对齐或未覆盖画面"
+    assert all(codec == CODEC_JPEG for *_, codec, _ in tiles)
+    assert decode_frame(frame).getpixel((100, 98))[2] > 200, "拼接后画面内容错误"
+
+def test_parallel_stripes_reassemble_content():
+    """测试条带拼接：各条带内容回到原位置；只有足够大的画面才分块，整帧JPEG直接解码"""
+    encoder = ParallelTileEncoder(workers=2, min_pixels=64 * 64)
+    img = Image.new("RGB", (64, 64), (0, 0, 0))
+    img.paste((250, 250, 250), (0, 32, 64, 64))  # 下半部分为白色，落在第二个条带
+    assert encoder.should_split(img)
+    assert not encoder.should_split(Image.new("RGB", (32, 32))), "小画面不应分块"
+    assert not ParallelTileEncoder(workers=1, min_pixels=0).should_split(img), "单线程时不应分块"
+
+    decoded = decode_frame(encoder.encode(img, quality=95))
+    encoder.close()
+    assert decoded.size == (64, 64)
+    assert decoded.getpixel((32, 8))[0] < 30 and decoded.getpixel((32, 56))[0] > 220, "条带拼接位置错误"
+
+    buf = io.BytesIO()
+    Image.new("RGB", (16, 16)).save(buf, format="JPEG")
+    assert decode_frame(buf.getvalue()).size == (16, 16), "整帧JPEG应直接解码"
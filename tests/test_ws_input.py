@@ -0,0 +1,67 @@
+import types
+import pytest
+from pyremote.core import protocol
+from pyremote.core.input_control import InputControl
+
+pytest.importorskip("websockets")
+from websockets.exceptions import ConnectionClosedOK  # noqa: E402
+from pyremote.ui import ws_input  # noqa: E402
+
+class _FakeWebSocket:
+    """
+    按顺序交付输入批次的WebSocket（每5/128秒≈39ms到达一条，二进制浮点数可精确表示，模拟时钟无舍入误差），
+    消息交付完后保持空闲，直到接收不设超时才关闭
+    """
+    def __init__(self, batches, clock):
+        encoder = protocol.MessageEncoder()
+        self.pending = [(5 / 128 * (i + 1), encoder.encode(batch)) for i, batch in enumerate(batches)]
+        self.clock = clock
+        self.sent = []
+
+    def recv(self, timeout=None):
+        if not self.pending:
+            if timeout is None:
+                raise ConnectionClosedOK(None, None)
+            self.clock[0] += timeout
+            raise TimeoutError()
+        arrival, data = self.pending[0]
+        if timeout is not None and self.clock[0] + timeout < arrival:
+            self.clock[0] += timeout
+            raise TimeoutError()
+        self.clock[0] = max(self.clock[0], arrival)
+        self.pending.pop(0)
+        return data
+
+    def send(self, data):
+        self.sent.append((self.clock[0], protocol.MessageDecoder().decode(data)))
+
+class _ViewportRecorder:
+    def __init__(self):
+        self.calls = []
+
+    def set_viewport(self, width, height, dpi=96):
+        self.calls.append((width, height))
+
+def test_batches_applied_in_order_with_periodic_ack(monkeypatch):
+    """测试输入通道：批次按到达顺序执行（连续移动只执行最后一个），每个确认间隔回复一次累计Ack，空闲时补发"""
+    clock = [0.0]
+    monkeypatch.setattr(ws_input, "time", types.SimpleNamespace(monotonic=lambda: clock[0]))
+    control = InputControl(backend="null")
+    viewports = _ViewportRecorder()
+    server = ws_input.InputChannelServer(control, "127.0.0.1", 0, ack_interval=0.125, screen_capture=viewports)
+
+    batches = [[protocol.Resize(800, 600, 96)]]
+    batches += [[protocol.MouseMove(k, k), protocol.MouseMove(k + 1, k + 1), protocol.KeyPress(str(k))]
+                for k in range(9)]
+    websocket = _FakeWebSocket(batches, clock)
+    server._handle_connection(websocket)
+
+    events = control.input_impl.take_events()
+    assert [e.action for e in events] == ["move_to", "press"] * 9, "输入事件顺序错误或连续移动未合并"
+    assert [e.args[0] for e in events if e.action == "press"] == [str(k) for k in range(9)], "批次执行顺序错误"
+    assert viewports.calls == [(800, 600), (0, 0)], "显示区域未设置或断开后未取消"
+
+    # 每个确认时刻（125ms的整数倍）不等下一条消息到达即回复已处理的批次数；
+    # 最后一批之后连接空闲，仍在下一个确认时刻补发，不必等到下一条消息或连接关闭
+    assert websocket.sent == [(0.125, [protocol.Ack(3)]), (0.25, [protocol.Ack(6)]),
+                              (0.375, [protocol.Ack(9)]), (0.5, [protocol.Ack(10)])], "Ack时刻或累计值错误"